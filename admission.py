@@ -0,0 +1,205 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from metrics import REGISTRY
+
+_LIMITED = REGISTRY.counter('admission_limited_total', 'Requests rejected by a rate limit', ('limit',))
+_SHED = REGISTRY.counter('ai_hints_shed_total', 'AI hint requests answered with the simple hint because too many were waiting')
+
+
+class TokenBuckets:
+    """
+    One token bucket per client key: ``rate`` tokens a second, up to ``burst``.
+
+    A bucket is a (tokens, last update) pair in an OrderedDict kept in order
+    of last use. A bucket idle long enough to have refilled says nothing a new
+    one would not, so buckets are dropped from the front as they become full
+    again; beyond ``max_entries`` the least recently used goes too. Memory
+    follows the clients seen in the last ``burst / rate`` seconds, and every
+    call is O(1) amortized. Used from the event loop thread only.
+    """
+
+    def __init__(self, rate: float, burst: float, max_entries: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.clock = clock
+        self._refill_seconds = burst / rate
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens for a client, returns 0.0 if it may go ahead, else the seconds to wait"""
+        now = self.clock()
+        buckets = self._buckets
+        bucket = buckets.pop(key, None)
+        tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+        while buckets:
+            _, updated = next(iter(buckets.values()))
+            if now - updated < self._refill_seconds and len(buckets) < self.max_entries:
+                break
+            buckets.popitem(last=False)
+
+        if tokens >= cost:
+            buckets[key] = (tokens - cost, now)
+            return 0.0
+        buckets[key] = (tokens, now)
+        return (cost - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AIGate:
+    """
+    Process-wide cap on AI hint calls.
+
+    ``max_concurrent`` calls run at once and up to ``max_queue`` more wait at
+    most ``queue_timeout`` seconds for a slot. A request beyond that is shed:
+    it gets the simple hint straight away instead of adding to a queue it
+    would time out in anyway. ``max_queue`` < 0 queues without limit.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, queue_timeout: float = 2.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self, wait: bool = True) -> bool:
+        """
+        Take a slot, returns False if the call should not be made. With
+        ``wait`` False (hints generated ahead of time) a busy gate is not
+        waited on, and that is not counted as shedding.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif not wait:
+            return False
+        elif 0 <= self.max_queue <= self.waiting:
+            return self._shed()
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return self._shed()
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = True) -> AsyncIterator[bool]:
+        """Hold a slot for the duration of a call, yields whether the call may be made"""
+        admitted = await self.acquire(wait)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    def _shed(self) -> bool:
+        self.shed += 1
+        _SHED.inc()
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "shed": self.shed}
+
+
+class Admission:
+    """
+    Cheap checks made before a request allocates anything: games started per
+    client address, and requests per game session. A None limit admits
+    everything. ``ai`` caps AI hint calls across all games.
+    """
+
+    def __init__(self, starts: Optional[TokenBuckets] = None, sessions: Optional[TokenBuckets] = None,
+                 ai: Optional[AIGate] = None):
+        self.starts = starts
+        self.sessions = sessions
+        self.ai = ai or AIGate()
+        self.limited = {"start": 0, "session": 0}
+
+    def admit_start(self, client: str, games: int = 1) -> float:
+        """Admit ``games`` new games for a client address, returns 0.0 or the seconds to wait"""
+        return self._take(self.starts, 'start', client, games)
+
+    def max_starts(self) -> Optional[int]:
+        """Most games one admit_start can ever grant (the burst), None without a limit"""
+        return int(self.starts.burst) if self.starts is not None else None
+
+    def admit_request(self, session: str) -> float:
+        """Admit one request on a game session, returns 0.0 or the seconds to wait"""
+        return self._take(self.sessions, 'session', session, 1)
+
+    def _take(self, buckets: Optional[TokenBuckets], limit: str, key: str, cost: int) -> float:
+        if buckets is None:
+            return 0.0
+        retry_after = buckets.take(key, cost)
+        if retry_after:
+            self.limited[limit] += 1
+            _LIMITED.inc(limit)
+        return retry_after
+
+    def stats(self) -> Dict:
+        return {
+            "limited": dict(self.limited),
+            "tracked_clients": len(self.starts) if self.starts is not None else 0,
+            "tracked_sessions": len(self.sessions) if self.sessions is not None else 0,
+            "ai": self.ai.stats(),
+        }
+
+
+def create_admission() -> Admission:
+    """Limits configured from ADMISSION_* and AI_*; a rate of 0 turns that limit off"""
+    max_entries = int(os.getenv('ADMISSION_MAX_CLIENTS', '100000'))
+
+    def buckets(rate: str, burst: str) -> Optional[TokenBuckets]:
+        rate_per_second = float(rate)
+        return TokenBuckets(rate_per_second, float(burst), max_entries) if rate_per_second > 0 else None
+
+    return Admission(
+        starts=buckets(os.getenv('ADMISSION_START_RATE', '2'), os.getenv('ADMISSION_START_BURST', '40')),
+        sessions=buckets(os.getenv('ADMISSION_SESSION_RATE', '20'), os.getenv('ADMISSION_SESSION_BURST', '60')),
+        ai=AIGate(max_concurrent=int(os.getenv('AI_MAX_CONCURRENCY', '8')),
+                  max_queue=int(os.getenv('AI_MAX_QUEUE', '32')),
+                  queue_timeout=float(os.getenv('AI_QUEUE_TIMEOUT', '2'))),
+    )
+
+
+_shared_admission: Optional[Admission] = None
+_shared_lock = threading.Lock()
+
+
+def get_admission() -> Admission:
+    """Return the process-wide admission control, created on first use"""
+    global _shared_admission
+    if _shared_admission is None:
+        with _shared_lock:
+            if _shared_admission is None:
+                _shared_admission = create_admission()
+    return _shared_admission
+
+
+def set_admission(admission: Admission):
+    """Replace the shared admission control, e.g. without limits in load tests"""
+    global _shared_admission
+    with _shared_lock:
+        _shared_admission = admission
@@ -1,24 +1,189 @@
+import asyncio
 import os
-import google.generativeai as genai
-from typing import Dict, Optional
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional
 from dotenv import load_dotenv
+from metrics import STAGE_LATENCY
 
 load_dotenv()
 
+# Streaming hints: time to the first chunk and to the end of the stream
+_FIRST_CHUNK = STAGE_LATENCY.labels('ai_stream_first_chunk')
+_STREAM_TOTAL = STAGE_LATENCY.labels('ai_stream_total')
+
+
+class HintBackend:
+    """Text generation backend used by GeminiAISupport"""
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str) -> str:
+        return await asyncio.to_thread(self.generate, prompt)
+
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the completion in chunks as it is generated, backends without streaming yield it whole"""
+        yield await self.generate_async(prompt)
+
+
+class GeminiBackend(HintBackend):
+    """Google Gemini backend, the SDK is imported and configured on first use"""
+
+    def __init__(self, api_key: str, model_name: str = 'gemini-2.5-flash'):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt: str) -> str:
+        response = self.model.generate_content(prompt)
+        return response.text.strip()
+
+    async def generate_async(self, prompt: str) -> str:
+        model = self.model
+        if hasattr(model, 'generate_content_async'):
+            response = await model.generate_content_async(prompt)
+            return response.text.strip()
+        return await asyncio.to_thread(self.generate, prompt)
+
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        model = self.model
+        if not hasattr(model, 'generate_content_async'):
+            yield await self.generate_async(prompt)
+            return
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeBackend(HintBackend):
+    """
+    Local backend for tests and benchmarks with configurable latency and failures.
+
+    When streaming, ``latency`` passes before the first chunk and the response
+    follows word by word, ``chunk_delay`` apart.
+    """
+
+    def __init__(self, response: str = "I think the answer is B.", latency: float = 0.0, fail: bool = False,
+                 chunk_delay: float = 0.0):
+        self.response = response
+        self.latency = latency
+        self.fail = fail
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+
+    def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("Fake backend failure")
+        return self.response
+
+    async def generate_async(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("Fake backend failure")
+        return self.response
+
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("Fake backend failure")
+        words = self.response.split(' ')
+        for i, word in enumerate(words):
+            if i:
+                if self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                word = ' ' + word
+            yield word
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures so callers skip the
+    backend entirely. After ``reset_timeout`` seconds one trial call is let
+    through; success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """End a trial call that neither succeeded nor failed (cancelled, closed early, never sent)"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+
 class GeminiAISupport:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, backend: Optional[HintBackend] = None,
+                 timeout: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None):
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        
-        if not self.api_key:
-            raise ValueError(
-                "Gemini API key not found."
-            )
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-    
-    def get_ai_hint(self, question: str, answers: Dict[int, str], explanation: str) -> str:
-        # Create a prompt
-        prompt = f"""You are an AI assistant helping a player in a millionaire quiz game. 
+
+        if backend is None:
+            if not self.api_key:
+                raise ValueError(
+                    "Gemini API key not found."
+                )
+            backend = GeminiBackend(self.api_key)
+        self.backend = backend
+        self.timeout = timeout if timeout is not None else float(os.getenv('AI_HINT_TIMEOUT', '8'))
+        self.max_concurrency = max_concurrency or int(os.getenv('AI_MAX_CONCURRENCY', '8'))
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv('AI_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('AI_BREAKER_RESET', '30')),
+        )
+        # Caps in-flight LLM calls for every game sharing this client
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def build_prompt(self, question: str, answers: Dict[int, str], explanation: str) -> str:
+        return f"""You are an AI assistant helping a player in a millionaire quiz game.
 You have access to verified factual information about the topic and use it as a hint for player.
 
 VERIFIED FACTS:
@@ -33,7 +198,7 @@ B) {answers[2]}
 C) {answers[3]}
 D) {answers[4]}
 
-Your task: Provide a helpful hint based ONLY on the verified facts provided above. 
+Your task: Provide a helpful hint based ONLY on the verified facts provided above.
 - DO NOT mention the VERIFIED FACTS in response
 - DO NOT contradict the verified facts
 - Keep your response concise (3-4 sentences)
@@ -41,17 +206,153 @@ Your task: Provide a helpful hint based ONLY on the verified facts provided abov
 
 Hint:"""
 
+    def try_ai_hint(self, question: str, answers: Dict[int, str], explanation: str) -> Optional[str]:
+        """Blocking hint request, returns None when the breaker is open or the backend fails"""
+        if not self.breaker.allow():
+            return None
+        prompt = self.build_prompt(question, answers, explanation)
+
         try:
-            response = self.model.generate_content(prompt)
-            ai_hint = response.text.strip()
-            
-            return ai_hint
-            
+            with STAGE_LATENCY.time('ai_call'):
+                ai_hint = self.backend.generate(prompt)
         except Exception as e:
-            # Fallback
             print(f"Gemini API Error: {e}")
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        return ai_hint
+
+    def get_ai_hint(self, question: str, answers: Dict[int, str], explanation: str) -> str:
+        ai_hint = self.try_ai_hint(question, answers, explanation)
+        if ai_hint is None:
+            # Fallback
             return f"Based on what I know: {explanation[:150]}... Think carefully about this information."
-    
+        return ai_hint
+
+    async def try_ai_hint_async(self, question: str, answers: Dict[int, str], explanation: str,
+                                timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Ask the backend for a hint without blocking the event loop.
+
+        Returns None when the breaker is open, the deadline passes (including
+        time spent waiting for a concurrency slot) or the backend fails. Only
+        the backend call itself counts for the breaker: running out of time
+        while queued for a slot says nothing about the backend.
+        """
+        if not self.breaker.allow():
+            return None
+        # Still half open after allow() only if this call took the trial
+        trial = self.breaker.state == "half_open"
+        try:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            prompt = self.build_prompt(question, answers, explanation)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + (timeout if timeout is not None else self.timeout)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                print("Gemini API Error: no free slot before the hint deadline")
+                return None
+
+            try:
+                with STAGE_LATENCY.time('ai_call'):
+                    ai_hint = await asyncio.wait_for(self.backend.generate_async(prompt), deadline - loop.time())
+            except asyncio.TimeoutError:
+                print("Gemini API Error: hint timed out")
+                self.breaker.record_failure()
+                return None
+            except Exception as e:
+                print(f"Gemini API Error: {e}")
+                self.breaker.record_failure()
+                return None
+            finally:
+                self._semaphore.release()
+            self.breaker.record_success()
+            return ai_hint
+        finally:
+            if trial:
+                # Cancelled (the client went away): let the next caller make the trial call
+                self.breaker.release_trial()
+
+    async def stream_ai_hint(self, question: str, answers: Dict[int, str], explanation: str,
+                             timeout: Optional[float] = None) -> AsyncIterator[Optional[str]]:
+        """
+        Stream a hint chunk by chunk under the same deadline, concurrency cap
+        and breaker as try_ai_hint_async.
+
+        A final None means the hint could not be completed (breaker open,
+        deadline passed or backend failure) and the caller should fall back.
+        """
+        if not self.breaker.allow():
+            yield None
+            return
+        trial = self.breaker.state == "half_open"
+        chunks = self._stream_ai_hint(question, answers, explanation, timeout)
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            try:
+                await chunks.aclose()
+            finally:
+                if trial:
+                    # Closed early (the client disconnected) or cancelled: let the next caller make the trial call
+                    self.breaker.release_trial()
+
+    async def _stream_ai_hint(self, question: str, answers: Dict[int, str], explanation: str,
+                              timeout: Optional[float]) -> AsyncIterator[Optional[str]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        prompt = self.build_prompt(question, answers, explanation)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout if timeout is not None else self.timeout)
+        started = time.perf_counter()
+        first_chunk = True
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            # Queued behind other hints, the backend is not at fault
+            print("Gemini API Error: no free slot before the hint deadline")
+            yield None
+            return
+
+        stream = self.backend.stream_async(prompt)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                if first_chunk:
+                    _FIRST_CHUNK.observe(time.perf_counter() - started)
+                    first_chunk = False
+                yield chunk
+        except asyncio.TimeoutError:
+            print("Gemini API Error: hint timed out")
+            self.breaker.record_failure()
+            yield None
+            return
+        except Exception as e:
+            print(f"Gemini API Error: {e}")
+            self.breaker.record_failure()
+            yield None
+            return
+        finally:
+            self._semaphore.release()
+            await stream.aclose()
+        _STREAM_TOTAL.observe(time.perf_counter() - started)
+        self.breaker.record_success()
+
+    async def get_ai_hint_async(self, question: str, answers: Dict[int, str], explanation: str,
+                                timeout: Optional[float] = None) -> str:
+        """Async hint with a deadline, falling back to get_simple_hint on any failure"""
+        ai_hint = await self.try_ai_hint_async(question, answers, explanation, timeout)
+        if ai_hint is None:
+            return self.get_simple_hint(explanation)
+        return ai_hint
+
     def get_simple_hint(self, explanation: str) -> str:
         sentences = explanation.split('. ')
         if len(sentences) > 0:
@@ -63,3 +364,36 @@ Hint:"""
 
 def create_ai_support(api_key: Optional[str] = None) -> GeminiAISupport:
     return GeminiAISupport(api_key=api_key)
+
+
+# One client per API key for the whole process; None means fallback mode
+_shared_supports: Dict[Optional[str], Optional[GeminiAISupport]] = {}
+_shared_lock = threading.Lock()
+
+
+def get_ai_support(api_key: Optional[str] = None) -> Optional[GeminiAISupport]:
+    """Return the process-wide AI support client, or None when no API key is configured"""
+    key = api_key or os.getenv('GEMINI_API_KEY')
+    if key in _shared_supports:
+        return _shared_supports[key]
+    with _shared_lock:
+        if key not in _shared_supports:
+            try:
+                if os.getenv('AI_BACKEND') == 'fake':
+                    # Local stand-in for load tests, no API key or network needed
+                    backend = FakeBackend(latency=float(os.getenv('AI_FAKE_LATENCY', '0.2')),
+                                          chunk_delay=float(os.getenv('AI_FAKE_CHUNK_DELAY', '0')))
+                    _shared_supports[key] = GeminiAISupport(api_key=key, backend=backend)
+                else:
+                    _shared_supports[key] = GeminiAISupport(api_key=key)
+            except ValueError:
+                print("Warning: AI Support initialized without Gemini API. Will use fallback mode.")
+                print("To enable full AI support, set GEMINI_API_KEY environment variable.")
+                _shared_supports[key] = None
+        return _shared_supports[key]
+
+
+def set_ai_support(support: Optional[GeminiAISupport], api_key: Optional[str] = None):
+    """Replace the shared client, e.g. with one using a FakeBackend in tests"""
+    with _shared_lock:
+        _shared_supports[api_key or os.getenv('GEMINI_API_KEY')] = support
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+# Event codes recorded per question
+ATTEMPT = 0
+CORRECT = 1
+FIFTY_FIFTY = 2
+CHANGE_QUESTION = 3
+AI_SUPPORT = 4
+_COLUMNS = ('attempts', 'correct', 'fifty_fifty', 'change_question', 'ai_support')
+LIFELINE_EVENTS = {'fifty_fifty': FIFTY_FIFTY, 'change_question': CHANGE_QUESTION, 'ai_support': AI_SUPPORT}
+
+
+class AnswerStats:
+    """
+    Per-question answer and lifeline counters, batched in memory and flushed
+    to SQLite in the background. Questions are keyed by (bank key, question
+    id), the key of their bank (see bank_registry.bank_key, 0 for the default
+    bank), as ids are only unique within a bank.
+
+    Recording is a single deque append: no lock and no I/O on the request
+    path. ``flush`` drains the queue, aggregates it and adds the totals in
+    one transaction, so several workers can share the file. If flushing
+    stops, the queue keeps the newest ``max_pending`` events.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_pending: int = 1_000_000):
+        self.path = path
+        # (bank key, question id, event)
+        self._pending: "deque[Tuple[int, int, int]]" = deque(maxlen=max_pending)
+        self._flush_lock = threading.Lock()
+        self.flushed = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                with self._db:
+                    self._create_table()
+            except sqlite3.Error as e:
+                print(f"Warning: answer stats {path} unavailable, statistics are not saved: {e}")
+                self._db = None
+
+    def _create_table(self):
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(question_stats)")]
+        if columns and 'bank_key' not in columns:
+            # Written before question banks: every row belongs to the default bank
+            self._db.execute("ALTER TABLE question_stats RENAME TO question_stats_unbanked")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS question_stats ("
+            " bank_key INTEGER NOT NULL DEFAULT 0,"
+            " question_id INTEGER NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " correct INTEGER NOT NULL DEFAULT 0,"
+            " fifty_fifty INTEGER NOT NULL DEFAULT 0,"
+            " change_question INTEGER NOT NULL DEFAULT 0,"
+            " ai_support INTEGER NOT NULL DEFAULT 0,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (bank_key, question_id))"
+        )
+        if columns and 'bank_key' not in columns:
+            self._db.execute(f"INSERT INTO question_stats (question_id, {', '.join(_COLUMNS)}, updated)"
+                             f" SELECT question_id, {', '.join(_COLUMNS)}, updated FROM question_stats_unbanked")
+            self._db.execute("DROP TABLE question_stats_unbanked")
+
+    def record_answer(self, question_id: int, correct: bool, bank_key: int = 0):
+        self._pending.append((bank_key, question_id, ATTEMPT))
+        if correct:
+            self._pending.append((bank_key, question_id, CORRECT))
+
+    def record_lifeline(self, question_id: int, support_type: str, bank_key: int = 0):
+        self._pending.append((bank_key, question_id, LIFELINE_EVENTS[support_type]))
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Write the queued events, returns how many were flushed"""
+        with self._flush_lock:
+            pending = self._pending
+            if self._db is None:
+                drained = len(pending)
+                pending.clear()
+                return drained
+            counts: Counter = Counter()
+            drained = 0
+            while True:
+                try:
+                    counts[pending.popleft()] += 1
+                except IndexError:
+                    break
+                drained += 1
+            if not drained:
+                return 0
+
+            totals: Dict[Tuple[int, int], List[int]] = {}
+            for (bank_key, question_id, event), count in counts.items():
+                totals.setdefault((bank_key, question_id), [0] * len(_COLUMNS))[event] += count
+            now = time.time()
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO question_stats"
+                        " (bank_key, question_id, attempts, correct, fifty_fifty, change_question, ai_support, updated)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (bank_key, question_id) DO UPDATE SET"
+                        " attempts = attempts + excluded.attempts,"
+                        " correct = correct + excluded.correct,"
+                        " fifty_fifty = fifty_fifty + excluded.fifty_fifty,"
+                        " change_question = change_question + excluded.change_question,"
+                        " ai_support = ai_support + excluded.ai_support,"
+                        " updated = excluded.updated",
+                        [(*key, *values, now) for key, values in totals.items()]
+                    )
+            except sqlite3.Error as e:
+                print(f"Warning: could not flush answer stats: {e}")
+                return 0
+            self.flushed += drained
+            return drained
+
+    def totals(self, bank_key: int = 0) -> Dict[int, Dict[str, int]]:
+        """Flushed counters per question id of one bank, the default bank unless given"""
+        if self._db is None:
+            return {}
+        with self._flush_lock:
+            rows = self._db.execute(f"SELECT question_id, {', '.join(_COLUMNS)} FROM question_stats"
+                                    " WHERE bank_key = ?", (bank_key,)).fetchall()
+        return {row[0]: dict(zip(_COLUMNS, row[1:])) for row in rows}
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._pending), "flushed": self.flushed}
+
+    async def run_flusher(self, interval: float = 5.0):
+        """Flush periodically off the event loop, and once more when cancelled"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.flush)
+        finally:
+            self.flush()
+
+
+def recalibrate(questions: List[Dict], totals: Dict[int, Dict[str, int]], min_attempts: int = 30,
+                prior_weight: float = 10.0) -> Tuple[List[Dict], int]:
+    """
+    Re-rank questions into levels by measured difficulty.
+
+    Questions with at least ``min_attempts`` answers are sorted by their
+    smoothed correct rate (pulled towards the overall rate by ``prior_weight``
+    pseudo-answers) and dealt back into the levels they came from, easiest
+    to the lowest level, so every level keeps its size. Returns the updated
+    questions and how many changed level.
+    """
+    measured = [q for q in questions if totals.get(q['id'], {}).get('attempts', 0) >= min_attempts]
+    if not measured:
+        return questions, 0
+    attempts = sum(totals[q['id']]['attempts'] for q in measured)
+    overall = sum(totals[q['id']]['correct'] for q in measured) / attempts
+
+    def correct_rate(question: Dict) -> float:
+        counts = totals[question['id']]
+        return (counts['correct'] + prior_weight * overall) / (counts['attempts'] + prior_weight)
+
+    levels = sorted(q['level'] for q in measured)
+    ranked = sorted(measured, key=correct_rate, reverse=True)
+    new_levels = {question['id']: level for question, level in zip(ranked, levels)}
+    moved = 0
+    updated = []
+    for question in questions:
+        level = new_levels.get(question['id'], question['level'])
+        moved += level != question['level']
+        updated.append({**question, 'level': level})
+    return updated, moved
+
+
+_shared_stats: Optional[AnswerStats] = None
+_shared_lock = threading.Lock()
+
+
+def get_answer_stats() -> AnswerStats:
+    """Return the process-wide statistics, ANSWER_STATS_PATH='' discards them instead of saving"""
+    global _shared_stats
+    if _shared_stats is None:
+        with _shared_lock:
+            if _shared_stats is None:
+                _shared_stats = AnswerStats(os.getenv('ANSWER_STATS_PATH', 'answer_stats.sqlite3') or None)
+    return _shared_stats
+
+
+def set_answer_stats(stats: AnswerStats):
+    """Replace the shared statistics, e.g. with a temporary file in tests"""
+    global _shared_stats
+    with _shared_lock:
+        _shared_stats = stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer statistics tools")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    report = subcommands.add_parser('report', help="print the hardest and easiest questions")
+    report.add_argument('--stats', default=os.getenv('ANSWER_STATS_PATH', 'answer_stats.sqlite3'))
+    report.add_argument('--bank', help="question bank id, e.g. en/history (default: the default bank)")
+    report.add_argument('--min-attempts', type=int, default=30)
+    calibrate = subcommands.add_parser('recalibrate', help="re-rank questions into levels by difficulty")
+    calibrate.add_argument('--bank', help="question bank id, e.g. en/history (default: the default bank)")
+    calibrate.add_argument('--questions', help="question file (default: the bank's file)")
+    calibrate.add_argument('--stats', default=os.getenv('ANSWER_STATS_PATH', 'answer_stats.sqlite3'))
+    calibrate.add_argument('--output', help="where to write the re-levelled questions (default: print a summary only)")
+    calibrate.add_argument('--min-attempts', type=int, default=30)
+    args = parser.parse_args()
+
+    from bank_registry import bank_key, get_bank_registry
+    registry = get_bank_registry()
+    bank_id = registry.resolve(args.bank)
+    totals = AnswerStats(args.stats).totals(0 if bank_id == registry.default_id else bank_key(bank_id))
+    if args.command == 'report':
+        rows = sorted(((counts['correct'] / counts['attempts'], question_id, counts)
+                       for question_id, counts in totals.items() if counts['attempts'] >= args.min_attempts))
+        for rate, question_id, counts in rows:
+            print(f"question {question_id:>6}: {rate:6.1%} correct of {counts['attempts']} answers, "
+                  f"50/50 {counts['fifty_fifty']}, change {counts['change_question']}, AI {counts['ai_support']}")
+        return
+
+    from question_ingest import ingest
+    loaded, _ = ingest([args.questions or registry.files()[bank_id]])
+    questions = [q._asdict() for q in sorted(loaded, key=lambda q: (q.level, q.id))]
+    updated, moved = recalibrate(questions, totals, args.min_attempts)
+    print(f"{moved} of {len(questions)} questions change level")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(updated, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
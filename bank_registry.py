@@ -0,0 +1,192 @@
+"""
+Question banks by locale and topic, loaded when a game first asks for one.
+
+A bank is a question file under QUESTION_BANKS_DIR, named by its id:
+
+    banks/en.json               -> "en"
+    banks/en/history.json       -> "en/history"
+    banks/vi/economics.jsonl    -> "vi/economics"
+
+The default bank, questions.json, is served as QUESTION_BANK_DEFAULT ("vi").
+Every game on a bank shares one loaded copy. The ``max_loaded`` most
+recently used banks stay loaded; beyond that the least recently used is
+dropped from the registry and freed once the last game on it is gone. Until
+then a new game asking for it gets that same copy back, never a second one.
+"""
+
+import os
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from question_bank import QuestionBank, create_question_bank, get_question_bank
+
+SOURCE_SUFFIXES = ('.json', '.jsonl', '.ndjson')
+
+
+class UnknownBank(ValueError):
+    """Raised for a bank id no question file is registered under"""
+
+
+def bank_key(bank_id: str) -> int:
+    """Stable 32-bit key of a bank id, packed into game state instead of the id"""
+    return zlib.crc32(bank_id.encode('utf-8'))
+
+
+class BankRegistry:
+    """
+    Question banks keyed by id, see the module docstring. ``loader`` builds
+    a bank from its file (create_question_bank, so QUESTION_STORE applies);
+    the default bank is the process-wide one from get_question_bank.
+    """
+
+    def __init__(self, directory: str = 'banks', default_file: str = 'questions.json', default_id: str = 'vi',
+                 max_loaded: int = 8, loader: Callable[[str], QuestionBank] = create_question_bank):
+        self.directory = directory
+        self.default_file = default_file
+        self.default_id = default_id
+        self.max_loaded = max_loaded
+        self.loader = loader
+        self.loads = 0
+        self.evictions = 0
+        self._files: Optional[Dict[str, str]] = None
+        self._ids_by_key: Dict[int, str] = {}
+        self._loaded: "OrderedDict[str, QuestionBank]" = OrderedDict()
+        # Every bank still referenced by a game, including those evicted from _loaded
+        self._live: "weakref.WeakValueDictionary[str, QuestionBank]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+
+    def files(self) -> Dict[str, str]:
+        """Question file of every available bank by id, the directory is scanned on first use"""
+        files = self._files
+        if files is None:
+            with self._scan_lock:
+                files = self._files
+                if files is None:
+                    files = self._files = self._scan()
+        return files
+
+    def _scan(self) -> Dict[str, str]:
+        files = {self.default_id: self.default_file}
+        for root, directories, names in os.walk(self.directory):
+            directories.sort()
+            for name in sorted(names):
+                stem, suffix = os.path.splitext(name)
+                if suffix not in SOURCE_SUFFIXES:
+                    continue
+                path = os.path.join(root, name)
+                bank_id = os.path.relpath(os.path.join(root, stem), self.directory).replace(os.sep, '/').lower()
+                if bank_id in files:
+                    print(f"Warning: {path} is ignored, question bank '{bank_id}' is {files[bank_id]}")
+                    continue
+                files[bank_id] = path
+
+        # The default bank packs as key 0, so states saved before banks existed resolve to it
+        ids_by_key = {0: self.default_id}
+        for bank_id in list(files):
+            if bank_id == self.default_id:
+                continue
+            key = bank_key(bank_id)
+            if key in ids_by_key:
+                print(f"Warning: question bank '{bank_id}' is not served, its key clashes with '{ids_by_key[key]}'")
+                del files[bank_id]
+                continue
+            ids_by_key[key] = bank_id
+        self._ids_by_key = ids_by_key
+        return files
+
+    def resolve(self, bank: Optional[str]) -> str:
+        """Normalized id of a requested bank, '' or None for the default; raises UnknownBank"""
+        bank_id = (bank or self.default_id).strip().strip('/').lower()
+        if bank_id not in self.files():
+            raise UnknownBank(f"Unknown question bank '{bank}'")
+        return bank_id
+
+    def get(self, bank: Optional[str] = None) -> QuestionBank:
+        """The shared bank for an id, loaded on first use"""
+        bank_id = self.resolve(bank)
+        with self._lock:
+            question_bank = self._loaded.get(bank_id)
+            if question_bank is not None:
+                self._loaded.move_to_end(bank_id)
+                return question_bank
+            question_bank = self._live.get(bank_id)
+            if question_bank is None:
+                question_bank = self._load(bank_id)
+            self._loaded[bank_id] = question_bank
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+                self.evictions += 1
+            return question_bank
+
+    def by_key(self, key: int) -> QuestionBank:
+        """The bank a game state was saved on, see MillionaireGame.to_bytes"""
+        self.files()
+        bank_id = self._ids_by_key.get(key)
+        if bank_id is None:
+            raise UnknownBank(f"Game state refers to an unknown question bank ({key:08x})")
+        return self.get(bank_id)
+
+    def _load(self, bank_id: str) -> QuestionBank:
+        path = self._files[bank_id]
+        question_bank = get_question_bank(path) if bank_id == self.default_id else self.loader(path)
+        question_bank.bank_id = bank_id
+        question_bank.bank_key = 0 if bank_id == self.default_id else bank_key(bank_id)
+        self._live[bank_id] = question_bank
+        self.loads += 1
+        return question_bank
+
+    def banks(self) -> List[Dict]:
+        """Available banks, for listing to players"""
+        loaded = set(self._live.keys())
+        return [{"id": bank_id, "default": bank_id == self.default_id, "loaded": bank_id in loaded}
+                for bank_id in sorted(self.files())]
+
+    def reload(self) -> Dict[str, int]:
+        """
+        Rescan the directory and reload the banks still in use, returns question
+        counts keyed by file. The default bank reloads with reload_question_banks.
+        """
+        with self._scan_lock:
+            self._files = self._scan()
+        with self._lock:
+            for bank_id in [bank_id for bank_id in self._loaded if bank_id not in self._files]:
+                del self._loaded[bank_id]
+            live = [bank for bank_id, bank in self._live.items()
+                    if bank_id in self._files and bank_id != self.default_id]
+        return {bank.questions_file: bank.reload() for bank in live}
+
+    def stats(self) -> Dict:
+        return {"available": len(self.files()), "loaded": list(self._loaded), "live": len(self._live),
+                "loads": self.loads, "evictions": self.evictions}
+
+
+def create_bank_registry() -> BankRegistry:
+    """Banks from QUESTION_BANKS_DIR, QUESTION_BANK_CACHE of them kept loaded"""
+    return BankRegistry(directory=os.getenv('QUESTION_BANKS_DIR', 'banks'),
+                        default_id=os.getenv('QUESTION_BANK_DEFAULT', 'vi').lower(),
+                        max_loaded=int(os.getenv('QUESTION_BANK_CACHE', '8')))
+
+
+_shared_registry: Optional[BankRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def get_bank_registry() -> BankRegistry:
+    """Return the process-wide bank registry, created on first use"""
+    global _shared_registry
+    if _shared_registry is None:
+        with _shared_lock:
+            if _shared_registry is None:
+                _shared_registry = create_bank_registry()
+    return _shared_registry
+
+
+def set_bank_registry(registry: BankRegistry):
+    """Replace the shared registry, e.g. with a test directory"""
+    global _shared_registry
+    with _shared_lock:
+        _shared_registry = registry
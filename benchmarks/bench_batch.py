@@ -0,0 +1,76 @@
+"""
+Per-game cost of separate API requests versus one /api/batch request.
+
+Plays games in-process as individual /api/start and /api/answer calls
+(answering every level correctly) and as one batch per game replaying a fixed
+script of eight answers, like the kiosk does. Both make nine game actions per
+game; the report is the time per game.
+
+Usage:
+    python benchmarks/bench_batch.py [--games 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+from load_test import ASGIClient, correct_answers  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def separate(client: ASGIClient, session_id: str, answers) -> int:
+    requests = 1
+    status, body = await client.post('/api/start', {"session_id": session_id})
+    while status == 200 and body['status'] in ('success', 'correct'):
+        answer = answers[body['question']['question']]
+        status, body = await client.post('/api/answer', {"session_id": session_id, "answer": answer})
+        requests += 1
+    return requests
+
+
+async def batched(client: ASGIClient, session_id: str, script) -> int:
+    # A replayed game: the kiosk knows its answers up front
+    actions = [{"action": "start", "session_id": session_id}]
+    actions += [{"action": "answer", "session_id": session_id, "answer": answer} for answer in script]
+    await client.post('/api/batch', {"actions": actions})
+    return 1
+
+
+async def run(games: int):
+    answers = correct_answers('questions.json')
+    client = ASGIClient(app)
+    await client.startup()
+
+    started = time.perf_counter()
+    requests = 0
+    for i in range(games):
+        requests += await separate(client, f"separate-{i}", answers)
+    separate_s = time.perf_counter() - started
+
+    script = [1] * 8
+    started = time.perf_counter()
+    for i in range(games):
+        await batched(client, f"batch-{i}", script)
+    batch_s = time.perf_counter() - started
+    await client.shutdown()
+
+    print(f"separate requests  {separate_s / games * 1e6:8.0f} us/game  ({requests / games:.1f} requests per game)")
+    print(f"one batch          {batch_s / games * 1e6:8.0f} us/game  (1 request per game)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.games))
+
+
+if __name__ == "__main__":
+    main()
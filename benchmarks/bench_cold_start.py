@@ -0,0 +1,82 @@
+"""
+Cold start of the app, as a serverless instance or a fresh worker sees it.
+
+Each run is a new interpreter that imports ``main`` (question bank loaded,
+no Gemini SDK: it is imported on the first AI hint) and serves its first
+/api/start. Reports the median time to import and to the first response,
+whether the Gemini SDK was loaded, and the slowest imports from
+``python -X importtime``.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5] [--top 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+sys.path.insert(0, 'benchmarks')
+from load_test import ASGIClient
+
+async def first_request():
+    client = ASGIClient(main.app)
+    await client.startup()
+    status, _ = await client.post('/api/start', {"session_id": "cold-start"})
+    return status
+
+status = asyncio.run(first_request())
+print(json.dumps({"import_s": imported - started, "first_response_s": time.perf_counter() - started,
+                  "status": status, "gemini_sdk_loaded": "google.generativeai" in sys.modules}))
+"""
+
+
+def probe_env() -> dict:
+    # No files written by the probes, and no API key so nothing reaches Gemini
+    return {**os.environ, "EVENT_LOG_PATH": "", "ANSWER_STATS_PATH": "", "HINT_CACHE_PATH": "",
+            "SESSION_CHECKPOINT_PATH": "", "GEMINI_API_KEY": ""}
+
+
+def slowest_imports(top: int):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=ROOT,
+                            env=probe_env(), capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=probe_env(),
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"import main        {statistics.median(r['import_s'] for r in results) * 1000:8.1f} ms (median of {args.runs})")
+    print(f"first response     {statistics.median(r['first_response_s'] for r in results) * 1000:8.1f} ms")
+    print(f"Gemini SDK loaded  {'yes' if any(r['gemini_sdk_loaded'] for r in results) else 'no'}")
+    print(f"\n{'self ms':>8}{'total ms':>10}  module")
+    for self_us, cumulative_us, name in slowest_imports(args.top):
+        print(f"{self_us / 1000:8.1f}{cumulative_us / 1000:10.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
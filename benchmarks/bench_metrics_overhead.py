@@ -0,0 +1,57 @@
+"""
+Overhead of the metrics instrumentation on the hot path.
+
+Reports the raw cost of each metric primitive and compares the instrumented
+MillionaireGame.check_answer with its uninstrumented body (_check_answer).
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py [--iterations 200000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from gamelogic import MillionaireGame  # noqa: E402
+from metrics import Counter, Histogram  # noqa: E402
+
+
+def per_call_ns(stmt, iterations: int) -> float:
+    return min(timeit.repeat(stmt, number=iterations, repeat=5)) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    counter = Counter('bench_total', 'bench', ('label',))
+    histogram = Histogram('bench_seconds', 'bench', ('label',))
+
+    def timed_block():
+        with histogram.time('x'):
+            pass
+
+    print(f"Counter.inc          {per_call_ns(lambda: counter.inc('x'), n):8.0f} ns")
+    print(f"Histogram.observe    {per_call_ns(lambda: histogram.observe(0.004, 'x'), n):8.0f} ns")
+    print(f"Histogram.time block {per_call_ns(timed_block, n):8.0f} ns")
+
+    game = MillionaireGame()
+    game.start_game()
+    # A wrong answer leaves the game state untouched, so the call can be repeated
+    wrong = game.current_question.correct % 4 + 1
+
+    plain = per_call_ns(lambda: game._check_answer(wrong), n)
+    instrumented = per_call_ns(lambda: game.check_answer(wrong), n)
+    print(f"check_answer (plain)        {plain:8.0f} ns")
+    print(f"check_answer (instrumented) {instrumented:8.0f} ns  (+{instrumented - plain:.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Server start-up cost of loading a large question bank.
+
+Generates a synthetic bank, then times parsing and validating the JSON file
+against loading its compiled snapshot. For the heap bank and the
+memory-mapped bank it also reports, from a fresh process each, the start-up
+time and the private (anonymous) memory after serving random questions.
+
+Usage:
+    python benchmarks/bench_question_load.py [--questions 50000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from question_bank import QuestionBank  # noqa: E402
+from question_ingest import MappedQuestionBank, ingest, read_snapshot, snapshot_path, write_snapshot  # noqa: E402
+
+
+def synthetic_bank(count: int):
+    return [{
+        "id": i,
+        "level": i % 8 + 1,
+        "question": f"Câu hỏi số {i}: đâu là đáp án đúng cho tình huống kinh doanh này?",
+        "answer1": f"Phương án A {i}", "answer2": f"Phương án B {i}",
+        "answer3": f"Phương án C {i}", "answer4": f"Phương án D {i}",
+        "correct": i % 4 + 1,
+        "explanation": f"Giải thích cho câu hỏi {i}, dựa trên các dữ kiện đã được kiểm chứng.",
+    } for i in range(1, count + 1)]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def anon_rss() -> int:
+    """Private heap memory of this process; mapped file pages are shared and not counted"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def measure_store(store: str, source: str, draws: int):
+    """Runs in a fresh process: load the bank, show random questions, print timings and memory"""
+    baseline = anon_rss()
+    bank_class = MappedQuestionBank if store == 'mmap' else QuestionBank
+    load_s, bank = timed(lambda: bank_class(source))
+    levels = bank.levels()
+    started = time.perf_counter()
+    for i in range(draws):
+        bank.get(bank.random_question_id(levels[i % len(levels)])).answers
+    draw_s = time.perf_counter() - started
+    print(json.dumps({"load_ms": load_s * 1000, "draw_us": draw_s / draws * 1e6,
+                      "anon_mb": (anon_rss() - baseline) / 2 ** 20}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--draws', type=int, default=20000)
+    parser.add_argument('--measure-store', nargs=2, metavar=('STORE', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure_store:
+        measure_store(args.measure_store[0], args.measure_store[1], args.draws)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'questions.json')
+        with open(source, 'w', encoding='utf-8') as f:
+            json.dump(synthetic_bank(args.questions), f, ensure_ascii=False)
+
+        ingest_s, (questions, report) = timed(lambda: ingest([source]))
+        snapshot = snapshot_path(source)
+        compile_s, size = timed(lambda: write_snapshot(questions, snapshot))
+        read_s, _ = timed(lambda: read_snapshot(snapshot))
+        bank_s, bank = timed(lambda: QuestionBank(source))
+
+        print(f"{report.summary()}")
+        print(f"JSON {os.path.getsize(source)} bytes, snapshot {size} bytes")
+        print(f"parse + validate JSON   {ingest_s * 1000:8.1f} ms")
+        print(f"compile snapshot        {compile_s * 1000:8.1f} ms")
+        print(f"read snapshot           {read_s * 1000:8.1f} ms")
+        print(f"QuestionBank start-up   {bank_s * 1000:8.1f} ms  ({len(bank)} questions)")
+
+        for store in ('memory', 'mmap'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--measure-store', store, source,
+                 '--draws', str(args.draws)], capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{store:6} bank: start-up {result['load_ms']:7.1f} ms, "
+                  f"get random question {result['draw_us']:5.1f} us, heap {result['anon_mb']:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cost of one live room with many players on a single core.
+
+Fills a room with ``--players`` players, each followed by a subscriber
+coroutine standing in for its WebSocket (it counts the bytes it would send),
+then plays every level: all players still in answer, 1 in ``--wrong``
+answering wrongly, and the host reveals and moves on. Reports the time per
+answer, per reveal and for a broadcast to reach every subscriber.
+
+Usage:
+    python benchmarks/bench_rooms.py [--players 10000] [--wrong 20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from answer_stats import AnswerStats, set_answer_stats  # noqa: E402
+from event_log import EventLog, set_event_log  # noqa: E402
+from rooms import FINISHED, Room  # noqa: E402
+
+
+async def run(players: int, wrong: int):
+    set_answer_stats(AnswerStats(None))
+    set_event_log(EventLog(None))
+    room = Room("bench", max_players=players)
+    rng = random.Random(1)
+
+    started = time.perf_counter()
+    tokens = [room.join()[0] for _ in range(players)]
+    join_s = time.perf_counter() - started
+
+    received = [0]
+    sent_bytes = [0]
+    all_received = asyncio.Event()
+    expected = [0]
+
+    async def subscriber(cursor: int):
+        while True:
+            for cursor, text, _ in await room.updates(cursor):
+                sent_bytes[0] += len(text)
+            received[0] += 1
+            if received[0] == expected[0]:
+                all_received.set()
+
+    subscribers = [asyncio.create_task(subscriber(room.seq)) for _ in range(players)]
+    await asyncio.sleep(0)
+
+    answer_s = reveal_s = fanout_s = 0.0
+    answers = broadcasts = 0
+    room.host_action('start')
+    while True:
+        await asyncio.sleep(0)
+        correct = room.game.current_question.correct
+        alive = [token for token, slot in room._players.items() if room._alive[slot]]
+        started = time.perf_counter()
+        for token in alive:
+            room.answer(token, correct % 4 + 1 if rng.randrange(wrong) == 0 else correct)
+        answer_s += time.perf_counter() - started
+        answers += len(alive)
+
+        # Time one broadcast until every subscriber has taken it
+        received[0] = 0
+        expected[0] = players
+        all_received.clear()
+        started = time.perf_counter()
+        room.host_action('reveal')
+        reveal_s += time.perf_counter() - started
+        await all_received.wait()
+        fanout_s += time.perf_counter() - started
+        broadcasts += 1
+        if room.state == FINISHED:
+            break
+        room.host_action('next')
+        received[0] = 0
+        expected[0] = players
+        all_received.clear()
+        await all_received.wait()
+
+    for task in subscribers:
+        task.cancel()
+    print(f"{players} players, {room.round} questions, {room.survivors} left at the end")
+    print(f"join            {join_s / players * 1e6:8.2f} us/player")
+    print(f"answer          {answer_s / answers * 1e6:8.2f} us/answer  ({answers} answers)")
+    print(f"reveal          {reveal_s / broadcasts * 1e3:8.2f} ms")
+    print(f"broadcast       {fanout_s / broadcasts * 1e3:8.2f} ms until all {players} subscribers have it")
+    print(f"sent            {sent_bytes[0] / 1e6:8.1f} MB of shared, pre-serialized text")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=10_000)
+    parser.add_argument('--wrong', type=int, default=20, help="1 in WRONG answers is wrong")
+    args = parser.parse_args()
+    asyncio.run(run(args.players, args.wrong))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Serialization cost per response: rebuilt question dicts vs. pre-rendered payloads.
+
+"rebuilt" is how responses used to be made: the question dict is built
+from get_current_state(), FastAPI's jsonable_encoder walks the body and
+JSONResponse encodes it. "spliced" builds the body around the question's
+payload rendered at bank load and encodes it with fast_json.encode. Both
+are timed for a start/correct-answer response (with a question) and a
+lifeline response (without), with orjson and with the standard library.
+The last line is the end-to-end /api/start rate through the app.
+
+Usage:
+    python benchmarks/bench_serialization.py [--iterations 50000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+# Nothing written to disk by the benchmark
+os.environ.setdefault('EVENT_LOG_PATH', '')
+os.environ.setdefault('ANSWER_STATS_PATH', '')
+os.environ.setdefault('SESSION_CHECKPOINT_PATH', '')
+
+import json  # noqa: E402
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import fast_json  # noqa: E402
+from fast_json import encode  # noqa: E402
+from gamelogic import MillionaireGame  # noqa: E402
+
+
+def rebuilt_question(game: MillionaireGame) -> bytes:
+    state = game.get_current_state()
+    body = {
+        "status": "correct",
+        "correct": True,
+        "correct_answer": 2,
+        "level": state['level'],
+        "question": {
+            "question": state['question'],
+            "answer1": state['answers'][1],
+            "answer2": state['answers'][2],
+            "answer3": state['answers'][3],
+            "answer4": state['answers'][4],
+        },
+        "supports": state['supports'],
+    }
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def spliced_question(game: MillionaireGame) -> bytes:
+    return encode({
+        "status": "correct",
+        "correct": True,
+        "correct_answer": 2,
+        "level": game.level,
+        "question": game.question_json(),
+        "supports": game.supports_state(),
+    })
+
+
+def rebuilt_lifeline(game: MillionaireGame) -> bytes:
+    state = game.get_current_state()
+    body = {"status": "success", "support_type": "fifty_fifty", "removed_answers": [1, 3],
+            "supports": state['supports']}
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def spliced_lifeline(game: MillionaireGame) -> bytes:
+    return encode({"status": "success", "support_type": "fifty_fifty", "removed_answers": [1, 3],
+                   "supports": game.supports_state()})
+
+
+def per_call_us(function, game: MillionaireGame, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function(game)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def start_rate(requests: int) -> float:
+    from admission import Admission, set_admission
+    from load_test import ASGIClient
+    import main
+
+    # Every request comes from one address here, so no rate limits
+    set_admission(Admission())
+
+    client = ASGIClient(main.app)
+    await client.startup()
+    started = time.perf_counter()
+    for i in range(requests):
+        await client.post('/api/start', {"session_id": f"serialize-{i}"})
+    elapsed = time.perf_counter() - started
+    await client.shutdown()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50_000)
+    args = parser.parse_args()
+
+    game = MillionaireGame()
+    game.start_game()
+    encoders = [('orjson', fast_json.orjson), ('json', None)] if fast_json.orjson else [('json', None)]
+    print(f"{'response':<22}{'encoder':<9}{'rebuilt us':>12}{'spliced us':>12}{'speedup':>9}")
+    for name, rebuilt, spliced in (("question", rebuilt_question, spliced_question),
+                                   ("lifeline", rebuilt_lifeline, spliced_lifeline)):
+        for encoder, module in encoders:
+            fast_json.orjson = module
+            assert json.loads(rebuilt(game)) == json.loads(spliced(game))
+            old = per_call_us(rebuilt, game, args.iterations)
+            new = per_call_us(spliced, game, args.iterations)
+            print(f"{name:<22}{encoder:<9}{old:>12.2f}{new:>12.2f}{old / new:>8.1f}x")
+    fast_json.orjson = encoders[0][1]
+
+    print(f"\n/api/start end to end: {asyncio.run(start_rate(args.iterations // 10)):.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
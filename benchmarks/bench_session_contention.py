@@ -0,0 +1,105 @@
+"""
+Throughput and correctness of concurrent requests on the same game.
+
+Every player double-clicks: each answer is sent ``--clicks`` times at once
+with the same Idempotency-Key, and on the first question an AI support
+request (fake backend, ``--ai-latency``) races the answer. A game is counted
+as anomalous when the duplicate answers got different replies or a level was
+skipped. Runs with the per-game locks on and off, and without duplicates as
+the uncontended baseline (which shows the cost of the locks themselves).
+
+Usage:
+    python benchmarks/bench_session_contention.py [--games 1000] [--clicks 3] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+from load_test import ASGIClient, correct_answers  # noqa: E402
+
+
+async def play(client: ASGIClient, session_id: str, answers, clicks: int):
+    """Returns (requests, anomalous)"""
+    status, body = await client.post('/api/start', {"session_id": session_id})
+    requests = 1
+    level = body.get('level', 1)
+    step = 0
+    while status == 200 and body['status'] in ('success', 'correct'):
+        payload = {"session_id": session_id, "answer": answers[body['question']['question']]}
+        headers = {"Idempotency-Key": f"{session_id}-{step}"}
+        calls = [client.request('POST', '/api/answer', payload, headers) for _ in range(clicks)]
+        if step == 0:
+            calls.append(client.request('POST', '/api/support', {"session_id": session_id, "support_type": "ai_support"}))
+        replies = await asyncio.gather(*calls)
+        requests += len(calls)
+        bodies = [raw for _, _, raw in replies[:clicks]]
+        status = replies[0][0]
+        body = json.loads(bodies[0]) if bodies[0] else {}
+        if any(raw != bodies[0] for raw in bodies) or (body.get('status') == 'correct' and body['level'] != level + 1):
+            return requests, True
+        level = body.get('level', level)
+        step += 1
+    return requests, body.get('status') != 'won'
+
+
+async def run_case(client: ASGIClient, answers, games: int, clicks: int, concurrency: int, tag: str):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            return await play(client, f"{tag}-{i}", answers, clicks)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[limited(i) for i in range(games)])
+    elapsed = time.perf_counter() - started
+    requests = sum(r for r, _ in results)
+    anomalous = sum(1 for _, bad in results if bad)
+    return requests / elapsed, anomalous
+
+
+async def run(args):
+    from admission import Admission, set_admission
+    from ai_support import FakeBackend, GeminiAISupport, set_ai_support
+    from hint_cache import HintCache, set_hint_cache
+
+    set_ai_support(GeminiAISupport(backend=FakeBackend(latency=args.ai_latency)))
+    # Every player comes from one address here, so no rate limits (the AI gate stays)
+    set_admission(Admission())
+    set_hint_cache(HintCache(max_variants=0))
+    import main
+
+    answers = correct_answers('questions.json')
+    client = ASGIClient(main.app)
+    await client.startup()
+    cases = [("uncontended, locks off", 1, False), ("uncontended, locks on", 1, True),
+             (f"{args.clicks} clicks, locks on", args.clicks, True), (f"{args.clicks} clicks, locks off", args.clicks, False)]
+    print(f"{'case':<26}{'req/s':>10}{'anomalous games':>18}")
+    for i, (name, clicks, locking) in enumerate(cases):
+        main.session_guard.enabled = locking
+        throughput, anomalous = await run_case(client, answers, args.games, clicks, args.concurrency, f"case{i}")
+        print(f"{name:<26}{throughput:>10.0f}{anomalous:>12} / {args.games}")
+    main.session_guard.enabled = True
+    await client.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--clicks', type=int, default=3, help="copies of every answer sent at once")
+    parser.add_argument('--concurrency', type=int, default=64, help="games played at the same time")
+    parser.add_argument('--ai-latency', type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Memory benchmark: bytes per game session.
+
+Compares the compact slotted MillionaireGame against the previous layout, where
+every game held its own parsed copy of questions.json, a question dict, a
+removed-answers list, boolean flags in an instance __dict__ and (when the
+Gemini SDK is installed) its own GenerativeModel.
+
+Usage:
+    python benchmarks/bench_session_memory.py [--sessions 10000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from gamelogic import MillionaireGame  # noqa: E402
+from question_bank import get_question_bank  # noqa: E402
+
+
+class LegacyGame:
+    """Reproduces the per-session footprint of the original MillionaireGame"""
+
+    def __init__(self, questions_file: str, with_model: bool):
+        self.questions_file = questions_file
+        with open(questions_file, 'r', encoding='utf-8') as f:
+            self.questions_db = json.load(f)
+        self.current_level = 1
+        self.used_fifty_fifty = False
+        self.used_change_question = False
+        self.used_ai_support = False
+        self.current_question = self.questions_db[0]
+        self.removed_answers = []
+        self.max_level = 8
+        self.ai_support = None
+        if with_model:
+            import google.generativeai as genai
+            self.ai_support = genai.GenerativeModel('gemini-2.5-flash')
+
+
+def measure(factory, sessions: int) -> float:
+    """Average traced bytes retained per live session"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [factory() for _ in range(sessions)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--legacy-sessions', type=int, default=1000,
+                        help='the legacy layout is large, so fewer sessions are enough')
+    parser.add_argument('--questions', default='questions.json')
+    args = parser.parse_args()
+
+    try:
+        import google.generativeai  # noqa: F401
+        with_model = True
+    except ImportError:
+        with_model = False
+
+    # Warm the shared bank and AI client so only per-session memory is measured
+    get_question_bank(args.questions)
+    MillionaireGame(args.questions).start_game()
+
+    def compact_game():
+        game = MillionaireGame(args.questions)
+        game.start_game()
+        return game
+
+    legacy = measure(lambda: LegacyGame(args.questions, with_model), args.legacy_sessions)
+    compact = measure(compact_game, args.sessions)
+
+    print(f"legacy layout : {legacy:10.0f} bytes/session"
+          f"{' (incl. GenerativeModel)' if with_model else ''}")
+    print(f"compact layout: {compact:10.0f} bytes/session")
+    print(f"reduction     : {legacy / compact:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
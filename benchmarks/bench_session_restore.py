@@ -0,0 +1,105 @@
+"""
+Session checkpoint cost: writing and restoring ``--sessions`` live games.
+
+Fills an in-memory session store, writes a full snapshot, appends an
+incremental checkpoint after ``--changed`` games moved on, then restores
+everything into a fresh store the way a restarted worker does. Reports the
+time of each step, the largest pause the event loop saw while checkpoints
+ran (what a request arriving then would wait), and the file size.
+
+Usage:
+    python benchmarks/bench_session_restore.py [--sessions 1000000] [--changed 10000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from event_log import EventLog, set_event_log  # noqa: E402
+from gamelogic import MillionaireGame  # noqa: E402
+from session_checkpoint import SessionCheckpoint, read_checkpoint  # noqa: E402
+from session_store import InMemorySessionStore  # noqa: E402
+
+
+async def longest_pause(work) -> float:
+    """Run ``work`` while a ticker measures the longest the event loop went without running it"""
+    pauses = [0.0]
+    done = False
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            pauses[0] = max(pauses[0], now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await work
+    done = True
+    await task
+    return pauses[0]
+
+
+async def run(sessions: int, changed: int, path: str):
+    set_event_log(EventLog(None))
+    rng = random.Random(1)
+    store = InMemorySessionStore(max_entries=sessions)
+    template = MillionaireGame()
+    template.start_game()
+    state = bytearray(template.to_bytes())
+    started = time.perf_counter()
+    for i in range(sessions):
+        state[1] = rng.randint(1, 8)
+        store.put(f"player-{i:08d}", MillionaireGame.from_bytes(bytes(state)))
+    print(f"{sessions} sessions in memory ({time.perf_counter() - started:.1f} s to create)")
+
+    checkpoint = SessionCheckpoint(store, path, MillionaireGame.from_bytes)
+    checkpoint.restore()
+    started = time.perf_counter()
+    pause = await longest_pause(checkpoint._compact())
+    print(f"full snapshot       {time.perf_counter() - started:8.2f} s, loop paused at most {pause * 1000:.1f} ms, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB ({os.path.getsize(path) / sessions:.0f} bytes/session)")
+
+    for i in rng.sample(range(sessions), changed):
+        game = store.get(f"player-{i:08d}")
+        game.level = min(game.level + 1, 8)
+        store.save(f"player-{i:08d}", game)
+    started = time.perf_counter()
+    pause = await longest_pause(checkpoint.checkpoint())
+    print(f"{changed} changed    {(time.perf_counter() - started) * 1000:8.1f} ms, loop paused at most {pause * 1000:.1f} ms")
+    await checkpoint.close()
+
+    started = time.perf_counter()
+    saved, _ = read_checkpoint(path)
+    read_s = time.perf_counter() - started
+    restored_store = InMemorySessionStore(max_entries=sessions)
+    restored = SessionCheckpoint(restored_store, path, MillionaireGame.from_bytes)
+    started = time.perf_counter()
+    count = restored.restore()
+    restore_s = time.perf_counter() - started
+    await restored.close()
+    print(f"restore             {restore_s:8.2f} s for {count} sessions ({restore_s / count * 1e6:.1f} us/session, "
+          f"{read_s:.2f} s of it reading the file)")
+    assert count == sessions and len(saved) == sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1_000_000)
+    parser.add_argument('--changed', type=int, default=10_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args.sessions, args.changed, os.path.join(directory, 'sessions.checkpoint')))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cost of verifying a stateless game token versus a server-side session lookup.
+
+Compares StateTokenCodec.decode (base64, MAC check, optional decryption and
+replay claim) plus MillionaireGame.from_bytes with the stateful path: a
+pydantic parse of the request body plus a session store lookup.
+
+Usage:
+    python benchmarks/bench_state_token.py [--iterations 100000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from gamelogic import MillionaireGame  # noqa: E402
+from main import AnswerRequest  # noqa: E402
+from session_store import InMemorySessionStore  # noqa: E402
+from state_token import StateTokenCodec  # noqa: E402
+
+
+def per_call_ns(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    game = MillionaireGame()
+    game.start_game()
+    state = game.to_bytes()
+
+    store = InMemorySessionStore(max_entries=n)
+    for i in range(n):
+        store.put(f"session-{i}", game)
+    bodies = [json.dumps({"session_id": f"session-{i}", "answer": 2}) for i in range(n)]
+
+    def stateful(body):
+        request = AnswerRequest.model_validate_json(body)
+        return store.get(request.session_id)
+
+    print(f"pydantic parse + store lookup   {per_call_ns(stateful, bodies):8.0f} ns")
+
+    for encrypt in (False, True):
+        codec = StateTokenCodec(b'benchmark-secret', encrypt=encrypt)
+        # Every token is claimed once, so each iteration needs its own
+        tokens = [codec.encode(state, codec.new_nonce(), 0) for _ in range(n)]
+        label = "encrypted" if encrypt else "signed"
+        decode_ns = per_call_ns(codec.decode, tokens)
+        tokens = [codec.encode(state, codec.new_nonce(), 0) for _ in range(n)]
+        full_ns = per_call_ns(lambda token: MillionaireGame.from_bytes(codec.decode(token).state), tokens)
+        print(f"token decode ({label:9})        {decode_ns:8.0f} ns")
+        print(f"token decode + game ({label:9}) {full_ns:8.0f} ns  ({len(tokens[0])} byte token)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+Load test and latency benchmark for the game API.
+
+Simulated players drive /api/start, /api/answer and /api/support following a
+mix of scripts:
+
+    win        answers every level correctly
+    game_over  answers correctly up to a random level, then wrongly
+    lifelines  uses 50/50, change question and AI support along the way, then wins
+
+With ``--journal`` the players instead repeat the games recorded in a game
+event journal (see event_log.py), action for action, as a realistic profile.
+
+By default the app runs in-process through a minimal ASGI client, with the AI
+backend replaced by a local fake of configurable latency. With ``--url`` the
+same players run against a live server from several processes over HTTP
+keep-alive connections (start it with AI_BACKEND=fake to avoid Gemini calls).
+
+The report contains p50/p95/p99 latency per endpoint, requests per second and
+RSS growth per session, and can be saved as JSON and compared with a previous run.
+
+Usage:
+    python benchmarks/load_test.py --players 2000 --concurrency 64 --output bench.json
+    python benchmarks/load_test.py --compare bench.json --output bench-new.json
+    python benchmarks/load_test.py --journal game_events.jsonl --players 5000
+    AI_BACKEND=fake ADMISSION_START_RATE=0 uvicorn main:app --workers 4 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --processes 8 --players 4000
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+from typing import Dict, Generator, List, Optional, Tuple, Union
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+# In-process runs must not leave benchmark games in the journal, the answer statistics
+# or the session checkpoint a real server restores; set them explicitly to measure their cost
+for variable in ('EVENT_LOG_PATH', 'ANSWER_STATS_PATH', 'SESSION_CHECKPOINT_PATH'):
+    os.environ.setdefault(variable, '')
+
+from question_bank import QuestionBank  # noqa: E402
+
+SCRIPTS = ('win', 'game_over', 'lifelines')
+
+# A player script yields (path, payload) and receives (status, body)
+PlayerScript = Generator[Tuple[str, Dict], Tuple[int, Dict], None]
+
+
+def correct_answers(questions_file: str) -> Dict[str, int]:
+    """Players look the correct answer up by question text, like a perfect contestant"""
+    bank = QuestionBank(questions_file)
+    return {q.question: q.correct for level in bank.levels() for q in bank.questions_for_level(level)}
+
+
+def player(kind: str, session_id: str, answers: Dict[str, int], rng: random.Random) -> PlayerScript:
+    status, body = yield '/api/start', {"session_id": session_id}
+    if status != 200:
+        return
+    question = body['question']['question']
+    level = body['level']
+    fail_at = rng.randint(1, 8) if kind == 'game_over' else None
+    lifelines = ['fifty_fifty', 'change_question', 'ai_support'] if kind == 'lifelines' else []
+    rng.shuffle(lifelines)
+
+    while True:
+        if lifelines and rng.random() < 0.5:
+            support_type = lifelines.pop()
+            status, body = yield '/api/support', {"session_id": session_id, "support_type": support_type}
+            if status == 200 and support_type == 'change_question':
+                question = body['question']['question']
+            continue
+
+        correct = answers[question]
+        answer = correct % 4 + 1 if level == fail_at else correct
+        status, body = yield '/api/answer', {"session_id": session_id, "answer": answer}
+        if status != 200 or body['status'] != 'correct':
+            return
+        question = body['question']['question']
+        level = body['level']
+
+
+def journal_player(actions: List[Tuple[str, object]], session_id: str, answers: Dict[str, int]) -> PlayerScript:
+    """Repeat a journaled game: the same lifelines, answering right or wrong where the player did"""
+    status, body = yield '/api/start', {"session_id": session_id}
+    if status != 200:
+        return
+    question = body['question']['question']
+    for action, value in actions:
+        if action == 'support':
+            status, body = yield '/api/support', {"session_id": session_id, "support_type": value}
+            if status == 200 and value == 'change_question':
+                question = body['question']['question']
+            continue
+        correct = answers[question]
+        status, body = yield '/api/answer', {"session_id": session_id, "answer": correct if value else correct % 4 + 1}
+        if status != 200 or body['status'] != 'correct':
+            return
+        question = body['question']['question']
+
+
+# A player is either a scripted kind or the actions of a journaled game
+PlayerSpec = Union[str, List[Tuple[str, object]]]
+
+
+def make_player(spec: PlayerSpec, session_id: str, answers: Dict[str, int], rng: random.Random) -> PlayerScript:
+    if isinstance(spec, str):
+        return player(spec, session_id, answers, rng)
+    return journal_player(spec, session_id, answers)
+
+
+def pick_players(args, mix: Dict[str, float]) -> List[PlayerSpec]:
+    rng = random.Random(args.seed)
+    if not args.journal:
+        return pick_scripts(mix, args.players, rng)
+    from event_log import journal_files, load_profile, read_events
+    games = [actions for actions in load_profile(read_events(journal_files(args.journal))) if actions]
+    if not games:
+        raise SystemExit(f"No complete games in {args.journal}")
+    return [games[i % len(games)] for i in range(args.players)]
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ASGIClient:
+    """Just enough of an HTTP client to call an ASGI app in-process"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan: Optional[asyncio.Task] = None
+        self._lifespan_in: Optional[asyncio.Queue] = None
+
+    async def startup(self):
+        self._lifespan_in = asyncio.Queue()
+        started = asyncio.Event()
+
+        async def send(message):
+            if message['type'].startswith('lifespan.startup'):
+                started.set()
+
+        await self._lifespan_in.put({'type': 'lifespan.startup'})
+        self._lifespan = asyncio.create_task(
+            self.app({'type': 'lifespan', 'asgi': {'version': '3.0'}}, self._lifespan_in.get, send)
+        )
+        await started.wait()
+
+    async def shutdown(self):
+        if self._lifespan:
+            await self._lifespan_in.put({'type': 'lifespan.shutdown'})
+            await self._lifespan
+
+    async def request(self, method: str, path: str, payload: Optional[Dict] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        raw_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '', 'headers': raw_headers,
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        delivered = False
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return {'type': 'http.disconnect'}
+
+        response = {'status': 0, 'headers': {}, 'body': []}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {k.decode(): v.decode() for k, v in message.get('headers', [])}
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return response['status'], response['headers'], b''.join(response['body'])
+
+    async def post(self, path: str, payload: Dict) -> Tuple[int, Dict]:
+        status, _, body = await self.request('POST', path, payload)
+        return status, json.loads(body) if body else {}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: int, elapsed: float,
+              sessions: int, rss_growth: Optional[int]) -> Dict:
+    endpoints = {}
+    total = 0
+    for endpoint, values in sorted(latencies.items()):
+        values.sort()
+        total += len(values)
+        endpoints[endpoint] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000 if values else 0.0,
+        }
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "requests_per_second": total / elapsed if elapsed else 0.0,
+        "sessions": sessions,
+        "rss_bytes_per_session": rss_growth / sessions if rss_growth is not None and sessions else None,
+        "endpoints": endpoints,
+    }
+
+
+def pick_scripts(mix: Dict[str, float], count: int, rng: random.Random) -> List[str]:
+    kinds = list(mix)
+    return rng.choices(kinds, weights=[mix[k] for k in kinds], k=count)
+
+
+async def run_in_process(args, mix: Dict[str, float]) -> Dict:
+    from admission import Admission, set_admission
+    from ai_support import FakeBackend, GeminiAISupport, set_ai_support
+    from hint_cache import HintCache, set_hint_cache
+
+    set_ai_support(GeminiAISupport(backend=FakeBackend(latency=args.ai_latency)))
+    # Every player comes from one address here, so no rate limits (the AI gate stays)
+    set_admission(Admission())
+    if not args.hint_cache:
+        set_hint_cache(HintCache(max_variants=0))
+
+    import main
+
+    client = ASGIClient(main.app)
+    await client.startup()
+    answers = correct_answers(args.questions)
+    kinds = pick_players(args, mix)
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, kind in enumerate(kinds):
+        queue.put_nowait((i, kind))
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            i, kind = queue.get_nowait()
+            script = make_player(kind, f"bench-{i}", answers, random.Random(args.seed + i))
+            try:
+                path, payload = next(script)
+                while True:
+                    started = time.perf_counter()
+                    status, body = await client.post(path, payload)
+                    latencies.setdefault(path, []).append(time.perf_counter() - started)
+                    if status >= 400:
+                        errors += 1
+                    path, payload = script.send((status, body))
+            except StopIteration:
+                pass
+
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    rss_growth = rss_bytes() - rss_before
+    await client.shutdown()
+    return summarize(latencies, errors, elapsed, args.players, rss_growth)
+
+
+def http_worker(job) -> Tuple[Dict[str, List[float]], int]:
+    url, kinds, offset, questions_file, seed = job
+    parsed = urllib.parse.urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+    answers = correct_answers(questions_file)
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    for i, kind in enumerate(kinds, start=offset):
+        script = make_player(kind, f"bench-{os.getpid()}-{i}", answers, random.Random(seed + i))
+        try:
+            path, payload = next(script)
+            while True:
+                body = json.dumps(payload)
+                started = time.perf_counter()
+                connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                data = response.read()
+                latencies.setdefault(path, []).append(time.perf_counter() - started)
+                if response.status >= 400:
+                    errors += 1
+                path, payload = script.send((response.status, json.loads(data) if data else {}))
+        except StopIteration:
+            pass
+    connection.close()
+    return latencies, errors
+
+
+def run_over_http(args, mix: Dict[str, float]) -> Dict:
+    kinds = pick_players(args, mix)
+    shard = (len(kinds) + args.processes - 1) // args.processes
+    jobs = [(args.url, kinds[i:i + shard], i, args.questions, args.seed) for i in range(0, len(kinds), shard)]
+
+    rss_before = server_rss(args.server_pid)
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.map(http_worker, jobs)
+    elapsed = time.perf_counter() - started
+    rss_after = server_rss(args.server_pid)
+
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    for worker_latencies, worker_errors in results:
+        errors += worker_errors
+        for endpoint, values in worker_latencies.items():
+            latencies.setdefault(endpoint, []).extend(values)
+    rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    return summarize(latencies, errors, elapsed, args.players, rss_growth)
+
+
+def server_rss(pid: Optional[int]) -> Optional[int]:
+    if not pid:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict, baseline: Optional[Dict] = None):
+    print(f"{report['requests']} requests in {report['elapsed_s']:.2f}s "
+          f"({report['requests_per_second']:.0f} req/s), {report['errors']} errors")
+    if report['rss_bytes_per_session'] is not None:
+        print(f"RSS growth: {report['rss_bytes_per_session']:.0f} bytes/session")
+    print(f"{'endpoint':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in report['endpoints'].items():
+        line = (f"{endpoint:<16}{stats['count']:>8}{stats['p50_ms']:>10.2f}"
+                f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+        old = (baseline or {}).get('endpoints', {}).get(endpoint)
+        if old and old['p99_ms']:
+            line += f"   p99 {(stats['p99_ms'] / old['p99_ms'] - 1) * 100:+.1f}%"
+        print(line)
+    if baseline and baseline.get('requests_per_second'):
+        change = report['requests_per_second'] / baseline['requests_per_second'] - 1
+        print(f"throughput vs {baseline.get('revision') or 'baseline'}: {change * 100:+.1f}%")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in SCRIPTS:
+            raise argparse.ArgumentTypeError(f"unknown player script {kind!r}, choose from {', '.join(SCRIPTS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=1000, help="simulated games to play")
+    parser.add_argument('--concurrency', type=int, default=32, help="concurrent players (in-process mode)")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('win=1,game_over=2,lifelines=1'))
+    parser.add_argument('--ai-latency', type=float, default=0.05, help="fake AI backend latency in seconds")
+    parser.add_argument('--hint-cache', action='store_true', help="let the hint cache answer repeated hints")
+    parser.add_argument('--questions', default='questions.json')
+    parser.add_argument('--journal', help="replay the games of a game event journal instead of --mix")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url', help="benchmark a running server instead of the in-process app")
+    parser.add_argument('--processes', type=int, default=4, help="load generator processes (HTTP mode)")
+    parser.add_argument('--server-pid', type=int, help="server pid for RSS measurement (HTTP mode)")
+    parser.add_argument('--output', help="write the report as JSON")
+    parser.add_argument('--compare', help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    if args.url:
+        report = run_over_http(args, args.mix)
+    else:
+        report = asyncio.run(run_in_process(args, args.mix))
+    report.update({
+        "mode": "http" if args.url else "in-process",
+        "revision": git_revision(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+    })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
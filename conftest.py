@@ -0,0 +1,21 @@
+"""
+Shared test setup: files the app writes by default go to a scratch directory, not the working tree
+"""
+
+import os
+import shutil
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='millionaire-tests-')
+
+# Set before any test module imports main, which reads them at import and start-up
+for variable, name in (('EVENT_LOG_PATH', 'game_events.jsonl'),
+                       ('ANSWER_STATS_PATH', 'answer_stats.sqlite3'),
+                       ('HINT_CACHE_PATH', 'hints.sqlite3'),
+                       ('SESSION_CHECKPOINT_PATH', 'sessions.checkpoint'),
+                       ('SESSION_DB_PATH', 'sessions.sqlite3')):
+    os.environ[variable] = os.path.join(_scratch, name)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_scratch, ignore_errors=True)
@@ -0,0 +1,359 @@
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class EventLog:
+    """
+    Append-only journal of game events (JSON lines).
+
+    ``record`` appends to an in-memory ring buffer and returns, a background
+    thread drains it in batches, so request handlers never wait on disk. If
+    the writer falls behind, the oldest unwritten events are dropped and
+    counted. ``fsync_interval`` trades durability for throughput: 0 syncs
+    every batch, a positive value at most that often, a negative one never
+    (the OS writes back on its own). Files are rotated by size and the last
+    ``backups`` are kept as path.1 (newest) to path.N.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 65536, batch_size: int = 1024,
+                 flush_interval: float = 0.2, fsync_interval: float = 1.0,
+                 max_bytes: int = 64 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer: "deque[Tuple[float, str, int, Dict]]" = deque(maxlen=capacity)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Signalled after every batch, flush() waits on it
+        self._written = threading.Condition()
+        self._writing = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._last_fsync = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def record(self, event: str, game: int, **fields):
+        """
+        Queue an event for ``game`` (the game's schedule seed), never blocks on
+        I/O. Games pass their 64-bit game id as ``id``: seeds may collide.
+        """
+        if self.path is None:
+            return
+        buffer = self._buffer
+        if len(buffer) >= self.capacity:
+            self.dropped += 1
+        buffer.append((time.time(), event, game, fields))
+        if len(buffer) == self.batch_size:
+            self._wake.set()
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None or self._stop.is_set():
+                return
+            try:
+                self._open()
+            except OSError as e:
+                print(f"Warning: event log {self.path} unavailable, events are not saved: {e}")
+                self.path = None
+                return
+            self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+            self._thread.start()
+
+    def _open(self):
+        self._file = open(self.path, 'ab')
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write_batch()
+        self._write_batch()
+
+    def _write_batch(self):
+        buffer = self._buffer
+        if not buffer:
+            return
+        self._writing = True
+        try:
+            self._write_lines(buffer)
+        finally:
+            with self._written:
+                self._writing = False
+                self._written.notify_all()
+
+    def _write_lines(self, buffer: "deque[Tuple[float, str, int, Dict]]"):
+        lines: List[str] = []
+        while True:
+            try:
+                stamp, event, game, fields = buffer.popleft()
+            except IndexError:
+                break
+            lines.append(json.dumps({"t": round(stamp, 3), "event": event, "game": game, **fields},
+                                    ensure_ascii=False, separators=(',', ':')))
+        if not lines:
+            return
+        try:
+            self._file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            self._file.flush()
+            now = time.monotonic()
+            if self.fsync_interval >= 0 and now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+            self.written += len(lines)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            self.dropped += len(lines)
+            print(f"Warning: could not write event log {self.path}: {e}")
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{i}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._open()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything recorded so far is written, returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._written:
+            while self._thread is not None and (self._buffer or self._writing):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._wake.set()
+                self._written.wait(min(remaining, self.flush_interval))
+        return True
+
+    def close(self):
+        """Write what is still queued and stop the writer"""
+        with self._lock:
+            self._stop.set()
+            thread = self._thread
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+            self._file.close()
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._buffer), "written": self.written, "dropped": self.dropped,
+                "rotations": self.rotations}
+
+
+def journal_files(path: str) -> List[str]:
+    """A journal and its rotated files, oldest first"""
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    return rotated[::-1] + ([path] if os.path.exists(path) else [])
+
+
+def read_events(paths: Iterable[str]) -> Iterator[Dict]:
+    """Events from journal files in order, a torn last line (crash mid-write) is skipped"""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def game_key(event: Dict) -> int:
+    """The game an event belongs to: its game id, or its seed in journals written before game ids"""
+    return event.get('id', event['game'])
+
+
+class ReplayReport(NamedTuple):
+    games: int
+    events: int
+    orphaned: int
+    mismatches: List[str]
+
+
+def replay(events: Iterable[Dict], question_bank=None) -> ReplayReport:
+    """
+    Re-run journaled games through MillionaireGame and compare the outcome of
+    every step with what was recorded. A game is identified by its game id
+    (its seed in journals written before game ids), and a fresh game with the
+    same seed sees the same questions. AI support is marked used without
+    asking for a hint. Games are replayed on the bank their start event
+    names, unless ``question_bank`` is given. Events of games started before
+    the journal begins are counted as orphaned.
+    """
+    from gamelogic import AI_SUPPORT, MillionaireGame
+
+    games: Dict[int, MillionaireGame] = {}
+    started = 0
+    count = 0
+    orphaned = 0
+    mismatches: List[str] = []
+
+    def expect(event: Dict, what: str, actual, recorded):
+        if actual != recorded:
+            mismatches.append(f"game {game_key(event)} {event['event']} at level {event.get('level')}: "
+                              f"{what} {actual!r}, journal has {recorded!r}")
+
+    for event in events:
+        count += 1
+        kind = event['event']
+        if kind == 'start':
+            game = games[game_key(event)] = MillionaireGame(question_bank=question_bank, bank=event.get('bank'))
+            game.start_game(seed=event['game'])
+            started += 1
+            expect(event, "question", game.question_id, event['question'])
+            continue
+        if kind == 'ai_hint':
+            continue
+        game = games.get(game_key(event))
+        if game is None:
+            orphaned += 1
+            continue
+        expect(event, "question", game.question_id, event['question'])
+        if kind == 'answer':
+            result = game.check_answer(event['answer'])
+            expect(event, "status", result['status'], event['status'])
+            if result['status'] != 'correct':
+                del games[game_key(event)]
+        elif kind == 'lifeline':
+            support = event['support']
+            if support == 'fifty_fifty':
+                game.use_fifty_fifty()
+                # The removed answers are random, take the recorded ones
+                game.removed_answers = event['removed']
+            elif support == 'change_question':
+                game.use_change_question()
+                expect(event, "new question", game.question_id, event['new_question'])
+            else:
+                game.used_supports |= AI_SUPPORT
+    return ReplayReport(started, count, orphaned, mismatches)
+
+
+def load_profile(events: Iterable[Dict]) -> List[List[Tuple[str, object]]]:
+    """
+    Per game, the actions a player took in order: ("answer", correct) or
+    ("support", support_type). Used to replay real traffic in the load test.
+    """
+    actions: Dict[int, List[Tuple[str, object]]] = {}
+    profile: List[List[Tuple[str, object]]] = []
+    for event in events:
+        kind = event['event']
+        key = game_key(event)
+        if kind == 'start':
+            actions[key] = []
+            profile.append(actions[key])
+        elif kind == 'answer' and key in actions:
+            actions[key].append(('answer', event['status'] in ('correct', 'won')))
+        elif kind == 'lifeline' and key in actions:
+            actions[key].append(('support', event['support']))
+    return profile
+
+
+def create_event_log() -> EventLog:
+    """Journal configured from EVENT_LOG_*; EVENT_LOG_PATH='' disables it"""
+    fsync = os.getenv('EVENT_LOG_FSYNC', '1')
+    fsync_interval = {'always': 0.0, 'never': -1.0}.get(fsync)
+    return EventLog(
+        os.getenv('EVENT_LOG_PATH', 'game_events.jsonl') or None,
+        capacity=int(os.getenv('EVENT_LOG_CAPACITY', '65536')),
+        fsync_interval=float(fsync) if fsync_interval is None else fsync_interval,
+        max_bytes=int(os.getenv('EVENT_LOG_MAX_BYTES', str(64 * 1024 * 1024))),
+        backups=int(os.getenv('EVENT_LOG_BACKUPS', '5')),
+    )
+
+
+_shared_log: Optional[EventLog] = None
+_shared_lock = threading.Lock()
+
+
+def get_event_log() -> EventLog:
+    """Return the process-wide event journal, created on first use"""
+    global _shared_log
+    if _shared_log is None:
+        with _shared_lock:
+            if _shared_log is None:
+                _shared_log = create_event_log()
+                atexit.register(_shared_log.close)
+    return _shared_log
+
+
+def set_event_log(event_log: EventLog):
+    """Replace the shared journal, e.g. with a temporary file in tests"""
+    global _shared_log
+    with _shared_lock:
+        _shared_log = event_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Game event journal tools")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    run = subcommands.add_parser('replay', help="re-run journaled games and report divergences")
+    run.add_argument('journal', nargs='?', default=os.getenv('EVENT_LOG_PATH') or 'game_events.jsonl')
+    run.add_argument('--questions', help="replay every game on this file instead of the bank it was started on")
+    run.add_argument('--game', type=int, help="replay only this game (its game id or seed)")
+    summary = subcommands.add_parser('summary', help="count events by type")
+    summary.add_argument('journal', nargs='?', default=os.getenv('EVENT_LOG_PATH') or 'game_events.jsonl')
+    args = parser.parse_args()
+
+    events = read_events(journal_files(args.journal))
+    if args.command == 'summary':
+        counts: Dict[str, int] = {}
+        latencies: List[float] = []
+        for event in events:
+            counts[event['event']] = counts.get(event['event'], 0) + 1
+            if event['event'] == 'ai_hint' and event['source'] == 'ai':
+                latencies.append(event['latency_ms'])
+        for kind, count in sorted(counts.items()):
+            print(f"{kind:<10}{count:>10}")
+        if latencies:
+            latencies.sort()
+            print(f"AI hint latency: p50 {latencies[len(latencies) // 2]:.0f} ms, "
+                  f"p95 {latencies[int(len(latencies) * 0.95)]:.0f} ms")
+        return
+
+    # Replaying must not add to the journal or to the answer statistics
+    from answer_stats import AnswerStats, set_answer_stats
+    from question_bank import get_question_bank
+    set_event_log(EventLog(None))
+    set_answer_stats(AnswerStats(None))
+    if args.game is not None:
+        events = (event for event in events if args.game in (event.get('id'), event['game']))
+    report = replay(events, get_question_bank(args.questions) if args.questions else None)
+    for mismatch in report.mismatches:
+        print(mismatch)
+    print(f"Replayed {report.games} games ({report.events} events, {report.orphaned} without a start): "
+          f"{len(report.mismatches)} mismatches")
+    sys.exit(1 if report.mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import json
+import secrets
+from typing import Any, Callable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used instead
+    orjson = None
+
+
+class RawJSON(bytes):
+    """Already encoded JSON, spliced into a response as is by ``encode``"""
+
+
+# Stands in for a RawJSON value during encoding; random per process so no real string can match it
+_MARKER = f"@raw:{secrets.token_hex(8)}:"
+_MARKER_BYTES = f'"{_MARKER}'.encode('ascii')
+
+
+def dumps(content: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode(content: Any) -> bytes:
+    """
+    Encode a response, splicing RawJSON values (pre-rendered question
+    payloads) in unchanged. The rest is encoded in one call, so the cost
+    does not depend on how large the spliced parts are.
+    """
+    fragments: List[bytes] = []
+
+    def default(value: Any) -> str:
+        if isinstance(value, RawJSON):
+            fragments.append(value)
+            return f"{_MARKER}{len(fragments) - 1}"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    body = dumps(content, default)
+    if not fragments:
+        return body
+    pieces = body.split(_MARKER_BYTES)
+    parts = [pieces[0]]
+    for piece in pieces[1:]:
+        index, _, rest = piece.partition(b'"')
+        parts.append(fragments[int(index)])
+        parts.append(rest)
+    return b''.join(parts)
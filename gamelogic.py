@@ -1,87 +1,303 @@
-import json
 import random
-from typing import Optional, Dict, List
-from ai_support import GeminiAISupport
+import struct
+from time import perf_counter
+from typing import AsyncIterator, Optional, Dict, List, Tuple
+from admission import get_admission
+from ai_support import get_ai_support
+from answer_stats import get_answer_stats
+from bank_registry import get_bank_registry
+from event_log import get_event_log
+from fast_json import RawJSON
+from hint_cache import get_hint_cache
+from metrics import AI_HINTS, GAME_OUTCOMES, LIFELINES_USED, STAGE_LATENCY
+from question_bank import Question, QuestionBank, get_question_bank
+from question_scheduler import get_question_scheduler
+
+_QUESTION_SELECTION = STAGE_LATENCY.labels('question_selection')
+_ANSWER_CHECK = STAGE_LATENCY.labels('answer_check')
+_OUTCOMES = {status: GAME_OUTCOMES.labels(status) for status in ('correct', 'won', 'game_over', 'error')}
+
+# Bits of MillionaireGame.used_supports
+FIFTY_FIFTY = 1
+CHANGE_QUESTION = 2
+AI_SUPPORT = 4
+
+AI_HINT_PREFIX = "🤖 AI Assistant: "
+QUESTION_REPLACED = "The question was replaced after a question bank update, please play the new one"
+
+# Serialized session state: format, level, used supports, question id, removed answers,
+# question schedule seed, draws at the current level, game id; games on any bank but the
+# default use format 5, which adds the bank's key before the game id
+STATE_FORMAT = 4
+STATE_FORMAT_BANK = 5
+_STATE = struct.Struct('<BBBIBIBQ')
+_STATE_BANK = struct.Struct('<BBBIBIBIQ')
+# Formats 2 and 3 predate the game id, 1 the question schedule
+_STATE_V2 = struct.Struct('<BBBIBIB')
+_STATE_V3 = struct.Struct('<BBBIBIBI')
+_STATE_V1 = struct.Struct('<BBBIB')
+
 
 class MillionaireGame:
-    def __init__(self, questions_file: str = 'questions.json', gemini_api_key: Optional[str] = None):
-        self.questions_file = questions_file
-        self.questions_db = self.load_questions()
-        self.current_level = 1
-        self.used_fifty_fifty = False
-        self.used_change_question = False
-        self.used_ai_support = False
-        self.current_question = None
-        self.removed_answers = []
-        self.max_level = 8
-        
-        # Initialize AI Support (optional - will work without API key using fallback)
-        self.ai_support = None
-        try:
-            self.ai_support = GeminiAISupport(api_key=gemini_api_key)
-        except ValueError as e:
-            print(f"Warning: AI Support initialized without Gemini API. Will use fallback mode.")
-            print(f"To enable full AI support, set GEMINI_API_KEY environment variable.")
+    """
+    One player's game.
+
+    Per-session state is kept compact: the level, a bitmask of used supports,
+    the current question id, a bitmask of removed answers, the seed and
+    cursor of the question schedule and a random game id, which tells games
+    apart in the event journal where seeds may collide. Question text is
+    resolved from the shared QuestionBank and the AI client is shared per
+    process.
+    """
+    __slots__ = ('question_bank', 'ai_support', 'level', 'used_supports', 'question_id', 'removed_mask', 'version',
+                 'next_question_id', 'seed', 'draws', 'game_id')
+
+    max_level = 8
 
+    def __init__(self, questions_file: str = 'questions.json', gemini_api_key: Optional[str] = None,
+                 question_bank: Optional[QuestionBank] = None, bank: Optional[str] = None):
+        # Shared by reference across games, loaded once per process; ``bank`` picks one by id
+        # from the bank registry (e.g. "en/history") and raises UnknownBank if there is none
+        if question_bank is None:
+            question_bank = get_bank_registry().get(bank) if bank else get_question_bank(questions_file)
+        self.question_bank = question_bank
+        self.level = 1
+        self.used_supports = 0
+        self.question_id = 0
+        self.removed_mask = 0
+        # This game's question order (see question_scheduler) and how far it got at the current level
+        self.seed = 0
+        self.draws = 0
+        self.game_id = 0
+        # Bumped by the session store on every save, used for optimistic concurrency
+        self.version = 0
+        # Question drawn ahead for the next level, not part of the serialized state
+        self.next_question_id = 0
         
-    def load_questions(self) -> List[Dict]:
-        try:
-            with open(self.questions_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"Error: {self.questions_file} not found!")
-            return []
-    
+        # Shared AI Support (optional - will work without API key using fallback)
+        self.ai_support = get_ai_support(gemini_api_key)
+
+    def to_bytes(self) -> bytes:
+        """Compact serialized state for shared session stores"""
+        bank_key = self.question_bank.bank_key
+        if bank_key:
+            return _STATE_BANK.pack(STATE_FORMAT_BANK, self.level, self.used_supports, self.question_id,
+                                    self.removed_mask, self.seed, self.draws, bank_key, self.game_id)
+        return _STATE.pack(STATE_FORMAT, self.level, self.used_supports, self.question_id, self.removed_mask,
+                           self.seed, self.draws, self.game_id)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, question_bank: Optional[QuestionBank] = None) -> 'MillionaireGame':
+        state_format = data[:1]
+        bank_key = 0
+        if state_format == b'\x04':
+            _, level, used_supports, question_id, removed_mask, seed, draws, game_id = _STATE.unpack(data)
+        elif state_format == b'\x05':
+            (_, level, used_supports, question_id, removed_mask, seed, draws, bank_key,
+             game_id) = _STATE_BANK.unpack(data)
+        elif state_format == b'\x03':
+            _, level, used_supports, question_id, removed_mask, seed, draws, bank_key = _STATE_V3.unpack(data)
+            # Journaled before game ids, under its seed
+            game_id = seed
+        elif state_format == b'\x02':
+            _, level, used_supports, question_id, removed_mask, seed, draws = _STATE_V2.unpack(data)
+            game_id = seed
+        elif state_format == b'\x01' and len(data) == _STATE_V1.size:
+            # Saved before question scheduling: start a new schedule past the current question
+            _, level, used_supports, question_id, removed_mask = _STATE_V1.unpack(data)
+            seed, draws = random.getrandbits(32), 1
+            game_id = seed
+        else:
+            raise ValueError(f"Unsupported game state format {data[:1].hex() or 'empty'}")
+        if bank_key and question_bank is None:
+            question_bank = get_bank_registry().by_key(bank_key)
+        game = cls(question_bank=question_bank)
+        game.level = level
+        game.used_supports = used_supports
+        game.question_id = question_id
+        game.removed_mask = removed_mask
+        game.seed = seed
+        game.draws = draws
+        game.game_id = game_id
+        return game
+
+    @property
+    def questions_file(self) -> str:
+        return self.question_bank.questions_file
+
+    @property
+    def current_level(self) -> int:
+        return self.level
+
+    @current_level.setter
+    def current_level(self, value: int):
+        self.level = value
+
+    @property
+    def current_question(self) -> Optional[Question]:
+        """
+        The question in play. If a reload of the bank dropped or renumbered it,
+        another question of the same level is drawn in its place.
+        """
+        if not self.question_id:
+            return None
+        question = self.question_bank.get(self.question_id)
+        if question is None or question.level != self.level:
+            if not self.select_new_question():
+                return None
+            question = self.question_bank.get(self.question_id)
+        return question
+
+    def question_json(self) -> Optional[RawJSON]:
+        """The current question's pre-rendered public payload, for responses"""
+        question = self.current_question
+        if question is None:
+            return None
+        return self.question_bank.question_json(question.id)
+
+    def _question_error(self) -> Optional[Dict]:
+        """
+        The error result when there is no question to play, or when the one the
+        player was shown has just been replaced (see current_question)
+        """
+        question_id = self.question_id
+        question = self.current_question
+        if question is None:
+            return {"status": "error", "message": "Error: 0 question"}
+        if question.id != question_id:
+            return {"status": "error", "message": QUESTION_REPLACED}
+        return None
+
+    @property
+    def removed_answers(self) -> List[int]:
+        return [i for i in (1, 2, 3, 4) if self.removed_mask & (1 << i)]
+
+    @removed_answers.setter
+    def removed_answers(self, answers: List[int]):
+        mask = 0
+        for i in answers:
+            mask |= 1 << i
+        self.removed_mask = mask
+
+    @property
+    def used_fifty_fifty(self) -> bool:
+        return bool(self.used_supports & FIFTY_FIFTY)
+
+    @property
+    def used_change_question(self) -> bool:
+        return bool(self.used_supports & CHANGE_QUESTION)
+
+    @property
+    def used_ai_support(self) -> bool:
+        return bool(self.used_supports & AI_SUPPORT)
+
     def select_new_question(self) -> bool:
-        level_questions = [q for q in self.questions_db if q['level'] == self.current_level]
-        if level_questions:
-            self.current_question = random.choice(level_questions)
-            self.removed_answers = []
+        started = perf_counter()
+        question = self.question_bank.get(self.next_question_id) if self.next_question_id else None
+        if question is not None and question.level == self.level:
+            question_id = question.id
+            self.next_question_id = 0
+        else:
+            # Only the id is needed here, the text is resolved when the question is shown
+            question_id = get_question_scheduler(self.question_bank).draw(
+                self.seed, self.level, self.draws, exclude=self.question_id
+            )
+        self.draws = min(self.draws + 1, 255)
+        _QUESTION_SELECTION.observe(perf_counter() - started)
+        if question_id:
+            self.question_id = question_id
+            self.removed_mask = 0
             return True
         else:
-            print(f"Warning: No questions found for level {self.current_level}")
+            print(f"Warning: No questions found for level {self.level}")
             return False
     
-    def start_game(self) -> Dict:
-        self.current_level = 1
-        self.used_fifty_fifty = False
-        self.used_change_question = False
-        self.used_ai_support = False
-        self.removed_answers = []
+    def prefetch_next_question(self) -> Optional[Question]:
+        """
+        Draw the next level's question ahead of time so its AI hint can be
+        warmed; select_new_question uses it when the player answers correctly.
+        It stays on the server, nothing is sent to the client. It is the first
+        draw of the next level's schedule, exactly what select_new_question
+        would pick, so the rules do not change.
+        """
+        if self.level >= self.max_level:
+            return None
+        question = self.question_bank.get(self.next_question_id) if self.next_question_id else None
+        if question is None or question.level != self.level + 1:
+            question_id = get_question_scheduler(self.question_bank).draw(self.seed, self.level + 1, 0)
+            question = self.question_bank.get(question_id) if question_id else None
+            self.next_question_id = question_id
+        return question
+    
+    def advance_level(self) -> bool:
+        """Move up one level and draw its question, used after a correct answer"""
+        self.level += 1
+        self.draws = 0
+        return self.select_new_question()
+    
+    def start_game(self, seed: Optional[int] = None) -> Dict:
+        """Start from level 1, a fixed ``seed`` replays the same question order"""
+        self.level = 1
+        self.used_supports = 0
+        self.removed_mask = 0
+        self.seed = random.getrandbits(32) if seed is None else seed & 0xFFFFFFFF
+        self.game_id = random.getrandbits(64)
+        self.draws = 0
+        self.question_id = 0
+        self.next_question_id = 0
         self.select_new_question()
+        bank = self.question_bank
+        if bank.bank_key:
+            self._record('start', level=self.level, question=self.question_id, bank=bank.bank_id)
+        else:
+            self._record('start', level=self.level, question=self.question_id)
         return self.get_current_state()
     
     def get_current_state(self) -> Dict:
         """Get the current game state"""
-        if not self.current_question:
+        question = self.current_question
+        if not question:
             return {"error": "No question available"}
         
         return {
-            "level": self.current_level,
-            "question": self.current_question['question'],
-            "answers": {
-                1: self.current_question['answer1'],
-                2: self.current_question['answer2'],
-                3: self.current_question['answer3'],
-                4: self.current_question['answer4']
-            },
+            "level": self.level,
+            "question": question.question,
+            "answers": question.answers,
             "removed_answers": self.removed_answers,
-            "supports": {
-                "fifty_fifty": not self.used_fifty_fifty,
-                "change_question": not self.used_change_question,
-                "ai_support": not self.used_ai_support
-            }
+            "supports": self.supports_state()
+        }
+    
+    def supports_state(self) -> Dict[str, bool]:
+        """Which lifelines are still available"""
+        return {
+            "fifty_fifty": not self.used_fifty_fifty,
+            "change_question": not self.used_change_question,
+            "ai_support": not self.used_ai_support
         }
     
     def check_answer(self, answer: int) -> Dict:
         """Check if the answer is correct"""
-        if not self.current_question:
-            return {"status": "error", "message": "Error: 0 question"}
+        started = perf_counter()
+        question_id = self.question_id
+        level = self.level
+        result = self._check_answer(answer)
+        if result['status'] != 'error':
+            get_answer_stats().record_answer(question_id, result['correct'], self.question_bank.bank_key)
+            self._record('answer', level=level, question=question_id, answer=answer, status=result['status'])
+        _ANSWER_CHECK.observe(perf_counter() - started)
+        _OUTCOMES[result['status']].inc()
+        return result
+    
+    def _check_answer(self, answer: int) -> Dict:
+        error = self._question_error()
+        if error:
+            return error
+        question = self.current_question
         
-        correct_answer = self.current_question['correct']
+        correct_answer = question.correct
         
         if answer == correct_answer:
-            if self.current_level >= self.max_level:
+            if self.level >= self.max_level:
                 return {
                     "status": "won",
                     "correct": True,
@@ -89,12 +305,11 @@ class MillionaireGame:
                     "correct_answer": correct_answer
                 }
             else:
-                self.current_level += 1
-                self.select_new_question()
+                self.advance_level()
                 return {
                     "status": "correct",
                     "correct": True,
-                    "message": f"Correct! Moving to level {self.current_level}",
+                    "message": f"Correct! Moving to level {self.level}",
                     "correct_answer": correct_answer,
                     "new_state": self.get_current_state()
                 }
@@ -105,21 +320,28 @@ class MillionaireGame:
                 "message": "Wrong answer! Game Over.",
                 "correct_answer": correct_answer,
                 "your_answer": answer,
-                "explanation": self.current_question['explanation']
+                "explanation": question.explanation
             }
     
     def use_fifty_fifty(self) -> Dict:
         """Use 50/50 support - remove 2 wrong answers"""
         if self.used_fifty_fifty:
             return {"status": "error", "message": "50/50 used!"}
+        error = self._question_error()
+        if error:
+            return error
         
-        self.used_fifty_fifty = True
-        correct_answer = self.current_question['correct']
+        self.used_supports |= FIFTY_FIFTY
+        correct_answer = self.current_question.correct
         
         # Get two wrong answers to remove
         wrong_answers = [i for i in [1, 2, 3, 4] if i != correct_answer]
         to_remove = random.sample(wrong_answers, 2)
         self.removed_answers = to_remove
+        LIFELINES_USED.inc('fifty_fifty')
+        get_answer_stats().record_lifeline(self.question_id, 'fifty_fifty', self.question_bank.bank_key)
+        self._record('lifeline', level=self.level, question=self.question_id, support='fifty_fifty',
+                     removed=to_remove)
         
         return {
             "status": "success",
@@ -131,8 +353,13 @@ class MillionaireGame:
         if self.used_change_question:
             return {"status": "error", "message": "Used!"}
         
-        self.used_change_question = True
+        self.used_supports |= CHANGE_QUESTION
+        question_id = self.question_id
+        get_answer_stats().record_lifeline(question_id, 'change_question', self.question_bank.bank_key)
         self.select_new_question()
+        self._record('lifeline', level=self.level, question=question_id, support='change_question',
+                     new_question=self.question_id)
+        LIFELINES_USED.inc('change_question')
         
         return {
             "status": "success",
@@ -144,44 +371,185 @@ class MillionaireGame:
         """Use AI support - get explanation hint using Gemini AI"""
         if self.used_ai_support:
             return {"status": "error", "message": "AI support already used!"}
+        error = self._question_error()
+        if error:
+            return error
         
-        self.used_ai_support = True
-        explanation = self.current_question['explanation']
+        self.used_supports |= AI_SUPPORT
+        started = perf_counter()
+        question = self.current_question
+        explanation = question.explanation
+        hint_cache = get_hint_cache()
         
-        # Try to use Gemini AI if available
-        if self.ai_support:
-            try:
-                # Get AI-generated hint based on the explanation
-                answers = {
-                    1: self.current_question['answer1'],
-                    2: self.current_question['answer2'],
-                    3: self.current_question['answer3'],
-                    4: self.current_question['answer4']
-                }
-                
-                ai_hint = self.ai_support.get_ai_hint(
-                    question=self.current_question['question'],
-                    answers=answers,
-                    explanation=explanation
-                )
-                
-                ai_response = f"🤖 AI Assistant: {ai_hint}"
-                
-            except Exception as e:
-                # Fallback to simple explanation if AI fails
-                print(f"AI Support error: {e}")
-                ai_response = self.ai_support.get_simple_hint(explanation)
-        else:
-            # Fallback mode without Gemini API
-            sentences = explanation.split('. ')
-            first_sentence = sentences[0] + '.' if sentences else explanation[:200]
-            ai_response = f"💡 Hint: {first_sentence} Think carefully about this information."
+        # Precomputed hints cost no API call
+        ai_hint = hint_cache.get(question)
+        source = 'cache'
+        if ai_hint is not None:
+            AI_HINTS.inc('cache')
+        elif self.ai_support:
+            # Get AI-generated hint based on the explanation
+            ai_hint = self.ai_support.try_ai_hint(
+                question=question.question,
+                answers=question.answers,
+                explanation=explanation
+            )
+            if ai_hint is not None:
+                AI_HINTS.inc('ai')
+                hint_cache.add(question, ai_hint)
+                source = 'ai'
+        self._log_ai_support(question, source if ai_hint is not None else 'fallback', started)
+        
+        return {
+            "status": "success",
+            "message": "AI support activated!",
+            "ai_response": self.format_ai_response(ai_hint, explanation)
+        }
+    
+    async def use_ai_support_async(self) -> Dict:
+        """Use AI support without blocking the event loop, same results as use_ai_support"""
+        if self.used_ai_support:
+            return {"status": "error", "message": "AI support already used!"}
+        error = self._question_error()
+        if error:
+            return error
+        
+        self.used_supports |= AI_SUPPORT
+        started = perf_counter()
+        question = self.current_question
+        explanation = question.explanation
+        hint_cache = get_hint_cache()
+        
+        ai_hint = await hint_cache.get_async(question)
+        source = 'fallback'
+        if ai_hint is not None:
+            AI_HINTS.inc('cache')
+            source = 'cache'
+        elif self.ai_support:
+            # Too many hints already waiting: answer with the simple hint rather than queue
+            async with get_admission().ai.slot() as admitted:
+                if not admitted:
+                    source = 'shed'
+                else:
+                    ai_hint = await self.ai_support.try_ai_hint_async(
+                        question=question.question,
+                        answers=question.answers,
+                        explanation=explanation
+                    )
+            if ai_hint is not None:
+                AI_HINTS.inc('ai')
+                hint_cache.add(question, ai_hint)
+                source = 'ai'
+        self._log_ai_support(question, source, started)
+        
+        return {
+            "status": "success",
+            "message": "AI support activated!",
+            "ai_response": self.format_ai_response(ai_hint, explanation)
+        }
+    
+    def use_ai_support_stream(self) -> Dict:
+        """
+        Use AI support with the hint streamed as it is generated.
+
+        On success ``events`` is an async iterator of (kind, text): "chunk"
+        appends to the hint shown so far, "hint" replaces it with a complete
+        hint (from the cache, or the fallback when the AI fails midway).
+        """
+        if self.used_ai_support:
+            return {"status": "error", "message": "AI support already used!"}
+        error = self._question_error()
+        if error:
+            return error
         
+        self.used_supports |= AI_SUPPORT
         return {
             "status": "success",
             "message": "AI support activated!",
-            "ai_response": ai_response
+            "events": self._stream_ai_hint(self.current_question)
         }
+    
+    async def _stream_ai_hint(self, question: Question) -> AsyncIterator[Tuple[str, str]]:
+        started = perf_counter()
+        hint_cache = get_hint_cache()
+        ai_hint = await hint_cache.get_async(question)
+        if ai_hint is not None:
+            AI_HINTS.inc('cache')
+            self._log_ai_support(question, 'cache', started)
+            yield 'hint', self.format_ai_response(ai_hint, question.explanation)
+            return
+        
+        source = 'fallback'
+        if self.ai_support:
+            async with get_admission().ai.slot() as admitted:
+                if not admitted:
+                    source = 'shed'
+                else:
+                    parts: List[str] = []
+                    async for chunk in self.ai_support.stream_ai_hint(
+                        question=question.question,
+                        answers=question.answers,
+                        explanation=question.explanation
+                    ):
+                        if chunk is None:
+                            break
+                        yield 'chunk', chunk if parts else AI_HINT_PREFIX + chunk
+                        parts.append(chunk)
+                    else:
+                        if parts:
+                            AI_HINTS.inc('ai')
+                            LIFELINES_USED.inc('ai_support')
+                            get_answer_stats().record_lifeline(self.question_id, 'ai_support',
+                                                               self.question_bank.bank_key)
+                            self._log_ai_support(question, 'ai', started)
+                            hint_cache.add(question, ''.join(parts).strip())
+                            return
+        
+        self._log_ai_support(question, source, started)
+        yield 'hint', self.format_ai_response(None, question.explanation)
+    
+    async def warm_ai_hint(self, question: Question) -> bool:
+        """Generate and cache a hint for a question before it is asked for, returns True if one was added"""
+        hint_cache = get_hint_cache()
+        if not self.ai_support or await hint_cache.variants_async(question):
+            return False
+        # Only with a free slot: players asking for hints now come first
+        async with get_admission().ai.slot(wait=False) as admitted:
+            if not admitted:
+                return False
+            ai_hint = await self.ai_support.try_ai_hint_async(
+                question=question.question,
+                answers=question.answers,
+                explanation=question.explanation
+            )
+        return ai_hint is not None and hint_cache.add(question, ai_hint)
+    
+    def _log_ai_support(self, question: Question, source: str, started: float):
+        """Journal the AI lifeline, where its hint came from and how long that took"""
+        self._record('lifeline', level=self.level, question=question.id, support='ai_support')
+        self._record('ai_hint', question=question.id, source=source,
+                     latency_ms=round((perf_counter() - started) * 1000, 2))
+
+    def _record(self, event: str, **fields):
+        """Journal an event of this game, under its seed and game id"""
+        get_event_log().record(event, self.seed, id=self.game_id, **fields)
+    
+    def format_ai_response(self, ai_hint: Optional[str], explanation: str) -> str:
+        LIFELINES_USED.inc('ai_support')
+        get_answer_stats().record_lifeline(self.question_id, 'ai_support', self.question_bank.bank_key)
+        if ai_hint is not None:
+            return f"{AI_HINT_PREFIX}{ai_hint}"
+        AI_HINTS.inc('fallback')
+        if self.ai_support:
+            # Fallback to simple explanation if AI fails
+            return self.ai_support.get_simple_hint(explanation)
+        return self.fallback_hint(explanation)
+    
+    @staticmethod
+    def fallback_hint(explanation: str) -> str:
+        """Hint used when no Gemini API key is configured"""
+        sentences = explanation.split('. ')
+        first_sentence = sentences[0] + '.' if sentences else explanation[:200]
+        return f"💡 Hint: {first_sentence} Think carefully about this information."
 
 
 def print_separator():
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from question_bank import Question
+
+
+def content_hash(question: Question) -> str:
+    """Hash of everything the hint prompt depends on, so edited questions miss the cache"""
+    digest = hashlib.sha1()
+    for part in (question.question, question.answer1, question.answer2,
+                 question.answer3, question.answer4, question.explanation):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+class HintCache:
+    """
+    Two-tier cache of AI hints keyed by (question id, content hash).
+
+    Hints live in an in-memory LRU in front of an optional SQLite file. Each
+    key can hold up to ``max_variants`` hints and a lookup picks one at random.
+
+    Code on the event loop never touches the file: ``get_async`` and
+    ``variants_async`` answer from memory and read the file from a worker
+    thread on a miss, and ``add`` queues the write for a background writer
+    thread. ``get`` and ``variants`` read the file directly, for blocking
+    callers such as the terminal game.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 10000, max_variants: int = 3):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_variants = max_variants
+        self._memory: "OrderedDict[Tuple[int, str], Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Serializes use of the connection between reader threads and the writer
+        self._db_lock = threading.Lock()
+        self._writes: "queue.Queue[Tuple[int, str, int, str, float]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS hints ("
+                    " question_id INTEGER NOT NULL,"
+                    " content_hash TEXT NOT NULL,"
+                    " variant INTEGER NOT NULL,"
+                    " hint TEXT NOT NULL,"
+                    " created REAL NOT NULL,"
+                    " PRIMARY KEY (question_id, content_hash, variant))"
+                )
+                self._db.commit()
+                self._warm_memory()
+            except sqlite3.Error as e:
+                print(f"Warning: hint cache {path} unavailable, using memory only: {e}")
+                self._db = None
+
+    def _warm_memory(self):
+        rows = self._db.execute(
+            "SELECT question_id, content_hash, hint FROM hints ORDER BY question_id, variant LIMIT ?",
+            (self.max_memory_entries * self.max_variants,)
+        )
+        grouped: Dict[Tuple[int, str], List[str]] = {}
+        for question_id, digest, hint in rows:
+            grouped.setdefault((question_id, digest), []).append(hint)
+        for key, hints in grouped.items():
+            self._remember(key, tuple(hints))
+
+    def _remember(self, key: Tuple[int, str], hints: Tuple[str, ...]):
+        self._memory[key] = hints
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _cached(self, key: Tuple[int, str]) -> Optional[Tuple[str, ...]]:
+        with self._lock:
+            hints = self._memory.get(key)
+            if hints is not None:
+                self._memory.move_to_end(key)
+            return hints
+
+    def _read(self, key: Tuple[int, str]) -> Tuple[str, ...]:
+        """Hints of a key from the file, remembered in memory (blocking)"""
+        if self._db is None:
+            return ()
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT hint FROM hints WHERE question_id = ? AND content_hash = ? ORDER BY variant", key
+            ).fetchall()
+        hints = tuple(row[0] for row in rows)
+        if hints:
+            with self._lock:
+                # Another worker's hints, or ours added while the read ran: keep the longer list
+                if len(hints) > len(self._memory.get(key, ())):
+                    self._remember(key, hints)
+                else:
+                    hints = self._memory[key]
+        return hints
+
+    def variants(self, question: Question) -> Tuple[str, ...]:
+        """All cached hints for a question, memory first then disk (blocking)"""
+        key = (question.id, content_hash(question))
+        hints = self._cached(key)
+        return hints if hints is not None else self._read(key)
+
+    async def variants_async(self, question: Question) -> Tuple[str, ...]:
+        """variants without blocking the event loop, the file is read in a worker thread"""
+        key = (question.id, content_hash(question))
+        hints = self._cached(key)
+        if hints is not None:
+            return hints
+        return await asyncio.to_thread(self._read, key) if self._db is not None else ()
+
+    def _pick(self, hints: Tuple[str, ...]) -> Optional[str]:
+        if not hints:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(hints)
+
+    def get(self, question: Question) -> Optional[str]:
+        """Return one cached hint picked at random, or None on a miss (blocking)"""
+        return self._pick(self.variants(question))
+
+    async def get_async(self, question: Question) -> Optional[str]:
+        """get without blocking the event loop"""
+        return self._pick(await self.variants_async(question))
+
+    def add(self, question: Question, hint: str) -> bool:
+        """
+        Store a hint, returns False if the question already has enough variants.
+        Only memory is consulted, so look the question up first; the file is
+        written by a background thread.
+        """
+        key = (question.id, content_hash(question))
+        with self._lock:
+            hints = self._memory.get(key, ())
+            if hint in hints or len(hints) >= self.max_variants:
+                return False
+            self._remember(key, hints + (hint,))
+            if self._db is not None:
+                self._writes.put((key[0], key[1], len(hints), hint, time.time()))
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="hint-cache-writer", daemon=True)
+                    self._writer.start()
+        return True
+
+    def _write_loop(self):
+        while True:
+            rows = [self._writes.get()]
+            while True:
+                try:
+                    rows.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock, self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO hints VALUES (?, ?, ?, ?, ?)", rows)
+            except sqlite3.Error as e:
+                print(f"Warning: could not save {len(rows)} AI hints: {e}")
+            finally:
+                for _ in rows:
+                    self._writes.task_done()
+
+    def flush(self):
+        """Wait until every added hint is written, e.g. before exiting"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_shared_cache: Optional[HintCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_hint_cache() -> HintCache:
+    """Return the process-wide hint cache, HINT_CACHE_PATH='' keeps it in memory only"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = HintCache(
+                    path=os.getenv('HINT_CACHE_PATH', 'hints.sqlite3') or None,
+                    max_variants=int(os.getenv('HINT_CACHE_VARIANTS', '3')),
+                )
+    return _shared_cache
+
+
+def set_hint_cache(cache: HintCache):
+    """Replace the shared cache, e.g. with an empty memory-only one in benchmarks"""
+    global _shared_cache
+    with _shared_lock:
+        _shared_cache = cache
+
+
+async def precompute_hints(questions: List[Question], cache: HintCache, support,
+                           variants: int = 1, batch_size: int = 8, rate: float = 2.0) -> Dict[str, int]:
+    """
+    Warm the cache for a list of questions.
+
+    Requests are issued in batches of ``batch_size`` and paced to at most
+    ``rate`` requests per second. Questions that already have ``variants``
+    cached hints are skipped.
+    """
+    pending = []
+    for question in questions:
+        missing = variants - len(await cache.variants_async(question))
+        pending.extend([question] * max(missing, 0))
+
+    counts = {"requested": len(pending), "stored": 0, "failed": 0}
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        started = time.monotonic()
+        hints = await asyncio.gather(*[
+            support.try_ai_hint_async(q.question, q.answers, q.explanation) for q in batch
+        ])
+        for question, hint in zip(batch, hints):
+            if hint is None:
+                counts["failed"] += 1
+            elif cache.add(question, hint):
+                counts["stored"] += 1
+        print(f"  {min(start + batch_size, len(pending))}/{len(pending)} hints requested")
+        if rate > 0:
+            await asyncio.sleep(max(0.0, len(batch) / rate - (time.monotonic() - started)))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI hint cache tools")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    precompute = subcommands.add_parser('precompute-hints', help="warm the hint cache for a question bank")
+    precompute.add_argument('--questions', default='questions.json')
+    precompute.add_argument('--cache', default=os.getenv('HINT_CACHE_PATH', 'hints.sqlite3'))
+    precompute.add_argument('--variants', type=int, default=1, help="hints to store per question")
+    precompute.add_argument('--batch-size', type=int, default=8)
+    precompute.add_argument('--rate', type=float, default=2.0, help="maximum requests per second")
+    args = parser.parse_args()
+
+    from ai_support import get_ai_support
+    from question_bank import QuestionBank
+
+    support = get_ai_support()
+    if support is None:
+        parser.error("GEMINI_API_KEY is required to precompute hints")
+
+    bank = QuestionBank(args.questions)
+    cache = HintCache(args.cache, max_variants=max(args.variants, 1))
+    questions = [q for level in bank.levels() for q in bank.questions_for_level(level)]
+    print(f"Precomputing hints for {len(questions)} questions into {args.cache}")
+    counts = asyncio.run(precompute_hints(questions, cache, support, args.variants, args.batch_size, args.rate))
+    cache.flush()
+    print(f"Done: {counts['stored']} stored, {counts['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
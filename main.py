@@ -1,66 +1,296 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+import asyncio
+import json
+import math
+import os
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Optional
-from gamelogic import MillionaireGame
+from pydantic import BaseModel, Field
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Set
+from admission import get_admission
+from answer_stats import get_answer_stats
+from bank_registry import UnknownBank, get_bank_registry
+from event_log import get_event_log
+from fast_json import encode
+from hint_cache import get_hint_cache
+from gamelogic import QUESTION_REPLACED, MillionaireGame
+from metrics import REGISTRY, REQUEST_LATENCY, STAGE_LATENCY, MetricsMiddleware
+from question_bank import reload_question_banks
+from rooms import FINISHED, Room, RoomError, RoomRegistry
+from session_checkpoint import create_session_checkpoint
+from session_locks import IdempotencyCache, IdempotencyKeyReused, SessionGuard
+from session_store import InMemorySessionStore, SessionConflict, SessionStore, SharedSessionStore, SQLiteKeyValue
+from state_token import InvalidToken, StateTokenCodec, TokenClaims, create_token_codec
+from static_assets import AssetCache
 
-app = FastAPI(title="Millionaire Game")
+class TimedJSONResponse(JSONResponse):
+    """
+    JSON response that splices pre-rendered question payloads into the body
+    (see fast_json.encode) and records the time spent serializing it.
+
+    Game handlers return it directly, so FastAPI's generic encoder never walks
+    the body; a plain dict returned by a handler still works as before.
+    """
+
+    def render(self, content) -> bytes:
+        with STAGE_LATENCY.time('serialization'):
+            return encode(content)
+
+app = FastAPI(title="Millionaire Game", default_response_class=TimedJSONResponse)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # Without the rejected input: it may be huge, or not even encodable (a lone surrogate in a session id)
+    errors = [{key: value for key, value in error.items() if key not in ('input', 'ctx')} for error in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": errors})
+
+@app.exception_handler(IdempotencyKeyReused)
+async def idempotency_key_reused(request: Request, exc: IdempotencyKeyReused):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+# Load the default question bank once at import, not on every /api/start; other banks load on first use
+get_bank_registry().get()
     
-# Game state storage (in production, use a proper database)
-game_sessions = {}
+def create_session_store() -> SessionStore:
+    """SESSION_BACKEND=sqlite shares sessions between workers through SESSION_DB_PATH"""
+    ttl_seconds = float(os.getenv('SESSION_TTL_SECONDS', '1800'))
+    max_entries = int(os.getenv('SESSION_MAX_ENTRIES', '100000'))
+    if os.getenv('SESSION_BACKEND', 'memory') == 'sqlite':
+        backend = SQLiteKeyValue(os.getenv('SESSION_DB_PATH', 'sessions.sqlite3'))
+        return SharedSessionStore(backend, MillionaireGame.from_bytes, ttl_seconds, max_entries)
+    return InMemorySessionStore(ttl_seconds, max_entries)
+
+# Game state storage: bounded, idle sessions expire and the least recently used are evicted
+game_sessions: SessionStore = create_session_store()
+# HTML pages are read and compressed once; TEMPLATES_WATCH=1 reloads them on change during development
+templates = AssetCache('templates', watch=os.getenv('TEMPLATES_WATCH') == '1',
+                       cache_control=os.getenv('TEMPLATES_CACHE_CONTROL', 'no-cache'))
+
+REGISTRY.gauge('game_sessions_live', 'Live game sessions').set_function(
+    lambda: game_sessions.stats().get('live_sessions', 0))
+REGISTRY.gauge('game_sessions_approx_bytes', 'Approximate memory held by game sessions').set_function(
+    lambda: game_sessions.stats().get('approx_bytes', 0))
+REGISTRY.gauge('game_sessions_evicted', 'Sessions evicted by the LRU cap since start').set_function(
+    lambda: game_sessions.stats().get('evictions', 0))
+
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '30'))
+_sweeper_task: Optional[asyncio.Task] = None
+# In-memory sessions are checkpointed to a local file and restored at start-up, so restarts keep live games
+session_checkpoint = create_session_checkpoint(game_sessions, MillionaireGame.from_bytes)
+_checkpoint_task: Optional[asyncio.Task] = None
+# Answer statistics are queued in memory and written in batches off the request path
+ANSWER_STATS_FLUSH_INTERVAL = float(os.getenv('ANSWER_STATS_FLUSH_INTERVAL', '5'))
+_stats_task: Optional[asyncio.Task] = None
+
+# "token" keeps no per-player state on the server: games travel in signed state tokens
+SESSION_MODE = os.getenv('SESSION_MODE', 'store')
+_token_codec: Optional[StateTokenCodec] = None
+
+MAX_BATCH_ACTIONS = int(os.getenv('MAX_BATCH_ACTIONS', '100'))
+
+# Requests on the same game run one at a time; retries with the same Idempotency-Key get the first response
+session_guard = SessionGuard(
+    cache=IdempotencyCache(int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '100000')),
+                           float(os.getenv('IDEMPOTENCY_TTL_SECONDS', '300'))),
+    enabled=os.getenv('SESSION_LOCKING', '1') != '0',
+)
+
+# WebSocket games can warm the AI hint of upcoming questions in the background, each warm-up may call the AI backend
+WS_WARM_HINTS = os.getenv('WS_WARM_HINTS', '0') == '1'
+_warming_tasks: Set[asyncio.Task] = set()
+
+# Live rooms: many players answering the questions one host moves through
+rooms = RoomRegistry(max_rooms=int(os.getenv('ROOM_MAX_ROOMS', '100')),
+                     max_players=int(os.getenv('ROOM_MAX_PLAYERS', '10000')))
+
+# Session ids are client chosen: short printable ASCII, so they fit store keys and checkpoint records
+SESSION_ID_MAX_LENGTH = 128
+SESSION_ID_PATTERN = r'^[A-Za-z0-9_.:@-]*$'
+
+def session_id_field(default=...):
+    return Field(default, max_length=SESSION_ID_MAX_LENGTH, pattern=SESSION_ID_PATTERN)
 
 class StartGameRequest(BaseModel):
-    session_id: str
+    session_id: str = session_id_field("")
+    stateless: bool = False
+    bank: str = ""  # question bank id, e.g. "en" or "vi/history"; the default bank if empty
 class AnswerRequest(BaseModel):
-    session_id: str
+    session_id: str = session_id_field("")
     answer: int  
+    state_token: Optional[str] = None
 class SupportRequest(BaseModel):
-    session_id: str
+    session_id: str = session_id_field("")
     support_type: str  # "fifty_fifty", "change_question", "ai_support"
+    state_token: Optional[str] = None
+class BatchAction(BaseModel):
+    action: str  # "start", "answer", "support"
+    session_id: str = session_id_field()
+    answer: Optional[int] = None
+    support_type: Optional[str] = None
+    stateless: bool = False
+    bank: str = ""
+    state_token: Optional[str] = None
+    idempotency_key: Optional[str] = None
+class BatchRequest(BaseModel):
+    actions: List[BatchAction]
+    stop_on_error: bool = False
+
+class RoomJoinRequest(BaseModel):
+    name: str = ""
+class RoomAnswerRequest(BaseModel):
+    player_token: str
+    answer: int
+class RoomHostRequest(BaseModel):
+    host_token: str
+    action: str  # "start", "reveal", "next", "finish"
+
+class GameContext(NamedTuple):
+    game: MillionaireGame
+    session_id: str
+    claims: Optional[TokenClaims] = None
+    finished: bool = False  # won or lost: no further token is issued
+
+def get_token_codec() -> StateTokenCodec:
+    global _token_codec
+    if _token_codec is None:
+        _token_codec = create_token_codec()
+    return _token_codec
+
+def game_scope(session_id: str, state_token: Optional[str] = None) -> str:
+    """Key requests on one game are serialized by: the session, or the token of a stateless game"""
+    return state_token or session_id
+
+def client_address(connection) -> str:
+    """Client address of a request or WebSocket (the proxy's, unless uvicorn runs with --proxy-headers)"""
+    return connection.client.host if connection.client else ""
+
+def admit(retry_after: float):
+    """Turn away a request over its rate limit, before it allocates anything"""
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+async def get_game(session_id: str) -> MillionaireGame:
+    game = await game_sessions.get_async(session_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return game
+
+async def save_game(session_id: str, game: MillionaireGame):
+    try:
+        await game_sessions.save_async(session_id, game)
+    except SessionConflict:
+        raise HTTPException(status_code=409, detail="Session was updated by another request, please retry")
+
+async def load_game(session_id: str, state_token: Optional[str]) -> GameContext:
+    """Resolve the game from a state token if the client sent one, otherwise from the session store"""
+    if state_token:
+        try:
+            codec = get_token_codec()
+            if codec.replay_guard.blocking:
+                claims = await asyncio.to_thread(codec.decode, state_token)
+            else:
+                claims = codec.decode(state_token)
+            game = MillionaireGame.from_bytes(claims.state)
+        except (InvalidToken, ValueError) as e:
+            raise HTTPException(status_code=401, detail=str(e))
+        return GameContext(game, session_id, claims)
+    return GameContext(await get_game(session_id), session_id)
+
+def next_token(context: GameContext) -> Dict[str, str]:
+    """The state token for the game's next step, in token mode"""
+    token = get_token_codec().encode(context.game.to_bytes(), context.claims.nonce, context.claims.counter + 1)
+    return {"state_token": token}
+
+async def commit_game(context: GameContext) -> Dict[str, str]:
+    """
+    Persist a changed game, returns the extra response fields (the next state
+    token in token mode, none once the game has ended)
+    """
+    if context.claims is None:
+        await save_game(context.session_id, context.game)
+        return {}
+    if context.finished:
+        return {}
+    return next_token(context)
+
+def game_error(context: GameContext, detail: str) -> HTTPException:
+    # The spent token was claimed, so hand the client a fresh one for the unchanged game
+    headers = {"X-State-Token": next_token(context)["state_token"]} if context.claims else None
+    # A question replaced by a bank reload is a conflict with the game the client was shown, not a bad request
+    status_code = 409 if detail == QUESTION_REPLACED else 400
+    return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    global _sweeper_task, _stats_task, _checkpoint_task
+    if session_checkpoint:
+        restored = session_checkpoint.restore()
+        if restored:
+            print(f"Restored {restored} game sessions from {session_checkpoint.path}")
+        _checkpoint_task = asyncio.create_task(session_checkpoint.run())
+    _sweeper_task = asyncio.create_task(game_sessions.run_sweeper(SESSION_SWEEP_INTERVAL))
+    _stats_task = asyncio.create_task(get_answer_stats().run_flusher(ANSWER_STATS_FLUSH_INTERVAL))
+
+@app.on_event("shutdown")
+async def stop_session_sweeper():
+    if _sweeper_task:
+        _sweeper_task.cancel()
+    if _checkpoint_task:
+        # Write the sessions changed since the last checkpoint so the next start picks them up
+        _checkpoint_task.cancel()
+        await asyncio.gather(_checkpoint_task, return_exceptions=True)
+        await session_checkpoint.close()
+    if _stats_task:
+        # The flusher writes what is still queued before it exits
+        _stats_task.cancel()
+        await asyncio.gather(_stats_task, return_exceptions=True)
+    # Write the journal's queued events and the hints still queued for disk before the process exits
+    await asyncio.to_thread(get_event_log().close)
+    await asyncio.to_thread(get_hint_cache().flush)
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    with open('templates/home.html', 'r', encoding='utf-8') as f:
-        return HTMLResponse(content=f.read())
+async def root(request: Request):
+    return templates.response('home.html', request)
 
 @app.get("/game-ai-la-trieu-phu", response_class=HTMLResponse)
-async def game_page():
-    with open("templates/index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+async def game_page(request: Request):
+    return templates.response('index.html', request)
 
-@app.post("/api/start")
-async def start_game(request: StartGameRequest):
-    session_id = request.session_id
-    game = MillionaireGame()
+async def new_game(session_id: str, stateless: bool = False, bank: str = "") -> GameContext:
+    """Start a game, kept in the session store or, for stateless games, handed out as a token on commit"""
+    try:
+        game = MillionaireGame(bank=bank)
+    except UnknownBank as e:
+        raise HTTPException(status_code=400, detail=str(e))
     game.start_game()
-    game_sessions[session_id] = game
-    
-    state = game.get_current_state()
-    
+    if stateless or SESSION_MODE == 'token':
+        # Counter -1 so the first token issued for the game is step 0
+        claims = TokenClaims(get_token_codec().new_nonce(), -1, 0, b'')
+        return GameContext(game, session_id, claims)
+    if not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required")
+    await game_sessions.put_async(session_id, game)
+    return GameContext(game, session_id)
+
+def start_result(game: MillionaireGame) -> Dict:
     return {
         "status": "success",
-        "level": state['level'],
-        "question": {
-            "question": state['question'],
-            "answer1": state['answers'][1],
-            "answer2": state['answers'][2],
-            "answer3": state['answers'][3],
-            "answer4": state['answers'][4],
-        },
-        "supports": state['supports']
+        "level": game.level,
+        "question": game.question_json(),
+        "supports": game.supports_state()
     }
 
-@app.post("/api/answer")
-async def check_answer(request: AnswerRequest):
-    session_id = request.session_id
-    if session_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    game = game_sessions[session_id]
-    result = game.check_answer(request.answer)
-    
-    if result['status'] == 'won':
+def answer_result(game: MillionaireGame, answer: int) -> Dict:
+    """Apply an answer to the game, returns the response body or an error dict"""
+    result = game.check_answer(answer)
+
+    if result['status'] == 'error':
+        return result
+    elif result['status'] == 'won':
         return {
             "status": "won",
             "message": result['message'],
@@ -68,20 +298,13 @@ async def check_answer(request: AnswerRequest):
             "correct_answer": result['correct_answer']
         }
     elif result['status'] == 'correct':
-        state = result['new_state']
         return {
             "status": "correct",
             "correct": True,
             "correct_answer": result['correct_answer'],
-            "level": state['level'],
-            "question": {
-                "question": state['question'],
-                "answer1": state['answers'][1],
-                "answer2": state['answers'][2],
-                "answer3": state['answers'][3],
-                "answer4": state['answers'][4],
-            },
-            "supports": state['supports']
+            "level": game.level,
+            "question": game.question_json(),
+            "supports": game.supports_state()
         }
     else:  # game_over
         return {
@@ -92,75 +315,466 @@ async def check_answer(request: AnswerRequest):
             "explanation": result['explanation']
         }
 
-@app.post("/api/support")
-async def use_support(request: SupportRequest):
-    session_id = request.session_id
-    if session_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    game = game_sessions[session_id]
-    support_type = request.support_type
-    
+async def support_result(game: MillionaireGame, support_type: str) -> Dict:
+    """Apply a lifeline to the game, returns the response body or an error dict"""
     if support_type == "fifty_fifty":
         result = game.use_fifty_fifty()
         if result['status'] == 'error':
-            raise HTTPException(status_code=400, detail=result['message'])
-        
-        state = game.get_current_state()
+            return result
+
         return {
             "status": "success",
             "support_type": "fifty_fifty",
             "removed_answers": result['removed_answers'],
-            "supports": state['supports']
+            "supports": game.supports_state()
         }
-    
+
     elif support_type == "change_question":
         result = game.use_change_question()
         if result['status'] == 'error':
-            raise HTTPException(status_code=400, detail=result['message'])
-        
-        state = result['new_state']
+            return result
+
         return {
             "status": "success",
             "support_type": "change_question",
-            "level": state['level'],
-            "question": {
-                "question": state['question'],
-                "answer1": state['answers'][1],
-                "answer2": state['answers'][2],
-                "answer3": state['answers'][3],
-                "answer4": state['answers'][4],
-            },
-            "supports": state['supports']
+            "level": game.level,
+            "question": game.question_json(),
+            "supports": game.supports_state()
         }
-    
+
     elif support_type == "ai_support":
-        result = game.use_ai_support()
+        result = await game.use_ai_support_async()
         if result['status'] == 'error':
-            raise HTTPException(status_code=400, detail=result['message'])
-        
-        state = game.get_current_state()
+            return result
+
         return {
             "status": "success",
             "support_type": "ai_support",
             "ai_response": result['ai_response'],
-            "supports": state['supports']
+            "supports": game.supports_state()
         }
-    
+
+    else:
+        return {"status": "error", "message": "Invalid support type"}
+
+@app.post("/api/start")
+async def start_game(request: StartGameRequest, http_request: Request, idempotency_key: Optional[str] = Header(None)):
+    admit(get_admission().admit_start(client_address(http_request)))
+
+    async def start():
+        context = await new_game(request.session_id, request.stateless, request.bank)
+        extra = await commit_game(context) if context.claims else {}
+        return {**start_result(context.game), **extra}
+
+    scope = "" if request.stateless or SESSION_MODE == 'token' else request.session_id
+    return TimedJSONResponse(await session_guard.run(scope, idempotency_key, start, "start",
+                                                     request.model_dump_json().encode()))
+
+@app.post("/api/answer")
+async def check_answer(request: AnswerRequest, http_request: Request, idempotency_key: Optional[str] = Header(None)):
+    admit(get_admission().admit_request(request.session_id or client_address(http_request)))
+
+    async def answer():
+        context = await load_game(request.session_id, request.state_token)
+        response = answer_result(context.game, request.answer)
+        if response['status'] == 'error':
+            raise game_error(context, response['message'])
+        if response['status'] in ('won', 'game_over'):
+            context = context._replace(finished=True)
+        response.update(await commit_game(context))
+        return response
+
+    scope = game_scope(request.session_id, request.state_token)
+    return TimedJSONResponse(await session_guard.run(scope, idempotency_key, answer, "answer",
+                                                     request.model_dump_json().encode()))
+
+@app.post("/api/support")
+async def use_support(request: SupportRequest, http_request: Request, idempotency_key: Optional[str] = Header(None)):
+    admit(get_admission().admit_request(request.session_id or client_address(http_request)))
+
+    async def support():
+        context = await load_game(request.session_id, request.state_token)
+        response = await support_result(context.game, request.support_type)
+        if response['status'] == 'error':
+            raise game_error(context, response['message'])
+        response.update(await commit_game(context))
+        return response
+
+    scope = game_scope(request.session_id, request.state_token)
+    return TimedJSONResponse(await session_guard.run(scope, idempotency_key, support, "support",
+                                                     request.model_dump_json().encode()))
+
+def sse_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+@app.post("/api/support/stream")
+async def stream_ai_support(request: SupportRequest, http_request: Request):
+    """
+    AI support with the hint streamed as Server-Sent Events.
+
+    Events are "chunk" (text to append), "hint" (complete text replacing what
+    was shown) and finally "done" with the remaining supports. The lifeline
+    is spent and the game saved before the stream starts.
+    """
+    admit(get_admission().admit_request(request.session_id or client_address(http_request)))
+    async with session_guard.hold(game_scope(request.session_id, request.state_token)):
+        context = await load_game(request.session_id, request.state_token)
+        result = context.game.use_ai_support_stream()
+        if result['status'] == 'error':
+            raise game_error(context, result['message'])
+        extra = await commit_game(context)
+    done = {"supports": context.game.supports_state(), **extra}
+
+    async def events():
+        async for event, text in result['events']:
+            yield sse_event(event, text)
+        yield sse_event("done", done)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if extra:
+        headers["X-State-Token"] = extra["state_token"]
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+async def apply_batch_action(action: BatchAction, contexts: Dict[str, GameContext]) -> Dict:
+    """
+    Run one batched action against the games loaded so far in the batch. A
+    game in the session store is saved with every move, while the action
+    still holds its lock, so a move reported as applied is never lost.
+    """
+    if not action.session_id:
+        raise HTTPException(status_code=400, detail="session_id is required")
+    if action.action == "start":
+        context = await new_game(action.session_id, action.stateless, action.bank)
+        contexts[action.session_id] = context
+        return start_result(context.game)
+
+    context = contexts.get(action.session_id)
+    if context is None:
+        context = await load_game(action.session_id, action.state_token)
+        contexts[action.session_id] = context
+
+    if context.finished:
+        raise HTTPException(status_code=400, detail="Game is over")
+    if action.action == "answer":
+        if action.answer is None:
+            raise HTTPException(status_code=400, detail="answer is required")
+        result = answer_result(context.game, action.answer)
+        if result['status'] in ('won', 'game_over'):
+            contexts[action.session_id] = context._replace(finished=True)
+    elif action.action == "support":
+        result = await support_result(context.game, action.support_type or "")
     else:
-        raise HTTPException(status_code=400, detail="Invalid support type")
+        raise HTTPException(status_code=400, detail="Invalid action")
+    if context.claims is None and result['status'] != 'error':
+        try:
+            await save_game(context.session_id, context.game)
+        except HTTPException:
+            # Changed by another request since it was loaded: the next action loads it again
+            del contexts[action.session_id]
+            raise
+    return result
+
+@app.post("/api/batch")
+async def run_batch(request: BatchRequest, http_request: Request):
+    """
+    Apply an ordered list of actions across one or many games in one request.
+
+    Each game is loaded once. Games in the session store are saved after
+    every move, stateless games get a single fresh token per game in
+    ``sessions``. Results follow the order of the actions, a failed action is
+    reported in place and does not undo earlier ones.
+    """
+    if len(request.actions) > MAX_BATCH_ACTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ACTIONS} actions per batch")
+    starts = sum(1 for action in request.actions if action.action == "start")
+    max_starts = get_admission().max_starts()
+    if max_starts is not None and starts > max_starts:
+        # More than the bucket can ever hold: waiting would not help
+        raise HTTPException(status_code=413, detail=f"At most {max_starts} start actions per batch")
+    if starts:
+        admit(get_admission().admit_start(client_address(http_request), starts))
+
+    contexts: Dict[str, GameContext] = {}
+    results = []
+    for action in request.actions:
+        scope = game_scope(action.session_id, action.state_token)
+        if action.action != "start":
+            # Charged like the single-action endpoints: per session, per client address for stateless games
+            context = contexts.get(action.session_id)
+            stateless = action.state_token or (context is not None and context.claims is not None)
+            retry_after = get_admission().admit_request(client_address(http_request) if stateless
+                                                        else action.session_id)
+            if retry_after:
+                results.append({"status": "error", "code": 429, "message": "Too many requests, please slow down",
+                                "retry_after": math.ceil(retry_after)})
+                if request.stop_on_error:
+                    break
+                continue
+        try:
+            result = await session_guard.run(scope, action.idempotency_key,
+                                             lambda: apply_batch_action(action, contexts),
+                                             f"batch:{action.action}", action.model_dump_json().encode())
+        except HTTPException as e:
+            result = {"status": "error", "code": e.status_code, "message": e.detail}
+        except IdempotencyKeyReused as e:
+            result = {"status": "error", "code": 422, "message": str(e)}
+        results.append(result)
+        if request.stop_on_error and result['status'] == 'error':
+            break
+
+    # Games in the session store were saved with each move, stateless games get their next token
+    sessions = {session_id: {"status": "saved", **(await commit_game(context) if context.claims else {})}
+                for session_id, context in contexts.items()}
+
+    return TimedJSONResponse({
+        "results": results,
+        "sessions": sessions
+    })
+
+def warm_hints(game: MillionaireGame, *questions):
+    """Fill the hint cache for questions the player may use AI support on next"""
+    for question in questions:
+        if question is not None:
+            task = asyncio.create_task(game.warm_ai_hint(question))
+            _warming_tasks.add(task)
+            task.add_done_callback(_warming_tasks.discard)
+
+async def socket_message(game: Optional[MillionaireGame], session_id: str, message: Dict):
+    """Handle one WebSocket message, returns the (possibly new) game and the response body"""
+    kind = message.get('type')
+    if kind == 'start':
+        try:
+            game = MillionaireGame(bank=str(message.get('bank') or ''))
+        except UnknownBank as e:
+            return game, {"status": "error", "message": str(e)}
+        game.start_game()
+        if session_id:
+            await game_sessions.put_async(session_id, game)
+        return game, start_result(game)
+    if game is None:
+        return game, {"status": "error", "message": "Start a game first"}
+    if kind == 'answer':
+        answer = message.get('answer')
+        if not isinstance(answer, int):
+            return game, {"status": "error", "message": "answer must be an integer"}
+        return game, answer_result(game, answer)
+    if kind == 'support':
+        return game, await support_result(game, str(message.get('support_type', '')))
+    return game, {"status": "error", "message": "Invalid message type"}
+
+@app.websocket("/ws/game")
+async def game_socket(websocket: WebSocket, session_id: str = Query("", max_length=SESSION_ID_MAX_LENGTH,
+                                                                   pattern=SESSION_ID_PATTERN)):
+    """
+    Play one game over a persistent connection.
+
+    Messages are JSON objects with a ``type`` of "start" (optionally with a
+    ``bank``), "answer" (with ``answer``) or "support" (with
+    ``support_type``); replies carry the same bodies as the HTTP endpoints
+    plus the ``type``. With a ``session_id`` the game is also kept in the
+    session store, so the HTTP endpoints see the same game; each move is
+    saved before its reply is sent, while the game's lock is held. With
+    WS_WARM_HINTS the AI hints of the current question and of the next
+    level's question, drawn ahead on the server and not sent to the client,
+    are then warmed.
+    """
+    await websocket.accept()
+    game: Optional[MillionaireGame] = None
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "status": "error", "message": "Messages must be JSON objects"})
+                continue
+            started = perf_counter()
+            kind = message.get('type') if message.get('type') in ('start', 'answer', 'support') else 'invalid'
+            if kind == 'start':
+                retry_after = get_admission().admit_start(client_address(websocket))
+            else:
+                retry_after = get_admission().admit_request(session_id or client_address(websocket))
+            if retry_after:
+                await websocket.send_json({"type": kind, "status": "error", "message": "Too many requests, please slow down",
+                                           "retry_after": math.ceil(retry_after)})
+                continue
+            async with session_guard.hold(session_id):
+                game, response = await socket_message(game, session_id, message)
+                if session_id and kind != 'start' and game is not None and response['status'] != 'error':
+                    # Saved before the reply and under the lock, like the HTTP handlers
+                    try:
+                        await save_game(session_id, game)
+                    except HTTPException as e:
+                        # Changed by another request meanwhile: the move is lost, go on from the stored game
+                        response = {"status": "error", "message": e.detail}
+                        game = await game_sessions.get_async(session_id)
+            await websocket.send_text(encode({"type": kind, **response}).decode('utf-8'))
+            ok = response['status'] != 'error'
+            REQUEST_LATENCY.observe(perf_counter() - started, f"ws_{kind}", 'WS', '200' if ok else '400')
+            if not ok or game is None:
+                continue
+            if response['status'] in ('won', 'game_over'):
+                continue
+            if WS_WARM_HINTS and not game.used_ai_support:
+                # The question the player sees now and the one drawn for the next level
+                warm_hints(game, game.current_question, game.prefetch_next_question())
+    except WebSocketDisconnect:
+        pass
+
+def get_room(room_id: str) -> Room:
+    room = rooms.get(room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return room
+
+@app.post("/api/rooms")
+async def create_room(http_request: Request):
+    """Open a room, the host token is needed to move its game on"""
+    admit(get_admission().admit_start(client_address(http_request)))
+    try:
+        room = rooms.create()
+    except RoomError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"room_id": room.room_id, "host_token": room.host_token, "max_players": room.max_players}
+
+@app.post("/api/rooms/{room_id}/join")
+async def join_room(room_id: str, request: RoomJoinRequest):
+    room = get_room(room_id)
+    try:
+        token, slot = room.join(request.name)
+    except RoomError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"player_token": token, "player": slot, "state": room.state}
+
+@app.post("/api/rooms/{room_id}/answer")
+async def answer_in_room(room_id: str, request: RoomAnswerRequest):
+    try:
+        answered = get_room(room_id).answer(request.player_token, request.answer)
+    except RoomError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "accepted", "answered": answered}
+
+@app.post("/api/rooms/{room_id}/host")
+async def host_room(room_id: str, request: RoomHostRequest):
+    room = get_room(room_id)
+    if not room.is_host(request.host_token):
+        raise HTTPException(status_code=403, detail="Only the host can do that")
+    try:
+        return TimedJSONResponse({"status": "success", **room.host_action(request.action)})
+    except RoomError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/rooms/{room_id}")
+async def get_room_state(room_id: str):
+    room = get_room(room_id)
+    return TimedJSONResponse({**room.snapshot_payload(), **room.stats()})
+
+@app.get("/api/rooms/{room_id}/events")
+async def room_events(room_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Room updates as Server-Sent Events: a "snapshot" of the room, then
+    "question", "tally", "reveal" and "finished" events. Reconnecting with
+    Last-Event-ID resumes where the stream stopped. Every frame is encoded
+    once by the room and shared by all listeners. Ends when the game is over.
+    """
+    room = get_room(room_id)
+
+    async def events():
+        if last_event_id and last_event_id.isdigit():
+            cursor = int(last_event_id)
+        else:
+            cursor, _, frame = room.snapshot()
+            yield frame
+        while not (room.state == FINISHED and cursor >= room.seq):
+            for cursor, _, frame in await room.updates(cursor):
+                yield frame
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@app.websocket("/ws/rooms/{room_id}")
+async def room_socket(websocket: WebSocket, room_id: str, player_token: str = ""):
+    """
+    Follow a room and answer over one connection. The server sends the room
+    snapshot and then every update (the same JSON as the SSE events); players
+    send {"type": "answer", "answer": 2} and get {"type": "answer", ...} back.
+    Without a player token the connection only watches.
+    """
+    await websocket.accept()
+    room = rooms.get(room_id)
+    if room is None:
+        await websocket.close(code=4404)
+        return
+    cursor, text, _ = room.snapshot()
+    await websocket.send_text(text)
+
+    async def send_updates(cursor: int):
+        while True:
+            for cursor, text, _ in await room.updates(cursor):
+                await websocket.send_text(text)
+
+    writer = asyncio.create_task(send_updates(cursor))
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            if not isinstance(message, dict) or message.get('type') != 'answer':
+                await websocket.send_json({"type": "error", "status": "error", "message": "Send answer messages"})
+                continue
+            try:
+                answered = room.answer(player_token, message.get('answer'))
+                await websocket.send_json({"type": "answer", "status": "accepted", "answered": answered})
+            except RoomError as e:
+                await websocket.send_json({"type": "answer", "status": "error", "message": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writer.cancel()
+
+@app.get("/api/banks")
+async def list_banks():
+    """Question banks a game can be started on"""
+    return {"banks": get_bank_registry().banks()}
 
 @app.get("/api/session/{session_id}")
 async def get_session(session_id: str):
-    if session_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    game = game_sessions[session_id]
-    state = game.get_current_state()
+    game = await get_game(session_id)
+    return {
+        "level": game.level,
+        "supports": game.supports_state()
+    }
+
+@app.get("/api/stats")
+async def get_stats():
+    return {
+        "sessions": game_sessions.stats(),
+        "answer_stats": get_answer_stats().stats(),
+        "event_log": get_event_log().stats(),
+        "session_guard": session_guard.stats(),
+        "rooms": rooms.stats(),
+        "banks": get_bank_registry().stats(),
+        "admission": get_admission().stats(),
+        "checkpoint": session_checkpoint.stats() if session_checkpoint else None
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/admin/reload-questions")
+async def reload_questions(x_admin_token: Optional[str] = Header(None)):
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
     
     return {
-        "level": state['level'],
-        "supports": state['supports']
+        "status": "success",
+        "questions": {**reload_question_banks(), **get_bank_registry().reload()}
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,237 @@
+"""
+Minimal Prometheus-style metrics.
+
+Metrics are plain in-process objects. Hot paths bind their label values once
+with ``labels()`` so an update is a bisect and two list adds; ``render``
+produces the Prometheus text exposition format for the /metrics endpoint.
+Label values are passed positionally in the order given by ``labelnames``.
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format: backslash, double quote and line feed"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterChild:
+    __slots__ = ('cell',)
+
+    def __init__(self, cell: List[float]):
+        self.cell = cell
+
+    def inc(self, amount: float = 1.0):
+        self.cell[0] += amount
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def labels(self, *labels: str) -> _CounterChild:
+        """Bind label values once, for counters incremented on the hot path"""
+        cell = self._values.get(labels)
+        if cell is None:
+            cell = self._values[labels] = [0.0]
+        return _CounterChild(cell)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        cell = self._values.get(labels)
+        if cell is None:
+            cell = self._values[labels] = [0.0]
+        cell[0] += amount
+
+    def value(self, *labels: str) -> float:
+        cell = self._values.get(labels)
+        return cell[0] if cell else 0.0
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {cell[0]}"
+                for labels, cell in sorted(self._values.items())]
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from a callback at scrape time instead of on every change"""
+        self.function = function
+
+    def value(self) -> float:
+        return float(self.function()) if self.function else self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.value()}"]
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child: '_HistogramChild'):
+        self.child = child
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(perf_counter() - self.started)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'series')
+
+    def __init__(self, buckets: Tuple[float, ...], series: List[float]):
+        self.buckets = buckets
+        self.series = series
+
+    def observe(self, value: float):
+        series = self.series
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def labels(self, *labels: str) -> _HistogramChild:
+        """Bind label values once, for histograms observed on the hot path"""
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        return _HistogramChild(self.buckets, series)
+
+    def observe(self, value: float, *labels: str):
+        self.labels(*labels).observe(value)
+
+    def time(self, *labels: str) -> _Timer:
+        """Context manager observing the elapsed wall time of its block"""
+        return _Timer(self.labels(*labels))
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._metrics.get(name) or self.register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            # HELP text escapes only backslash and line feed
+            documentation = metric.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+            lines.append(f"# HELP {metric.name} {documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by handler', ('handler', 'method', 'status'))
+STAGE_LATENCY = REGISTRY.histogram(
+    'game_stage_duration_seconds', 'Time spent per processing stage', ('stage',))
+GAME_OUTCOMES = REGISTRY.counter(
+    'game_answers_total', 'Answers checked by outcome (correct, won, game_over)', ('outcome',))
+LIFELINES_USED = REGISTRY.counter(
+    'game_lifelines_used_total', 'Lifelines used by type', ('support_type',))
+AI_HINTS = REGISTRY.counter(
+    'ai_hints_total', 'AI support hints served by source (cache, ai, fallback)', ('source',))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per handler, method and status"""
+
+    def __init__(self, app, histogram: Histogram = REQUEST_LATENCY):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = '500'
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = str(message['status'])
+            await send(message)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched endpoint in the scope, which keeps label cardinality low
+            handler = getattr(scope.get('endpoint'), '__name__', 'unmatched')
+            self.histogram.observe(perf_counter() - started, handler, scope['method'], status)
@@ -0,0 +1,166 @@
+import os
+import random
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fast_json import RawJSON, dumps
+
+
+class Question(NamedTuple):
+    """Immutable question record shared by every game in the process"""
+    id: int
+    level: int
+    question: str
+    answer1: str
+    answer2: str
+    answer3: str
+    answer4: str
+    correct: int
+    explanation: str
+
+    @property
+    def answers(self) -> Dict[int, str]:
+        return {1: self.answer1, 2: self.answer2, 3: self.answer3, 4: self.answer4}
+
+
+def question_payload(question: Question) -> RawJSON:
+    """The question as players see it, encoded once: text and the four answers, never the correct one"""
+    return RawJSON(dumps({
+        "question": question.question,
+        "answer1": question.answer1,
+        "answer2": question.answer2,
+        "answer3": question.answer3,
+        "answer4": question.answer4,
+    }))
+
+
+class QuestionBank:
+    """
+    Process-wide, read-only question bank indexed by level.
+
+    The bank is loaded once and shared by reference between games. ``reload``
+    builds fresh indexes and swaps them in with a single assignment, so games
+    that are mid-request keep reading a consistent snapshot.
+    """
+
+    # Set by the bank registry, games on any bank but the default pack the key into their state
+    bank_id = ''
+    bank_key = 0
+    # Created on the first draw, see question_scheduler.get_question_scheduler
+    scheduler = None
+
+    def __init__(self, questions_file: str = 'questions.json'):
+        self.questions_file = questions_file
+        self._lock = threading.Lock()
+        # (by_id, by_level, encoded payload by id) swapped atomically on reload
+        self._index: Tuple[Dict[int, Question], Dict[int, Tuple[Question, ...]], Dict[int, RawJSON]] = ({}, {}, {})
+        self.load()
+
+    def load(self) -> int:
+        """
+        Load the questions and rebuild the indexes, returns the question count.
+
+        A compiled snapshot (see question_ingest.py) next to the questions file
+        is used when it is up to date, otherwise the file is parsed and validated.
+        """
+        # Imported here, question_ingest builds on Question defined above
+        from question_ingest import ingest, read_snapshot, snapshot_is_fresh, snapshot_path
+
+        snapshot = snapshot_path(self.questions_file)
+        if snapshot_is_fresh(snapshot, self.questions_file):
+            questions = read_snapshot(snapshot)
+        elif not os.path.exists(self.questions_file):
+            print(f"Error: {self.questions_file} not found!")
+            questions = []
+        else:
+            questions, report = ingest([self.questions_file])
+            if report.rejected:
+                print(f"Warning: {self.questions_file}: skipped {report.rejected} invalid questions "
+                      f"(run 'python question_ingest.py check {self.questions_file}' for details)")
+
+        by_id: Dict[int, Question] = {}
+        grouped: Dict[int, List[Question]] = {}
+        for question in questions:
+            by_id[question.id] = question
+            grouped.setdefault(question.level, []).append(question)
+
+        by_level = {level: tuple(items) for level, items in grouped.items()}
+        payloads = {question_id: question_payload(question) for question_id, question in by_id.items()}
+        self._index = (by_id, by_level, payloads)
+        return len(by_id)
+
+    def reload(self) -> int:
+        """Reload the questions file without disturbing games in progress"""
+        with self._lock:
+            return self.load()
+
+    def __len__(self) -> int:
+        return len(self._index[0])
+
+    def get(self, question_id: int) -> Optional[Question]:
+        return self._index[0].get(question_id)
+
+    def question_json(self, question_id: int) -> Optional[RawJSON]:
+        """Pre-rendered public payload of a question, see question_payload"""
+        return self._index[2].get(question_id)
+
+    def levels(self) -> List[int]:
+        return sorted(self._index[1])
+
+    def questions_for_level(self, level: int) -> Tuple[Question, ...]:
+        return self._index[1].get(level, ())
+
+    def level_size(self, level: int) -> int:
+        return len(self._index[1].get(level, ()))
+
+    def question_id_at(self, level: int, position: int) -> int:
+        """Id of the question at a position within its level, in bank order"""
+        return self._index[1][level][position].id
+
+    def random_question_id(self, level: int) -> int:
+        """Pick a random question id for a level, 0 if the level has none"""
+        candidates = self._index[1].get(level)
+        return random.choice(candidates).id if candidates else 0
+
+    def random_question(self, level: int) -> Optional[Question]:
+        """Pick a random question for a level in O(1)"""
+        candidates = self._index[1].get(level)
+        if not candidates:
+            return None
+        return random.choice(candidates)
+
+
+_banks: Dict[str, QuestionBank] = {}
+_banks_lock = threading.Lock()
+
+
+def create_question_bank(questions_file: str = 'questions.json') -> QuestionBank:
+    """QUESTION_STORE=mmap serves questions from a shared memory-mapped snapshot instead of the heap"""
+    if os.getenv('QUESTION_STORE', 'memory') == 'mmap':
+        from question_ingest import MappedQuestionBank
+        return MappedQuestionBank(questions_file)
+    return QuestionBank(questions_file)
+
+
+def get_question_bank(questions_file: str = 'questions.json') -> QuestionBank:
+    """Return the shared bank for a file, loading it on first use"""
+    bank = _banks.get(questions_file)
+    if bank is not None:
+        return bank
+    key = os.path.abspath(questions_file)
+    bank = _banks.get(key)
+    if bank is None:
+        with _banks_lock:
+            bank = _banks.get(key)
+            if bank is None:
+                bank = create_question_bank(questions_file)
+                _banks[key] = bank
+    # Also remember the name as given, so later lookups skip path normalization
+    _banks[questions_file] = bank
+    return bank
+
+
+def reload_question_banks() -> Dict[str, int]:
+    """Reload every loaded bank, returns question counts keyed by file"""
+    unique = {id(bank): bank for bank in list(_banks.values())}
+    return {bank.questions_file: bank.reload() for bank in unique.values()}
@@ -0,0 +1,439 @@
+"""
+Question bank ingestion: streaming JSON/JSONL parsing, validation,
+deduplication and compiled binary snapshots.
+
+    python question_ingest.py compile questions.json [more.jsonl ...] -o questions.qbank
+
+Snapshot layout (little endian):
+
+    header   magic "MQBK", format, level count, question count
+    levels   (level, first entry, entry count) per level, ascending
+    entries  (id, data offset, level, correct) per question, grouped by level
+    ids      (id, entry index) sorted by id, for lookups by id
+    data     per question: question, answer1-4 and explanation as UTF-8,
+             each terminated by a NUL byte
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fast_json import RawJSON
+from question_bank import Question, QuestionBank, question_payload
+
+SNAPSHOT_MAGIC = b'MQBK'
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_SUFFIX = '.qbank'
+_SNAPSHOT_HEADER = struct.Struct('<4sBxHI')
+_LEVEL = struct.Struct('<B3xII')
+_ENTRY = struct.Struct('<IIBB2x')
+_ID_INDEX = struct.Struct('<II')
+_FIELDS_PER_QUESTION = 6
+
+TEXT_FIELDS = ('question', 'answer1', 'answer2', 'answer3', 'answer4')
+# Limits of the packed game state (see gamelogic._STATE)
+MAX_QUESTION_ID = 2 ** 32 - 1
+MAX_LEVEL = 255
+
+
+class IngestReport:
+    """Counts rows and collects the reasons bad rows were skipped"""
+
+    def __init__(self, max_errors: int = 1000):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.errors: List[Tuple[str, int, str]] = []
+
+    def error(self, source: str, row: int, message: str):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((source, row, message))
+
+    def summary(self) -> str:
+        return (f"{self.rows} rows, {self.accepted} questions, "
+                f"{self.duplicates} duplicate ids replaced, {self.rejected} rejected")
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_question(item: Any, default_id: int) -> Tuple[Optional[Question], Optional[str]]:
+    """Build a Question from a raw record, returns (question, None) or (None, reason)"""
+    if not isinstance(item, dict):
+        return None, "row is not an object"
+
+    question_id = item.get('id', default_id)
+    if not _is_int(question_id) or not 1 <= question_id <= MAX_QUESTION_ID:
+        return None, f"id must be an integer between 1 and {MAX_QUESTION_ID}"
+    level = item.get('level')
+    if not _is_int(level) or not 1 <= level <= MAX_LEVEL:
+        return None, f"level must be an integer between 1 and {MAX_LEVEL}"
+    correct = item.get('correct')
+    if not _is_int(correct) or not 1 <= correct <= 4:
+        return None, "correct must be an integer between 1 and 4"
+    for field in TEXT_FIELDS:
+        value = item.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None, f"{field} must be a non-empty string"
+        if '\x00' in value:
+            return None, f"{field} must not contain NUL characters"
+    explanation = item.get('explanation', '')
+    if not isinstance(explanation, str) or '\x00' in explanation:
+        return None, "explanation must be a string without NUL characters"
+
+    return Question(
+        id=question_id,
+        level=level,
+        question=item['question'],
+        answer1=item['answer1'],
+        answer2=item['answer2'],
+        answer3=item['answer3'],
+        answer4=item['answer4'],
+        correct=correct,
+        explanation=explanation,
+    ), None
+
+
+def _iter_json_array(f, chunk_size: int) -> Iterator[Tuple[int, Any]]:
+    """Yield the elements of a top-level JSON array without reading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+    row = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buffer) or not started:
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError("unexpected end of file, missing ']'")
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+                continue
+            if buffer[pos] != '[':
+                raise ValueError("expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element continues past the buffer, read more and retry
+            more = f.read(chunk_size)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        row += 1
+        yield row, item
+        pos = end
+
+
+def iter_records(path: str, chunk_size: int = 1 << 16) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (row, record) from a JSON array or JSON Lines file.
+
+    JSONL is detected by extension or by the first character. A JSONL line
+    that does not parse is yielded as a ValueError so the caller can report
+    it and carry on.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if path.endswith(('.jsonl', '.ndjson')) or first == '{':
+            for row, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield row, json.loads(line)
+                except ValueError as e:
+                    yield row, ValueError(f"invalid JSON: {e}")
+        else:
+            yield from _iter_json_array(f, chunk_size)
+
+
+def ingest(paths: Iterable[str], report: Optional[IngestReport] = None) -> Tuple[List[Question], IngestReport]:
+    """
+    Read, validate and deduplicate question files.
+
+    Rows without an id are numbered by position. A later row with the same
+    id replaces the earlier one, so files listed later override earlier ones.
+    """
+    report = report or IngestReport()
+    by_id: Dict[int, Question] = {}
+    for path in paths:
+        row = 0
+        try:
+            for row, item in iter_records(path):
+                report.rows += 1
+                if isinstance(item, ValueError):
+                    report.error(path, row, str(item))
+                    continue
+                question, reason = validate_question(item, row)
+                if question is None:
+                    report.error(path, row, reason)
+                    continue
+                if question.id in by_id:
+                    report.duplicates += 1
+                by_id[question.id] = question
+        except ValueError as e:
+            # A broken JSON array cannot be resumed, keep the rows read so far
+            report.error(path, row + 1, f"invalid JSON: {e}")
+    report.accepted = len(by_id)
+    return list(by_id.values()), report
+
+
+def snapshot_path(questions_file: str) -> str:
+    """Snapshot compiled next to a questions file, questions.json -> questions.qbank"""
+    if questions_file.endswith(SNAPSHOT_SUFFIX):
+        return questions_file
+    return os.path.splitext(questions_file)[0] + SNAPSHOT_SUFFIX
+
+
+def snapshot_is_fresh(snapshot: str, source: str) -> bool:
+    """True if the snapshot exists and is not older than its source file"""
+    try:
+        snapshot_mtime = os.stat(snapshot).st_mtime
+    except OSError:
+        return False
+    try:
+        return snapshot_mtime >= os.stat(source).st_mtime
+    except OSError:
+        return True
+
+
+def write_snapshot(questions: List[Question], path: str) -> int:
+    """Compile questions into a binary snapshot, returns its size in bytes"""
+    ordered = sorted(questions, key=lambda q: (q.level, q.id))
+    levels: List[Tuple[int, int, int]] = []
+    entries = bytearray()
+    data = bytearray()
+    for index, question in enumerate(ordered):
+        if levels and levels[-1][0] == question.level:
+            level, first, count = levels[-1]
+            levels[-1] = (level, first, count + 1)
+        else:
+            levels.append((question.level, index, 1))
+        entries += _ENTRY.pack(question.id, len(data), question.level, question.correct)
+        for text in (question.question, question.answer1, question.answer2, question.answer3,
+                     question.answer4, question.explanation):
+            data += text.encode('utf-8')
+            data += b'\x00'
+
+    id_index = b''.join(_ID_INDEX.pack(question_id, index) for question_id, index in
+                        sorted((q.id, i) for i, q in enumerate(ordered)))
+    header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, len(levels), len(ordered))
+
+    # Write to a temporary file and rename, so readers never map a half-written snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(b''.join(_LEVEL.pack(*level) for level in levels))
+        f.write(entries)
+        f.write(id_index)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def read_snapshot(path: str) -> List[Question]:
+    """Decode every question of a snapshot, ordered by level then id"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, snapshot_format, level_count, count = _SNAPSHOT_HEADER.unpack_from(view)
+            if magic != SNAPSHOT_MAGIC or snapshot_format != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path} is not a question snapshot (format {SNAPSHOT_FORMAT})")
+            entries_start = _SNAPSHOT_HEADER.size + level_count * _LEVEL.size
+            data_start = entries_start + count * (_ENTRY.size + _ID_INDEX.size)
+
+            entries = _ENTRY.iter_unpack(view[entries_start:entries_start + count * _ENTRY.size])
+            # Records are stored back to back, so one decode and split covers every text field
+            texts = view[data_start:].decode('utf-8').split('\x00')
+            questions = []
+            for index, (question_id, _, level, correct) in enumerate(entries):
+                base = index * _FIELDS_PER_QUESTION
+                question, answer1, answer2, answer3, answer4, explanation = texts[base:base + _FIELDS_PER_QUESTION]
+                questions.append(Question(question_id, level, question, answer1, answer2, answer3,
+                                          answer4, correct, explanation))
+            return questions
+
+
+class _MappedSnapshot:
+    """Views into one snapshot (a mapped file or bytes), replaced as a whole on reload"""
+
+    def __init__(self, data):
+        self.data = data
+        magic, snapshot_format, level_count, self.count = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or snapshot_format != SNAPSHOT_FORMAT:
+            raise ValueError(f"not a question snapshot (format {SNAPSHOT_FORMAT})")
+        # level -> (first entry, entry count)
+        self.levels: Dict[int, Tuple[int, int]] = {
+            level: (first, count) for level, first, count in
+            _LEVEL.iter_unpack(data[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + level_count * _LEVEL.size])
+        }
+        self.entries_start = _SNAPSHOT_HEADER.size + level_count * _LEVEL.size
+        ids_start = self.entries_start + self.count * _ENTRY.size
+        self.data_start = ids_start + self.count * _ID_INDEX.size
+        # (id, entry) pairs read as native uint32, so this needs a little-endian host;
+        # the even slots are the sorted ids
+        pairs = memoryview(data)[ids_start:self.data_start].cast('I')
+        self.ids = pairs[0::2]
+        self.id_entries = pairs[1::2]
+
+    @classmethod
+    def open(cls, path: str) -> '_MappedSnapshot':
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def decode(self, entry: int) -> Question:
+        question_id, offset, level, correct = _ENTRY.unpack_from(self.data, self.entries_start + entry * _ENTRY.size)
+        start = self.data_start + offset
+        end = start
+        for _ in range(_FIELDS_PER_QUESTION):
+            end = self.data.find(b'\x00', end) + 1
+        question, answer1, answer2, answer3, answer4, explanation = \
+            self.data[start:end - 1].decode('utf-8').split('\x00')
+        return Question(question_id, level, question, answer1, answer2, answer3, answer4, correct, explanation)
+
+    def question_id(self, entry: int) -> int:
+        return _ENTRY.unpack_from(self.data, self.entries_start + entry * _ENTRY.size)[0]
+
+
+_EMPTY_SNAPSHOT = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, 0, 0)
+
+
+class MappedQuestionBank(QuestionBank):
+    """
+    Question bank served straight from a memory-mapped snapshot.
+
+    Only the level table is read at start-up. Question text is decoded when
+    a game shows the question or asks for a hint, and the most recent decodes
+    are kept in a small LRU. Workers mapping the same file share its pages
+    through the OS page cache, so per-worker memory stays flat as the bank
+    grows. A missing or stale snapshot is compiled from the questions file.
+    """
+
+    def __init__(self, questions_file: str = 'questions.json', cache_size: int = 4096):
+        self.cache_size = cache_size
+        super().__init__(questions_file)
+
+    def load(self) -> int:
+        snapshot = snapshot_path(self.questions_file)
+        if snapshot_is_fresh(snapshot, self.questions_file):
+            mapped = _MappedSnapshot.open(snapshot)
+        elif not os.path.exists(self.questions_file):
+            print(f"Error: {self.questions_file} not found!")
+            mapped = _MappedSnapshot(_EMPTY_SNAPSHOT)
+        else:
+            questions, report = ingest([self.questions_file])
+            if report.rejected:
+                print(f"Warning: {self.questions_file}: skipped {report.rejected} invalid questions "
+                      f"(run 'python question_ingest.py check {self.questions_file}' for details)")
+            write_snapshot(questions, snapshot)
+            mapped = _MappedSnapshot.open(snapshot)
+
+        # Swapped together with fresh caches, a reload never serves text from the old file
+        decode = lru_cache(maxsize=self.cache_size)(mapped.decode)
+        payload = lru_cache(maxsize=self.cache_size)(lambda entry: question_payload(decode(entry)))
+        self._index = (mapped, decode, payload)
+        return mapped.count
+
+    def __len__(self) -> int:
+        return self._index[0].count
+
+    @staticmethod
+    def _entry(mapped: '_MappedSnapshot', question_id: int) -> Optional[int]:
+        position = bisect_left(mapped.ids, question_id)
+        if position == mapped.count or mapped.ids[position] != question_id:
+            return None
+        return mapped.id_entries[position]
+
+    def get(self, question_id: int) -> Optional[Question]:
+        mapped, decode, _ = self._index
+        entry = self._entry(mapped, question_id)
+        return None if entry is None else decode(entry)
+
+    def question_json(self, question_id: int) -> Optional[RawJSON]:
+        """Encoded when a question is first shown, then kept in an LRU like its text"""
+        mapped, _, payload = self._index
+        entry = self._entry(mapped, question_id)
+        return None if entry is None else payload(entry)
+
+    def levels(self) -> List[int]:
+        return sorted(self._index[0].levels)
+
+    def questions_for_level(self, level: int) -> Tuple[Question, ...]:
+        """Decodes the whole level, meant for offline tools rather than request handling"""
+        mapped = self._index[0]
+        first, count = mapped.levels.get(level, (0, 0))
+        return tuple(mapped.decode(entry) for entry in range(first, first + count))
+
+    def level_size(self, level: int) -> int:
+        return self._index[0].levels.get(level, (0, 0))[1]
+
+    def question_id_at(self, level: int, position: int) -> int:
+        mapped = self._index[0]
+        return mapped.question_id(mapped.levels[level][0] + position)
+
+    def random_question_id(self, level: int) -> int:
+        mapped = self._index[0]
+        first, count = mapped.levels.get(level, (0, 0))
+        return mapped.question_id(first + random.randrange(count)) if count else 0
+
+    def random_question(self, level: int) -> Optional[Question]:
+        mapped, decode = self._index[:2]
+        first, count = mapped.levels.get(level, (0, 0))
+        return decode(first + random.randrange(count)) if count else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate question files and compile a binary snapshot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compile_parser = subparsers.add_parser('compile', help="Validate, deduplicate and write a snapshot")
+    compile_parser.add_argument('files', nargs='+', help="JSON or JSONL question files, later files win on id")
+    compile_parser.add_argument('-o', '--output', help="Snapshot path (default: next to the first file)")
+    compile_parser.add_argument('--strict', action='store_true', help="Do not write a snapshot if any row is bad")
+    check_parser = subparsers.add_parser('check', help="Validate only")
+    check_parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    questions, report = ingest(args.files)
+    for source, row, message in report.errors:
+        print(f"{source}:{row}: {message}", file=sys.stderr)
+    if report.rejected > len(report.errors):
+        print(f"... {report.rejected - len(report.errors)} more bad rows", file=sys.stderr)
+    print(report.summary())
+
+    if args.command == 'check' or (args.strict and report.rejected):
+        sys.exit(1 if report.rejected else 0)
+    output = args.output or snapshot_path(args.files[0])
+    size = write_snapshot(questions, output)
+    print(f"Wrote {output} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import threading
+from array import array
+from math import gcd
+from typing import Dict, Tuple
+
+from question_bank import QuestionBank
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(value: int) -> int:
+    """splitmix64 finalizer: a fixed, well-spread hash so draws are reproducible everywhere"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def permutation(seed: int, level: int, size: int) -> Tuple[int, int]:
+    """
+    (step, offset) of a per-session permutation of a level's questions.
+
+    Position k maps to (step * k + offset) % size, which visits every index
+    once per ``size`` draws because step is coprime with size. Nothing is
+    materialized, so this is O(1) in time and memory whatever the bank size.
+    """
+    if size <= 1:
+        return 1, 0
+    mixed = _mix((seed << 8) | level)
+    step = 1 + mixed % (size - 1)
+    while gcd(step, size) != 1:
+        step = step % (size - 1) + 1
+    return step, (mixed >> 32) % size
+
+
+class QuestionScheduler:
+    """
+    Chooses each session's questions without repeats.
+
+    A game keeps only a seed and a per-level draw cursor; the n-th question it
+    sees at a level is the n-th position of its own permutation, so change
+    question never hands back a question already shown.
+
+    With ``balance_exposure`` every draw looks at two positions of the
+    permutation and takes the question shown less often across all sessions
+    of this worker (power of two choices). Counts are halved periodically so
+    they reflect recent exposure.
+    """
+
+    def __init__(self, bank: QuestionBank, balance_exposure: bool = False, decay_rounds: int = 8):
+        self.bank = bank
+        self.balance_exposure = balance_exposure
+        self.decay_rounds = decay_rounds
+        # level -> shown count per question position, and draws since the last decay
+        self._exposure: Dict[int, array] = {}
+        self._draws: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def draw(self, seed: int, level: int, cursor: int, exclude: int = 0) -> int:
+        """
+        Question id for a session's ``cursor``-th draw at a level, 0 if the
+        level is empty. ``exclude`` is the question being replaced, which is
+        never handed back while the level has another one.
+        """
+        size = self.bank.level_size(level)
+        if not size:
+            return 0
+        step, offset = permutation(seed, level, size)
+        if not self.balance_exposure or size < 2:
+            position = (step * cursor + offset) % size
+            if exclude and size > 1 and self.bank.question_id_at(level, position) == exclude:
+                position = (position + step) % size
+            return self.bank.question_id_at(level, position)
+
+        # Pairs of positions are disjoint until the window wraps around the
+        # permutation, which on odd-sized levels can pair the current question
+        first = (step * 2 * cursor + offset) % size
+        second = (first + step) % size
+        if exclude and self.bank.question_id_at(level, first) == exclude:
+            first = second
+        elif exclude and self.bank.question_id_at(level, second) == exclude:
+            second = first
+        with self._lock:
+            exposure = self._exposure.get(level)
+            if exposure is None or len(exposure) != size:
+                # First use, or the bank was reloaded with a different size
+                exposure = self._exposure[level] = array('I', bytes(4 * size))
+                self._draws[level] = 0
+            position = second if exposure[second] < exposure[first] else first
+            exposure[position] += 1
+            self._draws[level] += 1
+            if self._draws[level] >= self.decay_rounds * size:
+                for i in range(size):
+                    exposure[i] >>= 1
+                self._draws[level] = 0
+        return self.bank.question_id_at(level, position)
+
+    def exposure(self, level: int) -> Tuple[int, ...]:
+        """Recent shown counts per question position of a level (balanced mode only)"""
+        with self._lock:
+            return tuple(self._exposure.get(level, ()))
+
+
+_schedulers_lock = threading.Lock()
+
+
+def get_question_scheduler(bank: QuestionBank) -> QuestionScheduler:
+    """Scheduler shared by every game on a bank, QUESTION_BALANCE=1 enables exposure balancing"""
+    # Kept on the bank rather than in a map keyed by it, so an unused bank and its scheduler are freed together
+    scheduler = bank.scheduler
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = bank.scheduler
+            if scheduler is None:
+                scheduler = QuestionScheduler(bank, balance_exposure=os.getenv('QUESTION_BALANCE') == '1')
+                bank.scheduler = scheduler
+    return scheduler
+
+
+def set_question_scheduler(bank: QuestionBank, scheduler: QuestionScheduler):
+    """Replace the scheduler of a bank, e.g. with a balanced one in tests"""
+    with _schedulers_lock:
+        bank.scheduler = scheduler
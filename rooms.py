@@ -0,0 +1,250 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from answer_stats import get_answer_stats
+from fast_json import encode
+from gamelogic import MillionaireGame
+
+# Room states
+LOBBY = 'lobby'
+OPEN = 'open'
+REVEALED = 'revealed'
+FINISHED = 'finished'
+
+# A broadcast update: sequence number, JSON text (WebSocket) and the same as an SSE frame
+Update = Tuple[int, str, bytes]
+
+
+class RoomError(Exception):
+    """Raised for a room action that is not allowed right now"""
+
+
+class Room:
+    """
+    One live game played by many players at once.
+
+    The host's MillionaireGame holds the shared question state and only the
+    host moves it on. Players just answer: the room keeps one byte per player
+    for the current answer and one for still being in the game, plus a count
+    per answer option, so an answer is O(1) and deciding who survives a
+    question is a couple of bytes operations over the whole room.
+
+    Updates are serialized once in ``broadcast`` and the same text is handed
+    to every subscriber; nothing is encoded per player. Subscribers wait on
+    a shared event and read from a short history by sequence number, so a
+    broadcast costs the same for 10 players or 10,000.
+    """
+
+    def __init__(self, room_id: str, max_players: int = 10_000, tally_interval: float = 0.25, history: int = 64):
+        self.room_id = room_id
+        self.host_token = secrets.token_urlsafe(16)
+        self.max_players = max_players
+        self.tally_interval = tally_interval
+        self.game = MillionaireGame()
+        self.state = LOBBY
+        self.round = 0
+        self.names: List[str] = []
+        self._players: Dict[str, int] = {}  # player token -> slot
+        self._answers = bytearray()  # per slot: 0, or the answer 1-4 to the open question
+        self._alive = bytearray()  # per slot: 1 while the player is still in the game
+        self.counts = [0, 0, 0, 0, 0]  # answers per option (1-4) to the current question
+        self.answered = 0
+        self.survivors = 0
+        self._seq = 0
+        self._history: "deque[Update]" = deque(maxlen=history)
+        self._waiter: Optional[asyncio.Event] = None
+        self._last_tally = 0.0
+        self._snapshot: Tuple[int, str] = (-1, '')
+        self.touched = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest update"""
+        return self._seq
+
+    def is_host(self, token: str) -> bool:
+        return secrets.compare_digest(token.encode(), self.host_token.encode())
+
+    def join(self, name: str = "") -> Tuple[str, int]:
+        """Add a player, returns their token and slot. Players joining after the start only watch"""
+        if len(self.names) >= self.max_players:
+            raise RoomError("Room is full")
+        token = secrets.token_urlsafe(12)
+        slot = len(self.names)
+        self._players[token] = slot
+        self.names.append(name[:32] or f"Player {slot + 1}")
+        self._answers.append(0)
+        self._alive.append(1 if self.state == LOBBY else 0)
+        self.touched = time.monotonic()
+        return token, slot
+
+    def answer(self, token: str, answer: int) -> int:
+        """Record a player's answer to the open question, returns how many have answered"""
+        slot = self._players.get(token)
+        if slot is None:
+            raise RoomError("Unknown player")
+        if self.state != OPEN:
+            raise RoomError("No question is open")
+        if not self._alive[slot]:
+            raise RoomError("You are out of this game")
+        if self._answers[slot]:
+            raise RoomError("Already answered")
+        # 2.0 == 2 and True == 1, but neither can index the answer slots
+        if not isinstance(answer, int) or isinstance(answer, bool) or answer not in (1, 2, 3, 4):
+            raise RoomError("answer must be 1-4")
+        self._answers[slot] = answer
+        self.counts[answer] += 1
+        self.answered += 1
+        question = self.game.current_question
+        get_answer_stats().record_answer(question.id, answer == question.correct,
+                                         self.game.question_bank.bank_key)
+
+        now = time.monotonic()
+        if now - self._last_tally >= self.tally_interval:
+            self.broadcast_tally(now)
+        return self.answered
+
+    def broadcast_tally(self, now: Optional[float] = None):
+        """Share the running answer counts, at most every ``tally_interval`` while answers arrive"""
+        self._last_tally = time.monotonic() if now is None else now
+        self.broadcast({"type": "tally", **self._tally()})
+
+    def _tally(self) -> Dict:
+        return {"round": self.round, "counts": self.counts[1:], "answered": self.answered,
+                "players": self.survivors}
+
+    def host_action(self, action: str) -> Dict:
+        """Move the game on: "start", "reveal" the answer, go to the "next" question or "finish" it"""
+        if action == 'start':
+            if self.state != LOBBY:
+                raise RoomError("Game already started")
+            self.game.start_game()
+            self._open_round()
+        elif action == 'reveal':
+            if self.state != OPEN:
+                raise RoomError("No question is open")
+            self._reveal()
+        elif action == 'next':
+            if self.state != REVEALED:
+                raise RoomError("Reveal the answer first")
+            if not self.game.advance_level():
+                raise RoomError("No question available for the next level")
+            self._open_round()
+        elif action == 'finish':
+            self.state = FINISHED
+            self.broadcast({"type": "finished", "round": self.round, "survivors": self.survivors})
+        else:
+            raise RoomError("Invalid action")
+        self.touched = time.monotonic()
+        return self.snapshot_payload()
+
+    def _open_round(self):
+        self.round += 1
+        self.state = OPEN
+        self._answers = bytearray(len(self.names))
+        self.counts = [0, 0, 0, 0, 0]
+        self.answered = 0
+        self.survivors = self._alive.count(1)
+        self.broadcast({
+            "type": "question",
+            "round": self.round,
+            "level": self.game.level,
+            "question": self.game.question_json(),
+            "players": self.survivors,
+        })
+
+    def _reveal(self):
+        question = self.game.current_question
+        tally = self._tally()
+        size = len(self._alive)
+        # 1 where the player gave the correct answer, then AND with who was still in
+        right = self._answers.translate(bytes(1 if i == question.correct else 0 for i in range(256)))
+        alive = int.from_bytes(self._alive, 'little') & int.from_bytes(right, 'little')
+        self._alive = bytearray(alive.to_bytes(size, 'little'))
+        self.survivors = self._alive.count(1)
+        last = self.game.level >= self.game.max_level or not self.survivors
+        self.state = FINISHED if last else REVEALED
+        self.broadcast({
+            "type": "reveal",
+            **tally,
+            "level": self.game.level,
+            "correct_answer": question.correct,
+            "explanation": question.explanation,
+            "survivors": self.survivors,
+            "finished": last,
+        })
+
+    def broadcast(self, payload: Dict):
+        """Serialize an update once and wake every subscriber"""
+        self._seq += 1
+        text = encode({"seq": self._seq, **payload}).decode('utf-8')
+        frame = f"id: {self._seq}\nevent: {payload['type']}\ndata: {text}\n\n".encode('utf-8')
+        self._history.append((self._seq, text, frame))
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.set()
+
+    async def updates(self, cursor: int) -> List[Update]:
+        """
+        Wait for updates after sequence number ``cursor``. A subscriber that
+        fell further behind than the history gets the current snapshot instead.
+        """
+        while self._seq <= cursor:
+            if self._waiter is None:
+                self._waiter = asyncio.Event()
+            await self._waiter.wait()
+        if self._history[0][0] > cursor + 1:
+            return [self.snapshot()]
+        return [update for update in self._history if update[0] > cursor]
+
+    def snapshot_payload(self) -> Dict:
+        payload = {"room_id": self.room_id, "state": self.state, "level": self.game.level, **self._tally()}
+        if self.state in (OPEN, REVEALED) or (self.state == FINISHED and self.round):
+            payload["question"] = self.game.question_json()
+        if self.state in (REVEALED, FINISHED) and self.round:
+            payload["correct_answer"] = self.game.current_question.correct
+        return payload
+
+    def snapshot(self) -> Update:
+        """The room's current state as an update, serialized once per change for all joining subscribers"""
+        if self._snapshot[0] != self._seq:
+            text = encode({"type": "snapshot", "seq": self._seq, **self.snapshot_payload()}).decode('utf-8')
+            self._snapshot = (self._seq, text)
+        text = self._snapshot[1]
+        return self._seq, text, f"id: {self._seq}\nevent: snapshot\ndata: {text}\n\n".encode('utf-8')
+
+    def stats(self) -> Dict:
+        return {"players": len(self.names), "state": self.state, "round": self.round,
+                "survivors": self.survivors, "updates": self._seq}
+
+
+class RoomRegistry:
+    """Live rooms of this worker, rooms idle for ``ttl_seconds`` are dropped when new ones are created"""
+
+    def __init__(self, max_rooms: int = 1000, ttl_seconds: float = 6 * 3600, max_players: int = 10_000):
+        self.max_rooms = max_rooms
+        self.ttl_seconds = ttl_seconds
+        self.max_players = max_players
+        self._rooms: "OrderedDict[str, Room]" = OrderedDict()
+
+    def create(self) -> Room:
+        now = time.monotonic()
+        for room_id in [room_id for room_id, room in self._rooms.items() if now - room.touched > self.ttl_seconds]:
+            del self._rooms[room_id]
+        if len(self._rooms) >= self.max_rooms:
+            raise RoomError("Too many rooms")
+        room = Room(secrets.token_hex(4), max_players=self.max_players)
+        self._rooms[room.room_id] = room
+        return room
+
+    def get(self, room_id: str) -> Optional[Room]:
+        return self._rooms.get(room_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"rooms": len(self._rooms), "players": sum(len(room) for room in self._rooms.values())}
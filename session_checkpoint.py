@@ -0,0 +1,259 @@
+"""
+Checkpoints of in-memory game sessions, so a restart or deploy keeps live games.
+
+The checkpoint is an append-only file of compact binary records, one per
+session change:
+
+    kind (1 saved, 2 removed), key length, saved at (unix time), state length, key, state
+
+where state is the game's ``to_bytes()`` form (21 bytes, 25 for a game on a
+question bank other than the default). Every ``interval`` seconds the
+sessions changed since the previous checkpoint are serialized on the event
+loop in small batches, which copies their state, and the records are
+appended and synced from a worker thread, so handlers never wait for the
+disk. Once more records were appended than there are live sessions, the file
+is rewritten as a full snapshot and swapped in atomically, so it stays within
+a few times the size of the live state.
+
+At start-up the file is read back and every session that has not expired is
+restored, least recently used first; at shutdown the last changes are written.
+"""
+
+import asyncio
+import gc
+import os
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, one worker per checkpoint file is then up to the deployment
+    fcntl = None
+
+from session_store import InMemorySessionStore
+
+MAGIC = b'MGSC\x01'
+SAVED = 1
+REMOVED = 2
+_RECORD = struct.Struct('<BHdH')
+
+
+def encode_record(kind: int, session_id: str, saved_at: float, state: bytes = b'') -> bytes:
+    """Raises ValueError for a session id that is not valid UTF-8 or over 65535 bytes long"""
+    key = session_id.encode('utf-8')
+    if len(key) > 0xFFFF:
+        raise ValueError("Session id is too long for a checkpoint record")
+    return _RECORD.pack(kind, len(key), saved_at, len(state)) + key + state
+
+
+def read_checkpoint(path: str) -> Tuple[Dict[str, Tuple[float, bytes]], int]:
+    """
+    Latest (saved at, state) per live session in a checkpoint file, and the
+    length of its intact part: a record cut short by a crash ends the read.
+    """
+    sessions: Dict[str, Tuple[float, bytes]] = {}
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a session checkpoint")
+    unpack = _RECORD.unpack_from
+    header = _RECORD.size
+    offset = len(MAGIC)
+    end = len(data)
+    while offset + header <= end:
+        kind, key_length, saved_at, state_length = unpack(data, offset)
+        start = offset + header
+        stop = start + key_length + state_length
+        if stop > end:
+            break
+        key = data[start:start + key_length].decode('utf-8')
+        if kind == SAVED:
+            sessions[key] = (saved_at, data[start + key_length:stop])
+        else:
+            sessions.pop(key, None)
+        offset = stop
+    return sessions, offset
+
+
+class SessionCheckpoint:
+    """
+    Incremental checkpoints of an InMemorySessionStore in a local file; see
+    the module docstring for the format. ``loads`` turns a saved state back
+    into a game (MillionaireGame.from_bytes). Call ``restore`` once at
+    start-up: it also starts tracking changes for the following checkpoints.
+    """
+
+    def __init__(self, store: InMemorySessionStore, path: str, loads: Callable[[bytes], Any],
+                 interval: float = 5.0, batch_size: int = 2000, fsync: bool = True):
+        self.store = store
+        self.path = path
+        self.loads = loads
+        self.interval = interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.enabled = True
+        self.restored = 0
+        self.written = 0
+        self.compactions = 0
+        self.skipped = 0
+        self._appended = 0  # records written since the last full snapshot
+        self._lock_file = None
+        self._busy: Optional[asyncio.Lock] = None
+
+    def restore(self) -> int:
+        """Load the sessions saved in the checkpoint, returns how many were restored"""
+        if not self._acquire_file():
+            return 0
+        self.store.track_changes()
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            saved, intact = read_checkpoint(self.path)
+        except ValueError as e:
+            print(f"Warning: {e}, starting without restored sessions")
+            self.enabled = False
+            return 0
+        if intact < os.path.getsize(self.path):
+            # Drop a record cut short by a crash so new records follow complete ones
+            os.truncate(self.path, intact)
+
+        now = time.time()
+        ttl = self.store.ttl_seconds
+        entries = sorted((saved_at, session_id, state) for session_id, (saved_at, state) in saved.items()
+                         if now - saved_at <= ttl)
+        entries = entries[-self.store.max_entries:]
+        loads = self.loads
+        sessions = []
+        # A million small games would otherwise run the cyclic collector hundreds of times for nothing
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for saved_at, session_id, state in entries:
+                try:
+                    sessions.append((session_id, loads(state), now - saved_at))
+                except (ValueError, struct.error):
+                    continue
+            self.restored = self.store.restore(sessions)
+        finally:
+            if collecting:
+                gc.enable()
+        # Superseded and expired records stay in the file until the next snapshot
+        self._appended = len(saved)
+        return self.restored
+
+    def _acquire_file(self) -> bool:
+        """One process per checkpoint file: further uvicorn workers on it keep their sessions in memory only"""
+        if fcntl is None or self._lock_file is not None:
+            return self.enabled
+        self._lock_file = open(self.path + '.lock', 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print(f"Warning: {self.path} is checkpointed by another process, sessions of this worker are not saved")
+            self.enabled = False
+        return self.enabled
+
+    async def _records(self, session_ids: List[str]) -> List[bytes]:
+        """Serialize sessions as records, yielding to the event loop between batches"""
+        store = self.store
+        now_wall = time.time()
+        now = store.clock()
+        records = []
+        for i, session_id in enumerate(session_ids):
+            if i and not i % self.batch_size:
+                await asyncio.sleep(0)
+            entry = store.peek(session_id)
+            try:
+                if entry is None:
+                    records.append(encode_record(REMOVED, session_id, now_wall))
+                else:
+                    game, last_access = entry
+                    records.append(encode_record(SAVED, session_id, now_wall - (now - last_access), game.to_bytes()))
+            except ValueError:  # UnicodeEncodeError included: such a session is kept in memory only
+                self.skipped += 1
+        return records
+
+    async def checkpoint(self) -> int:
+        """Write the sessions changed since the last checkpoint, returns the number of records written"""
+        if not self.enabled:
+            return 0
+        if self._busy is None:
+            self._busy = asyncio.Lock()
+        async with self._busy:
+            changed = self.store.drain_changes()
+            try:
+                if self._appended + len(changed) > max(len(self.store), 10_000):
+                    return await self._compact()
+                if not changed:
+                    return 0
+                records = await self._records(changed)
+                await asyncio.to_thread(self._append, records)
+            except BaseException:
+                # Not on disk yet: the next checkpoint writes these sessions again
+                self.store.mark_changed(changed)
+                raise
+            self._appended += len(records)
+            self.written += len(records)
+            return len(records)
+
+    async def _compact(self) -> int:
+        """Replace the file with a snapshot of every live session"""
+        records = await self._records(self.store.session_ids())
+        await asyncio.to_thread(self._replace, records)
+        self._appended = 0
+        self.compactions += 1
+        self.written += len(records)
+        return len(records)
+
+    def _append(self, records: List[bytes]):
+        new = not os.path.exists(self.path)
+        with open(self.path, 'ab') as f:
+            if new:
+                f.write(MAGIC)
+            f.writelines(records)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _replace(self, records: List[bytes]):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC)
+            # Record by record, so the event loop gets the GIL back between buffer flushes
+            f.writelines(records)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    async def run(self):
+        """Checkpoint every ``interval`` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # Shielded: a cancelled loop must not lose changes already drained from the store
+                await asyncio.shield(self.checkpoint())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: session checkpoint failed: {e!r}")
+
+    async def close(self):
+        """Write the final changes, at shutdown"""
+        await self.checkpoint()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"enabled": self.enabled, "restored": self.restored, "written": self.written,
+                "compactions": self.compactions, "skipped": self.skipped}
+
+
+def create_session_checkpoint(store, loads: Callable[[bytes], Any]) -> Optional[SessionCheckpoint]:
+    """SESSION_CHECKPOINT_PATH='' disables checkpoints; shared session backends need none"""
+    path = os.getenv('SESSION_CHECKPOINT_PATH', 'sessions.checkpoint')
+    if not path or not isinstance(store, InMemorySessionStore):
+        return None
+    return SessionCheckpoint(store, path, loads, interval=float(os.getenv('SESSION_CHECKPOINT_INTERVAL', '5')))
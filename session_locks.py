@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+_LOCK_WAITS = REGISTRY.counter('session_lock_waits_total', 'Requests that waited for another request on the same game')
+_REPLAYS = REGISTRY.counter('idempotent_replays_total', 'Retried requests answered from the idempotency cache')
+
+
+class SessionLocks:
+    """
+    One asyncio lock per game key, held while a request reads, changes and
+    saves that game.
+
+    A lock exists only while some request holds or waits for it, so memory
+    follows in-flight requests rather than sessions, and two games never
+    share a lock (a request waiting on a slow AI hint blocks only its own
+    game). Runs on the event loop thread, no thread locking needed.
+    """
+
+    def __init__(self):
+        # key -> [lock, holders and waiters]
+        self._locks: Dict[str, List] = {}
+        self.waits = 0
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        elif entry[0].locked():
+            self.waits += 1
+            _LOCK_WAITS.inc()
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an Idempotency-Key comes back with a different request body"""
+
+
+def body_digest(body: bytes) -> bytes:
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class IdempotencyCache:
+    """
+    Responses of recent requests by (game key, route, Idempotency-Key), so a
+    client retrying a request it got no answer for receives the original
+    response instead of applying the move twice. The request body's digest is
+    kept with the response: a retry must send the same body. Bounded LRU with
+    a TTL, per worker.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # (scope, route, key) -> (expires at, body digest, response)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, bytes, Dict]]" = OrderedDict()
+        self.replays = 0
+
+    def get(self, scope: str, key: str, route: str = '', body: bytes = b'') -> Optional[Dict]:
+        """The cached response, raises IdempotencyKeyReused if the key was used with another body"""
+        entry = self._entries.get((scope, route, key))
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[(scope, route, key)]
+            return None
+        if entry[1] != body_digest(body):
+            raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+        self.replays += 1
+        _REPLAYS.inc()
+        return entry[2]
+
+    def put(self, scope: str, key: str, response: Dict, route: str = '', body: bytes = b''):
+        self._entries[(scope, route, key)] = (time.monotonic() + self.ttl_seconds, body_digest(body), response)
+        self._entries.move_to_end((scope, route, key))
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@asynccontextmanager
+async def _unlocked() -> AsyncIterator[None]:
+    yield
+
+
+class SessionGuard:
+    """Serializes requests per game and answers retries from the idempotency cache"""
+
+    def __init__(self, locks: Optional[SessionLocks] = None, cache: Optional[IdempotencyCache] = None,
+                 enabled: bool = True):
+        self.locks = locks or SessionLocks()
+        self.cache = cache or IdempotencyCache()
+        self.enabled = enabled
+
+    async def run(self, scope: str, idempotency_key: Optional[str], action: Callable[[], Awaitable[Dict]],
+                  route: str = '', body: bytes = b'') -> Dict:
+        """
+        Run ``action`` holding the lock of game ``scope`` (a session id, or the
+        state token of a stateless game). Without a scope, nothing to serialize.
+        A retry with the same ``idempotency_key`` on the same ``route`` gets the
+        first response, and must carry the same ``body``.
+        """
+        if not scope or not self.enabled:
+            return await action()
+        async with self.hold(scope):
+            if idempotency_key:
+                cached = self.cache.get(scope, idempotency_key, route, body)
+                if cached is not None:
+                    return cached
+            response = await action()
+            if idempotency_key:
+                self.cache.put(scope, idempotency_key, response, route, body)
+            return response
+
+    def hold(self, scope: str):
+        """The lock of game ``scope`` as an async context manager, a no-op without a scope"""
+        if not scope or not self.enabled:
+            return _unlocked()
+        return self.locks.hold(scope)
+
+    def stats(self) -> Dict[str, int]:
+        return {"locked_games": len(self.locks), "lock_waits": self.locks.waits,
+                "idempotency_entries": len(self.cache), "idempotent_replays": self.cache.replays}
@@ -0,0 +1,459 @@
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def approx_session_size(game: Any) -> int:
+    """
+    Rough per-session footprint in bytes.
+
+    Counts the game object and its own containers; shared objects such as the
+    question bank or the AI client are referenced, not owned, so they are skipped.
+    """
+    size = sys.getsizeof(game)
+    attrs = getattr(game, '__dict__', None)
+    if attrs is not None:
+        size += sys.getsizeof(attrs)
+        for value in attrs.values():
+            if isinstance(value, (list, dict, set, tuple)) and not hasattr(value, '_fields'):
+                size += sys.getsizeof(value)
+    return size
+
+
+class SessionConflict(Exception):
+    """Raised when a session was modified by another request since it was read"""
+
+
+class SessionStore:
+    """
+    Interface for game session storage used by the API handlers.
+
+    Handlers use the ``*_async`` methods. Stores whose calls do I/O set
+    ``blocking`` and those run in a worker thread, so a busy database never
+    stalls the event loop; in-memory stores are called directly.
+    """
+
+    blocking = False
+
+    def get(self, session_id: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def put(self, session_id: str, game: Any) -> None:
+        raise NotImplementedError
+
+    def save(self, session_id: str, game: Any) -> None:
+        """
+        Persist a game changed since ``get``.
+
+        Raises SessionConflict if another request saved the session first.
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        """Drop expired sessions, returns the number removed"""
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    async def get_async(self, session_id: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, session_id) if self.blocking else self.get(session_id)
+
+    async def put_async(self, session_id: str, game: Any) -> None:
+        if self.blocking:
+            await asyncio.to_thread(self.put, session_id, game)
+        else:
+            self.put(session_id, game)
+
+    async def save_async(self, session_id: str, game: Any) -> None:
+        if self.blocking:
+            await asyncio.to_thread(self.save, session_id, game)
+        else:
+            self.save(session_id, game)
+
+    async def run_sweeper(self, interval: float = 30.0, batch_size: int = 1000):
+        """Periodically sweep expired sessions in small batches, yielding to the event loop in between"""
+        while True:
+            await asyncio.sleep(interval)
+            while True:
+                if self.blocking:
+                    removed = await asyncio.to_thread(self.sweep, batch_size)
+                else:
+                    removed = self.sweep(limit=batch_size)
+                if removed < batch_size:
+                    break
+                await asyncio.sleep(0)
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Bounded in-process session store.
+
+    Sessions expire after ``ttl_seconds`` without access and the least recently
+    used session is evicted once ``max_entries`` is reached. Entries are kept in
+    access order, so a sweep only touches expired entries at the front.
+    """
+
+    def __init__(self, ttl_seconds: float = 1800.0, max_entries: int = 100_000,
+                 sizeof: Callable[[Any], int] = approx_session_size,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.clock = clock
+        # session_id -> (game, last_access, approx_bytes)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.approx_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Sessions put, saved or removed since the last drain_changes, while tracking (see session_checkpoint.py)
+        self._changed: Optional[Dict[str, None]] = None
+
+    def get(self, session_id: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            game, last_access, size = entry
+            now = self.clock()
+            if now - last_access > self.ttl_seconds:
+                self._remove(session_id)
+                self.expirations += 1
+                return None
+            self._entries[session_id] = (game, now, size)
+            self._entries.move_to_end(session_id)
+            return game
+
+    def put(self, session_id: str, game: Any) -> None:
+        size = self.sizeof(game) + sys.getsizeof(session_id)
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._entries[session_id] = (game, self.clock(), size)
+            self.approx_bytes += size
+            if self._changed is not None:
+                self._changed[session_id] = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def save(self, session_id: str, game: Any) -> None:
+        # Games are mutated in place, only the version needs to move
+        game.version = getattr(game, 'version', 0) + 1
+        if self._changed is not None:
+            self._changed[session_id] = None
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._entries:
+                return False
+            self._remove(session_id)
+            return True
+
+    def peek(self, session_id: str) -> Optional[Tuple[Any, float]]:
+        """(game, last access) without counting as an access or expiring it"""
+        entry = self._entries.get(session_id)
+        return None if entry is None else entry[:2]
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def track_changes(self):
+        """Start recording which sessions change, collected with drain_changes"""
+        with self._lock:
+            if self._changed is None:
+                self._changed = {}
+
+    def drain_changes(self) -> List[str]:
+        """Sessions put, saved or removed since the previous call"""
+        with self._lock:
+            changed, self._changed = self._changed, {}
+        return list(changed or ())
+
+    def mark_changed(self, session_ids: Iterable[str]):
+        """Report drained sessions as changed again, e.g. after a failed checkpoint write"""
+        with self._lock:
+            if self._changed is not None:
+                self._changed.update(dict.fromkeys(session_ids))
+
+    def restore(self, sessions: Iterable[Tuple[str, Any, float]]) -> int:
+        """
+        Bulk load (session id, game, seconds since last access) entries,
+        least recently used first, e.g. from a checkpoint at start-up.
+        Returns the number loaded; restored sessions are not reported as changed.
+        """
+        count = 0
+        with self._lock:
+            now = self.clock()
+            for session_id, game, idle in sessions:
+                size = self.sizeof(game) + sys.getsizeof(session_id)
+                if session_id in self._entries:
+                    self._remove(session_id)
+                self._entries[session_id] = (game, now - idle, size)
+                self.approx_bytes += size
+                count += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return count
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        removed = 0
+        with self._lock:
+            cutoff = self.clock() - self.ttl_seconds
+            while self._entries and (limit is None or removed < limit):
+                session_id, (_, last_access, _) = next(iter(self._entries.items()))
+                if last_access >= cutoff:
+                    break
+                self._remove(session_id)
+                removed += 1
+            self.expirations += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "live_sessions": len(self._entries),
+            "max_sessions": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "approx_bytes": self.approx_bytes,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, session_id: str):
+        _, _, size = self._entries.pop(session_id)
+        self.approx_bytes -= size
+        if self._changed is not None:
+            self._changed[session_id] = None
+
+
+class KeyValueBackend:
+    """
+    Versioned key-value protocol behind SharedSessionStore.
+
+    Every value carries a version that increases on each write. A Redis-like
+    server can implement the same protocol with a hash per key and a
+    compare-and-set script (or WATCH/MULTI), with EXPIRE for the TTL.
+    """
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        """Return (value, version), or None if missing or expired"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> int:
+        """Unconditional write, returns the new version"""
+        raise NotImplementedError
+
+    def compare_and_set(self, key: str, value: bytes, expected_version: int, ttl: float) -> bool:
+        """Write only if the stored version still equals expected_version"""
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Write only if the key is missing or expired"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def expire(self, limit: Optional[int] = None) -> int:
+        """Remove expired keys, returns the number removed"""
+        raise NotImplementedError
+
+    def trim(self, max_entries: int) -> int:
+        """Remove the keys closest to expiry beyond max_entries, returns the number removed"""
+        raise NotImplementedError
+
+    def stats(self) -> Tuple[int, int]:
+        """Return (live keys, total value bytes)"""
+        raise NotImplementedError
+
+
+class SQLiteKeyValue(KeyValueBackend):
+    """
+    KeyValueBackend on a local SQLite file in WAL mode.
+
+    Several uvicorn workers on one machine can share the file: readers never
+    block the writer, and compare_and_set is a single conditional UPDATE.
+    Other users of the file (see state_token.SharedReplayGuard) keep their
+    keys in their own ``table``.
+    """
+
+    def __init__(self, path: str = 'sessions.sqlite3', clock: Callable[[], float] = time.time,
+                 table: str = 'sessions'):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name {table!r}")
+        self.path = path
+        self.clock = clock
+        self.table = table
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT value, version FROM {self.table} WHERE key = ? AND expires_at > ?", (key, self.clock())
+            ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, key: str, value: bytes, ttl: float) -> int:
+        expires_at = self.clock() + ttl
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(f"SELECT version FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                version = row[0] + 1 if row else 1
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, version, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, value, version, expires_at)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return version
+
+    def compare_and_set(self, key: str, value: bytes, expected_version: int, ttl: float) -> bool:
+        now = self.clock()
+        with self._lock:
+            cursor = self._db.execute(
+                f"UPDATE {self.table} SET value = ?, version = version + 1, expires_at = ?"
+                " WHERE key = ? AND version = ? AND expires_at > ?",
+                (value, now + ttl, key, expected_version, now)
+            )
+        return cursor.rowcount == 1
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = self.clock()
+        with self._lock:
+            cursor = self._db.execute(
+                f"INSERT INTO {self.table} (key, value, version, expires_at) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value, version = version + 1,"
+                " expires_at = excluded.expires_at WHERE expires_at <= ?",
+                (key, value, now + ttl, now)
+            )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount == 1
+
+    def expire(self, limit: Optional[int] = None) -> int:
+        with self._lock:
+            return self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN"
+                f" (SELECT key FROM {self.table} WHERE expires_at <= ? ORDER BY expires_at LIMIT ?)",
+                (self.clock(), -1 if limit is None else limit)
+            ).rowcount
+
+    def trim(self, max_entries: int) -> int:
+        with self._lock:
+            return self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN"
+                f" (SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries,)
+            ).rowcount
+
+    def stats(self) -> Tuple[int, int]:
+        with self._lock:
+            count, size = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM {self.table} WHERE expires_at > ?",
+                (self.clock(),)
+            ).fetchone()
+        return count, size
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Session store over a KeyValueBackend shared by several workers or nodes.
+
+    Games are stored in their compact serialized form. ``save`` is an
+    optimistic compare-and-set on the version read by ``get``, so two requests
+    racing on one session cannot overwrite each other silently. ``stats``
+    scans the backend, so its result is reused for ``stats_ttl`` seconds.
+    """
+
+    blocking = True
+
+    def __init__(self, backend: KeyValueBackend, loads: Callable[[bytes], Any],
+                 ttl_seconds: float = 1800.0, max_entries: int = 100_000, stats_ttl: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.backend = backend
+        self.loads = loads
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats_ttl = stats_ttl
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        self._backend_stats: Optional[Tuple[float, Tuple[int, int]]] = None
+
+    def get(self, session_id: str) -> Optional[Any]:
+        entry = self.backend.get(session_id)
+        if entry is None:
+            return None
+        value, version = entry
+        game = self.loads(value)
+        game.version = version
+        return game
+
+    def put(self, session_id: str, game: Any) -> None:
+        game.version = self.backend.set(session_id, game.to_bytes(), self.ttl_seconds)
+
+    def save(self, session_id: str, game: Any) -> None:
+        if not self.backend.compare_and_set(session_id, game.to_bytes(), game.version, self.ttl_seconds):
+            raise SessionConflict(session_id)
+        game.version += 1
+
+    def delete(self, session_id: str) -> bool:
+        return self.backend.delete(session_id)
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        removed = self.backend.expire(limit)
+        self.expirations += removed
+        self.evictions += self.backend.trim(self.max_entries)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        now = self.clock()
+        cached = self._backend_stats
+        if cached is None or now - cached[0] >= self.stats_ttl:
+            cached = self._backend_stats = (now, self.backend.stats())
+        live, size = cached[1]
+        return {
+            "live_sessions": live,
+            "max_sessions": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "approx_bytes": size,
+        }
+
+    def __len__(self) -> int:
+        return self.backend.stats()[0]
@@ -0,0 +1,302 @@
+"""
+Headless game simulator for balancing and regression testing.
+
+Plays many games through MillionaireGame with a scripted player strategy,
+sharded over a process pool. Every worker loads the question bank once
+(with QUESTION_STORE=mmap the snapshot pages are shared between them) and
+journals and answer statistics are switched off, so nothing is written to
+disk. Each game is reduced to a few bytes and the outcome is summarized
+per level and per lifeline.
+
+Usage:
+    python simulator.py --games 1000000 --strategy skill --processes 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from itertools import compress
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # optional, the summary falls back to counting byte columns
+    numpy = None
+
+import answer_stats
+import event_log
+from answer_stats import AnswerStats, set_answer_stats
+from event_log import EventLog, set_event_log
+from gamelogic import AI_SUPPORT, CHANGE_QUESTION, FIFTY_FIFTY, MillionaireGame
+from question_bank import get_question_bank
+
+LIFELINES = ('fifty_fifty', 'change_question', 'ai_support')
+_SUPPORT_BITS = {'fifty_fifty': FIFTY_FIFTY, 'change_question': CHANGE_QUESTION, 'ai_support': AI_SUPPORT}
+
+# One byte per field and game: the level the game ended at, whether it was won, then for
+# every lifeline the level it was used at (0 if not) and whether that question was answered correctly
+LEVEL = 0
+WON = 1
+FIELDS = 2 + 2 * len(LIFELINES)
+
+
+class Strategy:
+    """
+    A simulated player. ``knows`` decides whether the player knows the answer
+    to the question in front of them; ``lifeline`` picks the next lifeline to
+    use on it, given those already ``used`` on it, or None to answer. A player
+    who does not know guesses among the answers left.
+    """
+    name = 'base'
+
+    def knows(self, level: int, rng: random.Random) -> bool:
+        return False
+
+    def lifeline(self, game: MillionaireGame, knows: bool, used: Sequence[str]) -> Optional[str]:
+        return None
+
+
+class RandomStrategy(Strategy):
+    """Guesses every answer and never uses a lifeline"""
+    name = 'random'
+
+
+class FiftyFiftyStrategy(Strategy):
+    """Guesses, using 50/50 on the first question"""
+    name = 'fifty_fifty'
+
+    def lifeline(self, game: MillionaireGame, knows: bool, used: Sequence[str]) -> Optional[str]:
+        return None if game.used_fifty_fifty else 'fifty_fifty'
+
+
+class SkillStrategy(Strategy):
+    """
+    Knows the answer with a probability that falls with the level, and spends
+    one lifeline (the first left in ``order``) on a question it does not know,
+    another one only if it changed the question.
+    """
+    name = 'skill'
+
+    def __init__(self, knowledge: Sequence[float] = (0.95, 0.9, 0.8, 0.7, 0.6, 0.45, 0.35, 0.25),
+                 order: Sequence[str] = ('change_question', 'ai_support', 'fifty_fifty')):
+        self.knowledge = tuple(knowledge)
+        self.order = tuple(order)
+
+    def knows(self, level: int, rng: random.Random) -> bool:
+        return rng.random() < self.knowledge[min(level, len(self.knowledge)) - 1]
+
+    def lifeline(self, game: MillionaireGame, knows: bool, used: Sequence[str]) -> Optional[str]:
+        if knows or (used and used[-1] != 'change_question'):
+            return None
+        for support in self.order:
+            if not game.used_supports & _SUPPORT_BITS[support]:
+                return support
+        return None
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (RandomStrategy, FiftyFiftyStrategy, SkillStrategy)}
+
+
+def play_game(game: MillionaireGame, strategy: Strategy, rng: random.Random, ai_accuracy: float,
+              record: bytearray, shown: Counter):
+    """
+    Play one game to the end and append its FIELDS bytes to ``record``.
+
+    AI support is only marked used, no hint is asked for: the player then
+    answers correctly with probability ``ai_accuracy``.
+    """
+    game.start_game(seed=rng.getrandbits(32))
+    row = bytearray(FIELDS)
+    while True:
+        question = game.current_question
+        if question is None:
+            break
+        level = game.level
+        shown[question.id] += 1
+        knows = strategy.knows(level, rng)
+        hinted = False
+        used: List[str] = []
+        support = strategy.lifeline(game, knows, used)
+        while support is not None:
+            used.append(support)
+            row[2 + 2 * LIFELINES.index(support)] = level
+            if support == 'fifty_fifty':
+                game.use_fifty_fifty()
+            elif support == 'change_question':
+                game.use_change_question()
+                shown[game.question_id] += 1
+                knows = strategy.knows(level, rng)
+            else:
+                game.used_supports |= AI_SUPPORT
+                hinted = rng.random() < ai_accuracy
+            support = strategy.lifeline(game, knows, used)
+
+        correct = game.current_question.correct
+        if knows or hinted:
+            answer = correct
+        else:
+            removed = game.removed_mask
+            answer = rng.choice([i for i in (1, 2, 3, 4) if not removed & (1 << i)])
+        status = game.check_answer(answer)['status']
+        for support in used:
+            row[3 + 2 * LIFELINES.index(support)] = answer == correct
+        if status != 'correct':
+            row[LEVEL] = level
+            row[WON] = status == 'won'
+            break
+    record += row
+
+
+def _init_worker(questions_file: str):
+    """Load the shared bank once per worker and keep simulated games out of the journal and statistics"""
+    set_event_log(EventLog(None))
+    set_answer_stats(AnswerStats(None, max_pending=1))
+    get_question_bank(questions_file)
+
+
+def _play_shard(job: Tuple[str, Strategy, int, int, float]) -> Tuple[bytes, Dict[int, int]]:
+    questions_file, strategy, games, seed, ai_accuracy = job
+    # Lifelines draw from the module-level random generator, seed it too so shards are reproducible
+    random.seed(seed)
+    rng = random.Random(seed)
+    game = MillionaireGame(question_bank=get_question_bank(questions_file))
+    record = bytearray()
+    shown: Counter = Counter()
+    for _ in range(games):
+        play_game(game, strategy, rng, ai_accuracy, record, shown)
+    return bytes(record), dict(shown)
+
+
+def simulate(games: int, strategy: Strategy, processes: int = 1, seed: int = 0,
+             questions_file: str = 'questions.json', ai_accuracy: float = 0.75,
+             shard_size: int = 20_000) -> Dict:
+    """
+    Play ``games`` games and return their summary (see ``summarize``) with the
+    throughput. Games are split into shards seeded from ``seed``, so a run gives
+    the same result whatever the number of processes.
+    """
+    jobs = [(questions_file, strategy, min(shard_size, games - start), seed * 1_000_003 + start, ai_accuracy)
+            for start in range(0, games, shard_size)]
+    started = time.perf_counter()
+    if processes <= 1:
+        # Set up like a worker process, and give the caller its journal and statistics back afterwards
+        shared_log, shared_stats = event_log._shared_log, answer_stats._shared_stats
+        _init_worker(questions_file)
+        try:
+            results = [_play_shard(job) for job in jobs]
+        finally:
+            set_event_log(shared_log)
+            set_answer_stats(shared_stats)
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(questions_file,)) as pool:
+            results = pool.map(_play_shard, jobs)
+    elapsed = time.perf_counter() - started
+
+    shown: Counter = Counter()
+    for _, counts in results:
+        shown.update(counts)
+    summary = summarize(b''.join(records for records, _ in results), shown, MillionaireGame.max_level)
+    summary.update(strategy=strategy.name, processes=max(processes, 1), seconds=round(elapsed, 3),
+                   games_per_second=round(games / elapsed) if elapsed else 0)
+    return summary
+
+
+def _bincount(records: bytes, column: int, size: int, weight: Optional[int] = None) -> List[int]:
+    """Occurrences of each value 0..size-1 in a column, optionally only in rows where ``weight`` is set"""
+    if numpy is not None:
+        table = numpy.frombuffer(records, dtype=numpy.uint8).reshape(-1, FIELDS)
+        values = table[:, column] if weight is None else table[:, column][table[:, weight] != 0]
+        return numpy.bincount(values, minlength=size)[:size].tolist()
+    values = records[column::FIELDS]
+    counts = Counter(values if weight is None else compress(values, records[weight::FIELDS]))
+    return [counts.get(value, 0) for value in range(size)]
+
+
+def summarize(records: bytes, shown: Dict[int, int], max_level: int) -> Dict:
+    """
+    Win rate overall and per level, and per lifeline how often it was used and
+    how often the question it was used on was then answered correctly, next to
+    the pass rate of all players at the same levels.
+    """
+    games = len(records) // FIELDS
+    size = max_level + 1
+    ended = _bincount(records, LEVEL, size)
+    won = _bincount(records, LEVEL, size, weight=WON)
+
+    levels = {}
+    reached = games
+    pass_rate = [0.0] * size
+    for level in range(1, size):
+        passed = reached - ended[level] + won[level]
+        pass_rate[level] = passed / reached if reached else 0.0
+        levels[level] = {"reached": reached, "passed": passed, "pass_rate": round(pass_rate[level], 4)}
+        reached -= ended[level]
+
+    lifelines = {}
+    for index, support in enumerate(LIFELINES):
+        column = 2 + 2 * index
+        used_at = _bincount(records, column, size)
+        correct_at = _bincount(records, column, size, weight=column + 1)
+        used = games - used_at[0]
+        correct = sum(correct_at[1:])
+        baseline = sum(used_at[level] * pass_rate[level] for level in range(1, size))
+        lifelines[support] = {
+            "used": used,
+            "use_rate": round(used / games, 4) if games else 0.0,
+            "mean_level": round(sum(level * used_at[level] for level in range(1, size)) / used, 2) if used else 0.0,
+            "correct_rate": round(correct / used, 4) if used else 0.0,
+            "baseline_rate": round(baseline / used, 4) if used else 0.0,
+        }
+
+    counts = sorted(shown.values())
+    return {
+        "games": games,
+        "wins": sum(won),
+        "win_rate": round(sum(won) / games, 4) if games else 0.0,
+        "levels": levels,
+        "lifelines": lifelines,
+        "questions": {"shown": len(counts), "min": counts[0] if counts else 0,
+                      "max": counts[-1] if counts else 0},
+    }
+
+
+def print_summary(summary: Dict):
+    print(f"{summary['games']} games, strategy {summary['strategy']}: win rate {summary['win_rate']:.2%}, "
+          f"{summary['games_per_second']} games/s on {summary['processes']} processes")
+    print(f"\n{'level':>5}{'reached':>10}{'passed':>10}{'pass rate':>11}")
+    for level, row in summary['levels'].items():
+        print(f"{level:>5}{row['reached']:>10}{row['passed']:>10}{row['pass_rate']:>11.2%}")
+    print(f"\n{'lifeline':<17}{'used':>9}{'mean level':>12}{'correct':>9}{'baseline':>10}")
+    for support, row in summary['lifelines'].items():
+        print(f"{support:<17}{row['use_rate']:>9.2%}{row['mean_level']:>12.2f}"
+              f"{row['correct_rate']:>9.2%}{row['baseline_rate']:>10.2%}")
+    questions = summary['questions']
+    print(f"\n{questions['shown']} questions shown, {questions['min']} to {questions['max']} times each")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate games to check balance and win rates")
+    parser.add_argument('--games', type=int, default=100_000)
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='skill')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--questions', default='questions.json')
+    parser.add_argument('--ai-accuracy', type=float, default=0.75,
+                        help="chance that a player who used AI support answers correctly")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = simulate(args.games, STRATEGIES[args.strategy](), processes=args.processes, seed=args.seed,
+                       questions_file=args.questions, ai_accuracy=args.ai_accuracy)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional, Tuple, Union
+
+from session_store import KeyValueBackend, SQLiteKeyValue
+
+# version, flags | game id (nonce), step counter, issued at | game state | MAC
+TOKEN_VERSION = 1
+FLAG_ENCRYPTED = 1
+_HEADER = struct.Struct('<BB')
+_CLAIMS = struct.Struct('<QII')
+MAC_SIZE = 16
+_FROM_URLSAFE = bytes.maketrans(b'-_', b'+/')
+
+
+def _mac(key: bytes, data: bytes, size: int = MAC_SIZE) -> bytes:
+    # Keyed BLAKE2s is a MAC in its own right and much cheaper per call than HMAC-SHA256
+    return hashlib.blake2s(data, key=key, digest_size=size).digest()
+
+
+class InvalidToken(Exception):
+    """Raised for tokens that are malformed, forged, expired or replayed"""
+
+
+class TokenClaims(NamedTuple):
+    nonce: int
+    counter: int
+    issued_at: int
+    state: bytes
+
+
+class ReplayGuard:
+    """
+    Remembers the next valid step counter per game so an older token, for
+    example one taken before a lifeline was used, cannot be played again.
+
+    Entries are kept for ``ttl_seconds`` after a game's last step, the token
+    lifetime, after which its tokens have expired anyway. ``max_entries``
+    caps memory; a game evicted early (``evicted_early``) could replay its
+    unexpired tokens. The counters live in this process only: with several
+    workers, or across a restart, use SharedReplayGuard.
+    """
+
+    blocking = False
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_entries: int = 200_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        # nonce -> (next valid counter, time of the last claim), oldest claim first
+        self._latest: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.evicted_early = 0
+
+    def claim(self, nonce: int, counter: int) -> bool:
+        """
+        Accept a token once: afterwards only tokens with a higher counter are
+        valid, so two concurrent requests cannot both spend the same token.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._latest.get(nonce)
+            if entry is not None and counter < entry[0] and now - entry[1] < self.ttl_seconds:
+                self.rejected += 1
+                return False
+            self._latest[nonce] = (counter + 1, now)
+            self._latest.move_to_end(nonce)
+            latest = self._latest
+            while latest:
+                oldest = next(iter(latest.values()))
+                if now - oldest[1] >= self.ttl_seconds:
+                    latest.popitem(last=False)
+                elif len(latest) > self.max_entries:
+                    latest.popitem(last=False)
+                    self.evicted_early += 1
+                else:
+                    break
+            return True
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+
+class SharedReplayGuard:
+    """
+    ReplayGuard whose counters live in a KeyValueBackend (SQLiteKeyValue), so
+    every worker sharing the file, and the next process after a restart,
+    rejects the same replayed tokens. Claims are compare-and-set writes.
+    """
+
+    blocking = True
+    _COUNTER = struct.Struct('<I')
+
+    def __init__(self, backend: KeyValueBackend, ttl_seconds: float = 3600.0, expire_every: int = 1000):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.expire_every = expire_every
+        self._claims = 0
+        self.rejected = 0
+
+    def claim(self, nonce: int, counter: int) -> bool:
+        key = f"{nonce:016x}"
+        value = self._COUNTER.pack(counter + 1)
+        self._claims += 1
+        if self._claims % self.expire_every == 0:
+            self.backend.expire(self.expire_every)
+        # A lost race is retried once: the winner may have claimed an older step
+        for _ in range(2):
+            entry = self.backend.get(key)
+            if entry is None:
+                if self.backend.add(key, value, self.ttl_seconds):
+                    return True
+                continue
+            latest, version = entry
+            if counter < self._COUNTER.unpack(latest)[0]:
+                break
+            if self.backend.compare_and_set(key, value, version, self.ttl_seconds):
+                return True
+        self.rejected += 1
+        return False
+
+
+class StateTokenCodec:
+    """
+    Encodes game state into compact signed tokens (keyed BLAKE2s MAC).
+
+    The token carries the packed game state (see MillionaireGame.to_bytes), a
+    random per-game nonce and a step counter that increases with every action.
+    With ``encrypt`` the state is XORed with a keyed keystream unique to
+    (nonce, counter), so clients cannot read the question id.
+    """
+
+    def __init__(self, secret: bytes, ttl_seconds: int = 3600, encrypt: bool = True,
+                 replay_guard: Optional[Union[ReplayGuard, SharedReplayGuard]] = None):
+        # Independent 32-byte keys derived from the configured secret
+        self._mac_key = hmac.digest(secret, b'state-token-mac', 'sha256')
+        self._enc_key = hmac.digest(secret, b'state-token-enc', 'sha256')
+        self.ttl_seconds = ttl_seconds
+        self.encrypt = encrypt
+        self.replay_guard = replay_guard if replay_guard is not None else ReplayGuard(ttl_seconds)
+
+    def _keystream(self, nonce: int, counter: int, size: int) -> bytes:
+        return _mac(self._enc_key, _CLAIMS.pack(nonce, counter, 0), size)
+
+    def _xor(self, data: bytes, nonce: int, counter: int) -> bytes:
+        stream = self._keystream(nonce, counter, len(data))
+        return (int.from_bytes(data, 'little') ^ int.from_bytes(stream, 'little')).to_bytes(len(data), 'little')
+
+    def new_nonce(self) -> int:
+        return int.from_bytes(os.urandom(8), 'little')
+
+    def encode(self, state: bytes, nonce: int, counter: int) -> str:
+        flags = FLAG_ENCRYPTED if self.encrypt else 0
+        if self.encrypt:
+            state = self._xor(state, nonce, counter)
+        body = _HEADER.pack(TOKEN_VERSION, flags) + _CLAIMS.pack(nonce, counter, int(time.time())) + state
+        mac = _mac(self._mac_key, body)
+        return base64.urlsafe_b64encode(body + mac).rstrip(b'=').decode('ascii')
+
+    def decode(self, token: str) -> TokenClaims:
+        """Verify a token and claim it, the same token is rejected afterwards"""
+        try:
+            raw = binascii.a2b_base64(token.encode('ascii').translate(_FROM_URLSAFE) + b'==')
+        except (ValueError, UnicodeEncodeError):
+            raise InvalidToken("Malformed state token")
+        if len(raw) < _HEADER.size + _CLAIMS.size + MAC_SIZE:
+            raise InvalidToken("Malformed state token")
+
+        body, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        expected = _mac(self._mac_key, body)
+        if not hmac.compare_digest(mac, expected):
+            raise InvalidToken("Invalid state token signature")
+
+        version, flags = _HEADER.unpack_from(body)
+        if version != TOKEN_VERSION:
+            raise InvalidToken("Unsupported state token version")
+        nonce, counter, issued_at = _CLAIMS.unpack_from(body, _HEADER.size)
+        if time.time() - issued_at > self.ttl_seconds:
+            raise InvalidToken("State token expired")
+        if not self.replay_guard.claim(nonce, counter):
+            raise InvalidToken("State token was already used")
+
+        state = body[_HEADER.size + _CLAIMS.size:]
+        if flags & FLAG_ENCRYPTED:
+            state = self._xor(state, nonce, counter)
+        return TokenClaims(nonce, counter, issued_at, state)
+
+
+def create_token_codec() -> StateTokenCodec:
+    """
+    Codec configured from TOKEN_SECRET; without it tokens only verify on the
+    worker that issued them. With SESSION_BACKEND=sqlite used tokens are
+    tracked in SESSION_DB_PATH, so replays are caught by every worker.
+    """
+    secret = os.getenv('TOKEN_SECRET')
+    if not secret:
+        print("Warning: TOKEN_SECRET not set, using a random per-process secret for state tokens.")
+        secret_bytes = os.urandom(32)
+    else:
+        secret_bytes = secret.encode('utf-8')
+    ttl_seconds = int(os.getenv('TOKEN_TTL_SECONDS', '3600'))
+    replay_guard = None
+    if os.getenv('SESSION_BACKEND', 'memory') == 'sqlite':
+        backend = SQLiteKeyValue(os.getenv('SESSION_DB_PATH', 'sessions.sqlite3'), table='token_counters')
+        replay_guard = SharedReplayGuard(backend, ttl_seconds)
+    return StateTokenCodec(
+        secret_bytes,
+        ttl_seconds=ttl_seconds,
+        encrypt=os.getenv('TOKEN_ENCRYPT', '1') != '0',
+        replay_guard=replay_guard,
+    )
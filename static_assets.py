@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Set
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Content codings an Accept-Encoding header allows; "gzip;q=0" rules gzip out, "*" stands for br and gzip"""
+    accepted = set()
+    refused = set()
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip()
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        (accepted if quality > 0 else refused).add(coding)
+    if '*' in accepted:
+        accepted |= {'br', 'gzip'} - refused
+    return accepted - refused
+
+
+class StaticAsset:
+    """One file held in memory with its compressed variants and a strong ETag"""
+    __slots__ = ('body', 'gzip_body', 'br_body', 'etag', 'mtime', 'media_type')
+
+    def __init__(self, body: bytes, mtime: float, media_type: str):
+        self.body = body
+        self.mtime = mtime
+        self.media_type = media_type
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.br_body = brotli.compress(body, quality=11) if brotli else None
+
+    def select(self, accept_encoding: str):
+        """Pick the smallest representation the client accepts, returns (body, encoding, etag)"""
+        accepted = accepted_encodings(accept_encoding)
+        if self.br_body is not None and 'br' in accepted:
+            return self.br_body, 'br', f'"{self.etag}-br"'
+        if 'gzip' in accepted:
+            return self.gzip_body, 'gzip', f'"{self.etag}-gz"'
+        return self.body, None, f'"{self.etag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """Weak comparison as required for If-None-Match, any encoding of the same body matches"""
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag.strip('"').split('-')[0] == self.etag:
+                return True
+        return False
+
+
+class AssetCache:
+    """
+    Serves files from a directory out of memory.
+
+    Each file is read and compressed once. With ``watch`` enabled (for
+    development) the file's mtime is checked on every request and the entry is
+    rebuilt when it changes.
+    """
+
+    def __init__(self, directory: str = 'templates', watch: bool = False,
+                 cache_control: str = 'no-cache', media_type: str = 'text/html'):
+        self.directory = directory
+        self.watch = watch
+        self.cache_control = cache_control
+        self.media_type = media_type
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> StaticAsset:
+        asset = self._assets.get(name)
+        if asset is not None and not self.watch:
+            return asset
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime
+        if asset is not None and asset.mtime == mtime:
+            return asset
+        with self._lock:
+            with open(path, 'rb') as f:
+                asset = StaticAsset(f.read(), mtime, self.media_type)
+            self._assets[name] = asset
+        return asset
+
+    def response(self, name: str, request: Request) -> Response:
+        asset = self.get(name)
+        headers = {
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        body, encoding, etag = asset.select(request.headers.get('accept-encoding', ''))
+        headers['ETag'] = etag
+
+        if_none_match: Optional[str] = request.headers.get('if-none-match')
+        if if_none_match and asset.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(content=body, media_type=asset.media_type, headers=headers)
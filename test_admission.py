@@ -0,0 +1,111 @@
+"""
+Tests for rate limiting and AI hint load shedding
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import admission
+from admission import AIGate, Admission, TokenBuckets
+from main import app
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_buckets_refill_at_the_rate_and_expire_once_full():
+    clock = Clock()
+    buckets = TokenBuckets(rate=2, burst=4, clock=clock)
+    assert [buckets.take("a") for _ in range(4)] == [0.0] * 4
+    assert buckets.take("a") == 0.5
+    clock.now = 1.0
+    assert buckets.take("a") == 0.0 and buckets.take("a") == 0.0
+    assert buckets.take("a") > 0
+
+    buckets.take("b")
+    assert len(buckets) == 2
+    # Both have refilled completely by now, the next call drops them
+    clock.now = 10.0
+    buckets.take("c")
+    assert len(buckets) == 1
+
+
+def test_buckets_drop_the_least_recently_used_beyond_the_cap():
+    buckets = TokenBuckets(rate=1, burst=1, max_entries=3, clock=Clock())
+    for key in "abcde":
+        assert buckets.take(key) == 0.0
+    assert len(buckets) == 3
+    assert buckets.take("e") == 1.0
+
+
+def test_gate_queues_then_sheds():
+    async def run():
+        gate = AIGate(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def call():
+            async with gate.slot() as admitted:
+                if admitted:
+                    await release.wait()
+                return admitted
+
+        first = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        # One running, one waiting: the next is shed without waiting, warming is skipped
+        assert await call() is False
+        assert await gate.acquire(wait=False) is False
+        # The queued call gives up after queue_timeout
+        assert await queued is False
+        release.set()
+        assert await first is True
+        assert gate.stats() == {"in_flight": 0, "waiting": 0, "shed": 2}
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    limits = Admission(starts=TokenBuckets(rate=0.01, burst=2), sessions=TokenBuckets(rate=0.01, burst=3))
+    monkeypatch.setattr(admission, '_shared_admission', limits)
+    return limits
+
+
+def test_api_answers_429_over_the_limits(limited):
+    client = TestClient(app)
+    assert client.post("/api/start", json={"session_id": "limit-a"}).status_code == 200
+    assert client.post("/api/start", json={"session_id": "limit-b"}).status_code == 200
+    rejected = client.post("/api/start", json={"session_id": "limit-c"})
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) > 0
+    assert client.get("/api/session/limit-c").status_code == 404
+
+    statuses = [client.post("/api/support", json={"session_id": "limit-a", "support_type": "fifty_fifty"}).status_code
+                for _ in range(4)]
+    assert statuses[-1] == 429 and 429 not in statuses[:3]
+    # Other games are not affected
+    assert client.post("/api/support", json={"session_id": "limit-b", "support_type": "fifty_fifty"}).status_code == 200
+    assert limited.stats()["limited"] == {"start": 1, "session": 1}
+
+
+def test_batches_are_charged_like_single_requests(limited):
+    client = TestClient(app)
+    too_many = client.post("/api/batch", json={"actions": [
+        {"action": "start", "session_id": f"limit-batch-{i}"} for i in range(3)]})
+    assert too_many.status_code == 413 and "2" in too_many.json()["detail"]
+
+    body = client.post("/api/batch", json={"actions": [{"action": "start", "session_id": "limit-batch"}] + [
+        {"action": "support", "session_id": "limit-batch", "support_type": "fifty_fifty"} for _ in range(4)]}).json()
+    assert [result["status"] for result in body["results"]] == ["success", "success", "error", "error", "error"]
+    assert [result.get("code") for result in body["results"]][-1] == 429
+    assert body["results"][4]["retry_after"] > 0
+    assert client.post("/api/support", json={"session_id": "limit-batch", "support_type": "ai_support"}
+                       ).status_code == 429
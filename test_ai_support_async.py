@@ -0,0 +1,166 @@
+"""
+Tests for the async AI hint path using a local fake backend
+"""
+
+import asyncio
+
+from ai_support import CircuitBreaker, FakeBackend, GeminiAISupport
+
+ANSWERS = {1: "London", 2: "Berlin", 3: "Paris", 4: "Madrid"}
+EXPLANATION = "Paris is the capital of France. It sits on the Seine."
+
+
+def hint(support: GeminiAISupport, **kwargs) -> str:
+    return asyncio.run(support.get_ai_hint_async("Capital of France?", ANSWERS, EXPLANATION, **kwargs))
+
+
+def test_async_hint_uses_backend():
+    backend = FakeBackend(response="My guess is Paris.")
+    support = GeminiAISupport(backend=backend)
+    assert hint(support) == "My guess is Paris."
+    assert backend.calls == 1
+
+
+def test_timeout_falls_back_to_simple_hint():
+    support = GeminiAISupport(backend=FakeBackend(latency=1.0))
+    assert hint(support, timeout=0.01) == support.get_simple_hint(EXPLANATION)
+    assert support.breaker.failures == 1
+
+
+def test_breaker_opens_after_repeated_failures():
+    backend = FakeBackend(fail=True)
+    support = GeminiAISupport(backend=backend, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    hint(support)
+    hint(support)
+    assert support.breaker.state == "open"
+
+    assert hint(support) == support.get_simple_hint(EXPLANATION)
+    assert backend.calls == 2
+
+
+class CountingBackend(FakeBackend):
+    def __init__(self):
+        super().__init__(latency=0.02)
+        self.active = 0
+        self.peak = 0
+
+    async def generate_async(self, prompt: str) -> str:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().generate_async(prompt)
+        finally:
+            self.active -= 1
+
+
+def test_concurrency_is_capped():
+    backend = CountingBackend()
+    support = GeminiAISupport(backend=backend, max_concurrency=2)
+
+    async def run():
+        await asyncio.gather(*[
+            support.get_ai_hint_async("Capital of France?", ANSWERS, EXPLANATION) for _ in range(6)
+        ])
+
+    asyncio.run(run())
+    assert backend.calls == 6
+    assert backend.peak == 2
+
+
+def stream(support: GeminiAISupport, **kwargs):
+    async def run():
+        return [chunk async for chunk in support.stream_ai_hint("Capital of France?", ANSWERS, EXPLANATION, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_stream_yields_chunks():
+    support = GeminiAISupport(backend=FakeBackend(response="My guess is Paris."))
+    chunks = stream(support)
+    assert chunks == ["My", " guess", " is", " Paris."]
+    assert support.breaker.failures == 0
+
+
+def test_stream_ends_with_none_on_failure_or_timeout():
+    support = GeminiAISupport(backend=FakeBackend(fail=True))
+    assert stream(support) == [None]
+
+    slow = GeminiAISupport(backend=FakeBackend(response="My guess is Paris.", chunk_delay=0.05))
+    assert stream(slow, timeout=0.08)[-1] is None
+    assert slow.breaker.failures == 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def half_open_support(**kwargs) -> GeminiAISupport:
+    clock = Clock()
+    support = GeminiAISupport(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock), **kwargs)
+    support.breaker.record_failure()
+    clock.now = 10.0
+    assert support.breaker.state == "half_open"
+    return support
+
+
+def test_cancelled_or_abandoned_trial_does_not_keep_the_breaker_shut():
+    support = half_open_support(backend=FakeBackend(response="My guess is Paris.", latency=1.0, chunk_delay=1.0))
+
+    async def cancel_trial():
+        task = asyncio.create_task(support.try_ai_hint_async("Capital of France?", ANSWERS, EXPLANATION))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_trial())
+    assert support.breaker.allow()
+    support.breaker.release_trial()
+
+    async def disconnect_mid_stream():
+        support.backend.latency = 0
+        hints = support.stream_ai_hint("Capital of France?", ANSWERS, EXPLANATION)
+        assert await hints.__anext__() == "My"
+        await hints.aclose()
+
+    asyncio.run(disconnect_mid_stream())
+    assert support.breaker.allow()
+    assert support._semaphore._value == support.max_concurrency
+
+
+def test_only_the_trial_call_releases_the_trial():
+    clock = Clock()
+    support = GeminiAISupport(backend=FakeBackend(latency=1.0, chunk_delay=1.0),
+                              breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock))
+
+    async def run():
+        # Calls started while the breaker was closed, then cancelled after another call took the trial
+        call = asyncio.create_task(support.try_ai_hint_async("Capital of France?", ANSWERS, EXPLANATION))
+        hints = support.stream_ai_hint("Capital of France?", ANSWERS, EXPLANATION)
+        stream = asyncio.create_task(hints.__anext__())
+        await asyncio.sleep(0.01)
+        support.breaker.record_failure()
+        clock.now = 10.0
+        assert support.breaker.allow()
+        call.cancel()
+        stream.cancel()
+        await asyncio.gather(call, stream, return_exceptions=True)
+        await hints.aclose()
+
+    asyncio.run(run())
+    assert support.breaker.state == "half_open" and not support.breaker.allow()
+
+
+def test_waiting_for_a_slot_is_not_a_backend_failure():
+    support = GeminiAISupport(backend=FakeBackend(latency=0.2), max_concurrency=1, timeout=0.1)
+
+    async def run():
+        return await asyncio.gather(*[
+            support.try_ai_hint_async("Capital of France?", ANSWERS, EXPLANATION) for _ in range(2)
+        ])
+
+    assert asyncio.run(run()) == [None, None]
+    # The call that ran timed out; the one queued behind it is not held against the backend
+    assert support.breaker.failures == 1
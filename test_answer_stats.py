@@ -0,0 +1,70 @@
+"""
+Tests for batched answer statistics and difficulty recalibration
+"""
+
+import sqlite3
+import threading
+
+from answer_stats import AnswerStats, recalibrate
+from bank_registry import bank_key
+
+
+def test_concurrent_records_are_flushed_exactly(tmp_path):
+    path = str(tmp_path / "stats.sqlite3")
+    worker_a, worker_b = AnswerStats(path), AnswerStats(path)
+
+    def play(stats):
+        for i in range(2000):
+            stats.record_answer(i % 5 + 1, correct=i % 2 == 0)
+        stats.record_lifeline(1, 'fifty_fifty')
+
+    threads = [threading.Thread(target=play, args=(stats,)) for stats in (worker_a, worker_a, worker_b)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert worker_a.flush() == 2 * (2000 + 1000 + 1)
+    assert worker_b.flush() == 2000 + 1000 + 1
+    assert worker_a.flush() == 0
+
+    totals = AnswerStats(path).totals()
+    assert sum(counts['attempts'] for counts in totals.values()) == 6000
+    assert sum(counts['correct'] for counts in totals.values()) == 3000
+    assert totals[1]['fifty_fifty'] == 3
+
+
+def test_recalibrate_moves_hard_questions_up_and_keeps_level_sizes():
+    questions = [{"id": 1, "level": 1}, {"id": 2, "level": 1}, {"id": 3, "level": 2}, {"id": 4, "level": 2},
+                 {"id": 5, "level": 3}]
+    totals = {
+        1: {"attempts": 100, "correct": 10},   # hard for level 1
+        2: {"attempts": 100, "correct": 90},
+        3: {"attempts": 100, "correct": 95},   # easy for level 2
+        4: {"attempts": 100, "correct": 50},
+        5: {"attempts": 5, "correct": 0},      # too few answers to move
+    }
+    updated, moved = recalibrate(questions, totals, min_attempts=30)
+    levels = {q["id"]: q["level"] for q in updated}
+    assert levels == {1: 2, 2: 1, 3: 1, 4: 2, 5: 3}
+    assert moved == 2
+
+
+def test_questions_with_the_same_id_in_two_banks_are_counted_apart(tmp_path):
+    path = str(tmp_path / "stats.sqlite3")
+    with sqlite3.connect(path) as db:
+        # A file written before question banks existed
+        db.execute("CREATE TABLE question_stats (question_id INTEGER PRIMARY KEY, attempts INTEGER NOT NULL DEFAULT 0,"
+                   " correct INTEGER NOT NULL DEFAULT 0, fifty_fifty INTEGER NOT NULL DEFAULT 0,"
+                   " change_question INTEGER NOT NULL DEFAULT 0, ai_support INTEGER NOT NULL DEFAULT 0,"
+                   " updated REAL NOT NULL)")
+        db.execute("INSERT INTO question_stats (question_id, attempts, correct, updated) VALUES (7, 4, 1, 0)")
+    db.close()
+
+    stats = AnswerStats(path)
+    stats.record_answer(7, correct=True)
+    stats.record_answer(7, correct=False, bank_key=bank_key("en"))
+    stats.record_lifeline(7, 'ai_support', bank_key=bank_key("en"))
+    stats.flush()
+    assert stats.totals()[7]['attempts'] == 5 and stats.totals()[7]['correct'] == 2
+    english = stats.totals(bank_key("en"))[7]
+    assert english['attempts'] == 1 and english['correct'] == 0 and english['ai_support'] == 1
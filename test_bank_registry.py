@@ -0,0 +1,124 @@
+"""
+Tests for question banks by locale and topic
+"""
+
+import gc
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import bank_registry
+from bank_registry import BankRegistry, UnknownBank
+from gamelogic import MillionaireGame
+from main import app
+
+
+def write_bank(path, prefix):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = [{"id": level * 10 + i, "level": level, "question": f"{prefix} {level}.{i}?", "answer1": "A",
+             "answer2": "B", "answer3": "C", "answer4": "D", "correct": 1, "explanation": ""}
+            for level in range(1, 9) for i in range(3)]
+    path.write_text(json.dumps(rows), encoding="utf-8")
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    write_bank(tmp_path / "en.json", "English")
+    write_bank(tmp_path / "en" / "history.json", "History")
+    write_bank(tmp_path / "vi" / "economics.json", "Economics")
+    registry = BankRegistry(directory=str(tmp_path), max_loaded=1)
+    monkeypatch.setattr(bank_registry, '_shared_registry', registry)
+    return registry
+
+
+def test_banks_are_found_by_locale_and_topic_and_loaded_on_demand(registry):
+    assert sorted(registry.files()) == ["en", "en/history", "vi", "vi/economics"]
+    assert registry.loads == 0
+    assert registry.get("EN/History") is registry.get("en/history")
+    assert registry.get("en/history").get(10).question == "History 1.0?"
+    assert registry.loads == 1
+    with pytest.raises(UnknownBank):
+        registry.get("fr")
+
+
+def test_evicted_bank_is_shared_until_its_last_game_ends(registry):
+    game = MillionaireGame(bank="en")
+    game.start_game()
+    english = game.question_bank
+    registry.get("vi/economics")
+    assert list(registry._loaded) == ["vi/economics"] and registry.evictions == 1
+    # Still in use: the same copy comes back instead of a second load
+    assert registry.get("en") is english and registry.loads == 2
+
+    # Nothing held on to economics once evicted, so it is loaded again; english goes with its last game
+    registry.get("vi/economics")
+    assert registry.loads == 3
+    del game, english
+    gc.collect()
+    assert "en" not in registry._live
+    registry.get("en")
+    assert registry.loads == 4
+
+
+def test_state_remembers_the_bank(registry):
+    game = MillionaireGame(bank="en/history")
+    game.start_game()
+    state = game.to_bytes()
+    assert state[0] == 5 and len(state) == 25
+    restored = MillionaireGame.from_bytes(state)
+    assert restored.question_bank is game.question_bank
+    assert restored.current_question.question.startswith("History")
+
+    default = MillionaireGame()
+    default.start_game()
+    assert default.to_bytes()[0] == 4
+    assert MillionaireGame.from_bytes(default.to_bytes()).question_bank is default.question_bank
+
+    other = BankRegistry(directory=str(registry.directory) + "-missing")
+    bank_registry.set_bank_registry(other)
+    with pytest.raises(ValueError):
+        MillionaireGame.from_bytes(state)
+
+
+def test_api_starts_games_on_the_requested_bank(registry):
+    client = TestClient(app)
+    response = client.post("/api/start", json={"session_id": "bank-en", "bank": "en"})
+    assert response.status_code == 200
+    assert response.json()["question"]["question"].startswith("English")
+    token = client.post("/api/start", json={"stateless": True, "bank": "vi/economics"}).json()["state_token"]
+    answer = client.post("/api/answer", json={"answer": 1, "state_token": token})
+    assert answer.json()["status"] == "correct"
+
+    assert client.post("/api/start", json={"session_id": "bank-fr", "bank": "fr"}).status_code == 400
+    banks = {bank["id"]: bank for bank in client.get("/api/banks").json()["banks"]}
+    assert banks["vi"]["default"] and banks["en"]["loaded"]
+
+
+def test_games_survive_a_reload_that_renumbers_their_bank(registry, tmp_path, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "admin")
+    client = TestClient(app)
+    start = client.post("/api/start", json={"session_id": "bank-renumbered", "bank": "en"}).json()
+    token = client.post("/api/start", json={"stateless": True, "bank": "en"}).json()["state_token"]
+    assert start["question"]["question"].startswith("English 1.")
+
+    rows = json.loads((tmp_path / "en.json").read_text(encoding="utf-8"))
+    for row in rows:
+        row["id"] += 1000
+        row["question"] = row["question"].replace("English", "Renumbered")
+    (tmp_path / "en.json").write_text(json.dumps(rows), encoding="utf-8")
+    reloaded = client.post("/api/admin/reload-questions", headers={"X-Admin-Token": "admin"})
+    assert reloaded.status_code == 200
+
+    # The answer was meant for a question that is gone: refused, and another of the same level is in play
+    answer = client.post("/api/answer", json={"session_id": "bank-renumbered", "answer": 1})
+    assert answer.status_code == 409
+    support = client.post("/api/support", json={"session_id": "bank-renumbered", "support_type": "fifty_fifty"})
+    assert support.status_code == 200 and 1 not in support.json()["removed_answers"]
+    answer = client.post("/api/answer", json={"session_id": "bank-renumbered", "answer": 1}).json()
+    assert answer["status"] == "correct" and answer["question"]["question"].startswith("Renumbered 2.")
+
+    stale = client.post("/api/answer", json={"answer": 1, "state_token": token})
+    assert stale.status_code == 409
+    answer = client.post("/api/answer", json={"answer": 1, "state_token": stale.headers["X-State-Token"]})
+    assert answer.json()["status"] == "correct"
@@ -0,0 +1,84 @@
+"""
+Tests for the batched game endpoint
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from gamelogic import MillionaireGame
+from question_bank import get_question_bank
+from session_store import SharedSessionStore, SQLiteKeyValue
+
+client = TestClient(main.app)
+
+
+def correct_answer(question_text):
+    bank = get_question_bank()
+    return next(q.correct for level in bank.levels() for q in bank.questions_for_level(level)
+                if q.question == question_text)
+
+
+def test_batch_runs_actions_in_order_and_saves_sessions():
+    response = client.post("/api/batch", json={"actions": [
+        {"action": "start", "session_id": "batch-a"},
+        {"action": "start", "session_id": "batch-b"},
+        {"action": "support", "session_id": "batch-a", "support_type": "fifty_fifty"},
+        {"action": "support", "session_id": "batch-a", "support_type": "fifty_fifty"},
+        {"action": "answer", "session_id": "missing", "answer": 1},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == ["success", "success", "success", "error", "error"]
+    assert body["results"][4]["code"] == 404
+    assert body["sessions"] == {"batch-a": {"status": "saved"}, "batch-b": {"status": "saved"}}
+
+    session = client.get("/api/session/batch-a").json()
+    assert session["supports"]["fifty_fifty"] is False
+
+
+def test_batch_chains_stateless_games_and_stops_on_error():
+    start = client.post("/api/batch", json={"actions": [
+        {"action": "start", "session_id": "kiosk", "stateless": True},
+    ]}).json()
+    question = start["results"][0]["question"]["question"]
+    token = start["sessions"]["kiosk"]["state_token"]
+
+    body = client.post("/api/batch", json={"stop_on_error": True, "actions": [
+        {"action": "answer", "session_id": "kiosk", "state_token": token, "answer": correct_answer(question)},
+        {"action": "support", "session_id": "kiosk", "support_type": "bogus"},
+        {"action": "support", "session_id": "kiosk", "support_type": "fifty_fifty"},
+    ]}).json()
+    assert [r["status"] for r in body["results"]] == ["correct", "error"]
+    assert body["sessions"]["kiosk"]["state_token"] != token
+
+    # The spent token cannot be replayed
+    replay = client.post("/api/answer", json={"state_token": token, "answer": 1})
+    assert replay.status_code == 401
+
+
+def test_moves_reported_by_a_batch_are_saved_even_if_a_later_one_conflicts(tmp_path, monkeypatch):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SharedSessionStore(SQLiteKeyValue(path), MillionaireGame.from_bytes)
+    other_worker = SharedSessionStore(SQLiteKeyValue(path), MillionaireGame.from_bytes)
+    monkeypatch.setattr(main, 'game_sessions', store)
+    start = client.post("/api/start", json={"session_id": "batch-c"}).json()
+    support_result = main.support_result
+
+    async def support_racing_another_worker(game, support_type):
+        other = other_worker.get("batch-c")
+        other.use_fifty_fifty()
+        other_worker.save("batch-c", other)
+        return await support_result(game, support_type)
+
+    monkeypatch.setattr(main, 'support_result', support_racing_another_worker)
+    body = client.post("/api/batch", json={"actions": [
+        {"action": "answer", "session_id": "batch-c", "answer": correct_answer(start["question"]["question"])},
+        {"action": "support", "session_id": "batch-c", "support_type": "change_question"},
+    ]}).json()
+    assert [r["status"] for r in body["results"]] == ["correct", "error"]
+    assert body["results"][1]["code"] == 409
+
+    # The answer reported as correct was saved before the conflict
+    session = client.get("/api/session/batch-c").json()
+    assert session["level"] == 2
+    assert session["supports"] == {"fifty_fifty": False, "change_question": True, "ai_support": True}
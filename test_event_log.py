@@ -0,0 +1,90 @@
+"""
+Tests for the game event journal and its replay
+"""
+
+from answer_stats import AnswerStats, set_answer_stats
+from event_log import EventLog, journal_files, load_profile, read_events, replay, set_event_log
+from gamelogic import MillionaireGame
+
+
+def test_events_are_written_in_batches_and_rotated(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = EventLog(path, flush_interval=0.01, fsync_interval=0, max_bytes=2000, backups=2)
+    for i in range(200):
+        log.record('answer', 7, question=i, answer=1, status='correct')
+        if i % 20 == 19:
+            assert log.flush()
+    log.close()
+
+    files = journal_files(path)
+    assert files == [path + ".2", path + ".1", path]
+    assert log.rotations >= 2
+    kept = [event['question'] for event in read_events(files)]
+    assert kept == list(range(200 - len(kept), 200))
+    assert all(event['game'] == 7 for event in read_events(files))
+    # Only the two newest rotated files are kept
+    assert not (tmp_path / "events.jsonl.3").exists()
+
+
+def test_full_buffer_drops_the_oldest_events():
+    log = EventLog('unused.jsonl', capacity=3)
+    log._thread = object()  # pretend the writer runs, so nothing is drained
+    for i in range(5):
+        log.record('start', i, level=1, question=1)
+    assert log.dropped == 2
+    assert [event[2] for event in log._buffer] == [2, 3, 4]
+
+
+def test_replay_reproduces_journaled_games(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = EventLog(path, flush_interval=0.01)
+    set_event_log(log)
+    set_answer_stats(AnswerStats(None))
+    try:
+        for seed in (11, 12, 13):
+            game = MillionaireGame()
+            game.start_game(seed=seed)
+            game.use_fifty_fifty()
+            game.use_change_question()
+            game.check_answer(game.current_question.correct)
+            game.check_answer(game.current_question.correct % 4 + 1)
+    finally:
+        log.close()
+        set_event_log(EventLog(None))
+    events = list(read_events([path]))
+
+    report = replay(events)
+    assert report.games == 3 and report.orphaned == 0
+    assert report.mismatches == []
+    assert load_profile(events)[0] == [('support', 'fifty_fifty'), ('support', 'change_question'),
+                                       ('answer', True), ('answer', False)]
+
+    # A journal that does not match the game logic is reported
+    tampered = [dict(event, status='won') if event['event'] == 'answer' else event for event in events]
+    assert replay(tampered).mismatches
+
+
+def test_games_sharing_a_seed_are_replayed_apart(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = EventLog(path, flush_interval=0.01)
+    set_event_log(log)
+    set_answer_stats(AnswerStats(None))
+    try:
+        winner, loser = MillionaireGame(), MillionaireGame()
+        winner.start_game(seed=5)
+        loser.start_game(seed=5)
+        # Interleaved, as two players on the same seed would be
+        winner.check_answer(winner.current_question.correct)
+        loser.check_answer(loser.current_question.correct % 4 + 1)
+        restored = MillionaireGame.from_bytes(winner.to_bytes())
+        assert restored.game_id == winner.game_id != loser.game_id
+        restored.check_answer(restored.current_question.correct)
+    finally:
+        log.close()
+        set_event_log(EventLog(None))
+    events = list(read_events([path]))
+    assert {event['game'] for event in events} == {5}
+
+    report = replay(events)
+    assert report.games == 2 and report.orphaned == 0 and report.mismatches == []
+    assert sorted(load_profile(events)) == [[('answer', False)], [('answer', True), ('answer', True)]]
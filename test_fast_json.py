@@ -0,0 +1,36 @@
+"""
+Tests for pre-rendered question payloads spliced into responses
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import fast_json
+import main
+from fast_json import RawJSON, encode
+from question_bank import get_question_bank
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_encode_splices_raw_fragments(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, 'orjson', None)
+    content = {"status": "ok", "question": RawJSON(b'{"question":"Th\xe1\xbb\xa7 \\"\xc4\x91\xc3\xb4\\""}'),
+               "results": [{"question": RawJSON(b'[1,2]')}, {"text": "@raw:not-a-marker:0"}], "missing": None}
+    assert json.loads(encode(content)) == {
+        "status": "ok", "question": {"question": 'Thủ "đô"'},
+        "results": [{"question": [1, 2]}, {"text": "@raw:not-a-marker:0"}], "missing": None}
+    assert encode({"plain": [1, "á"]}) == '{"plain":[1,"á"]}'.encode('utf-8')
+
+
+def test_responses_carry_the_pre_rendered_question_without_the_answer():
+    client = TestClient(main.app)
+    body = client.post("/api/start", json={"session_id": "splice-a"}).json()
+    question = next(q for level in get_question_bank().levels() for q in get_question_bank().questions_for_level(level)
+                    if q.question == body["question"]["question"])
+    assert body["question"] == {"question": question.question, "answer1": question.answer1,
+                                "answer2": question.answer2, "answer3": question.answer3, "answer4": question.answer4}
+    assert get_question_bank().question_json(question.id) == encode(body["question"])
+    assert body["supports"] == {"fifty_fifty": True, "change_question": True, "ai_support": True}
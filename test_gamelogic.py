@@ -0,0 +1,79 @@
+"""
+Tests for MillionaireGame using the bundled questions.json
+"""
+
+import os
+
+import ai_support
+import hint_cache
+from ai_support import FakeBackend, GeminiAISupport
+from gamelogic import MillionaireGame
+from hint_cache import HintCache
+
+
+def new_game() -> MillionaireGame:
+    game = MillionaireGame()
+    game.start_game()
+    return game
+
+
+def test_correct_answers_win_the_game():
+    game = new_game()
+    for level in range(1, game.max_level + 1):
+        assert game.current_level == level
+        result = game.check_answer(game.current_question.correct)
+        assert result['correct']
+    assert result['status'] == 'won'
+
+
+def test_wrong_answer_ends_game_with_explanation():
+    game = new_game()
+    question = game.current_question
+    wrong = 1 if question.correct != 1 else 2
+    result = game.check_answer(wrong)
+    assert result['status'] == 'game_over'
+    assert result['correct_answer'] == question.correct
+    assert result['explanation'] == question.explanation
+
+
+def test_supports_can_only_be_used_once(monkeypatch):
+    # A local fake and a memory-only cache: no Gemini call, nothing saved to the hint database
+    monkeypatch.setitem(ai_support._shared_supports, os.getenv('GEMINI_API_KEY'),
+                        GeminiAISupport(backend=FakeBackend(response="My guess is B.")))
+    monkeypatch.setattr(hint_cache, '_shared_cache', HintCache())
+    game = new_game()
+    result = game.use_fifty_fifty()
+    assert len(result['removed_answers']) == 2
+    assert game.current_question.correct not in result['removed_answers']
+    assert sorted(game.get_current_state()['removed_answers']) == sorted(result['removed_answers'])
+    assert game.use_fifty_fifty()['status'] == 'error'
+
+    result = game.use_change_question()
+    assert result['new_state']['removed_answers'] == []
+    assert game.use_change_question()['status'] == 'error'
+
+    result = game.use_ai_support()
+    assert result['status'] == 'success' and "My guess is B." in result['ai_response']
+    assert game.use_ai_support()['status'] == 'error'
+    assert game.get_current_state()['supports'] == {
+        "fifty_fifty": False,
+        "change_question": False,
+        "ai_support": False,
+    }
+
+
+def test_games_share_the_question_bank():
+    assert new_game().question_bank is new_game().question_bank
+
+
+def test_prefetched_question_is_used_for_the_next_level():
+    game = new_game()
+    upcoming = game.prefetch_next_question()
+    assert upcoming.level == 2
+    assert game.prefetch_next_question() is upcoming
+
+    # Change question redraws at the current level and keeps the prefetch
+    game.use_change_question()
+    assert game.current_level == 1
+    game.check_answer(game.current_question.correct)
+    assert game.current_question is upcoming
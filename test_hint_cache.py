@@ -0,0 +1,67 @@
+"""
+Tests for the two-tier AI hint cache
+"""
+
+import asyncio
+
+from ai_support import FakeBackend, GeminiAISupport
+from hint_cache import HintCache, precompute_hints
+from question_bank import get_question_bank
+
+
+def sample_question():
+    return get_question_bank().questions_for_level(1)[0]
+
+
+def test_hints_persist_on_disk(tmp_path):
+    path = str(tmp_path / "hints.sqlite3")
+    question = sample_question()
+
+    cache = HintCache(path, max_variants=2)
+    assert cache.get(question) is None
+    assert cache.add(question, "first")
+    assert cache.add(question, "second")
+    assert not cache.add(question, "third")
+    cache.flush()
+
+    reopened = HintCache(path, max_variants=2)
+    assert reopened.variants(question) == ("first", "second")
+    assert reopened.get(question) in ("first", "second")
+
+
+def test_async_lookups_read_the_file_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "hints.sqlite3")
+    question = sample_question()
+    writer = HintCache(path)
+    # Another worker on the same file, started before the hint existed
+    reader = HintCache(path)
+    writer.add(question, "from disk")
+    writer.flush()
+
+    async def lookup():
+        return await reader.get_async(question), await reader.variants_async(question)
+
+    assert asyncio.run(lookup()) == ("from disk", ("from disk",))
+    assert reader.add(question, "second") and reader.variants(question) == ("from disk", "second")
+
+
+def test_edited_question_misses_the_cache():
+    question = sample_question()
+    cache = HintCache()
+    cache.add(question, "hint")
+    assert cache.get(question._replace(explanation="Changed.")) is None
+
+
+def test_precompute_warms_every_question():
+    bank = get_question_bank()
+    questions = list(bank.questions_for_level(1))
+    backend = FakeBackend(response="My guess is B.")
+    cache = HintCache()
+
+    counts = asyncio.run(precompute_hints(questions, cache, GeminiAISupport(backend=backend), rate=0))
+    assert counts["stored"] == len(questions)
+    assert all(cache.get(q) == "My guess is B." for q in questions)
+
+    # Already warm, nothing is requested again
+    asyncio.run(precompute_hints(questions, cache, GeminiAISupport(backend=backend), rate=0))
+    assert backend.calls == len(questions)
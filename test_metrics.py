@@ -0,0 +1,80 @@
+"""
+Tests for the Prometheus-style metrics and the request timing middleware
+"""
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from metrics import Histogram, MetricsMiddleware, Registry
+
+
+def test_exposition_format():
+    registry = Registry()
+    answers = registry.counter('answers_total', 'Answers\nby "outcome" \\ total', ('outcome',))
+    answers.labels('won').inc()
+    answers.inc('correct', amount=2)
+    registry.gauge('sessions_live', 'Live sessions').set_function(lambda: 3)
+    assert registry.counter('answers_total', 'ignored') is answers
+
+    assert registry.render() == (
+        '# HELP answers_total Answers\\nby "outcome" \\\\ total\n'
+        '# TYPE answers_total counter\n'
+        'answers_total{outcome="correct"} 2.0\n'
+        'answers_total{outcome="won"} 1.0\n'
+        '# HELP sessions_live Live sessions\n'
+        '# TYPE sessions_live gauge\n'
+        'sessions_live 3.0\n'
+    )
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter('hits_total', 'Hits', ('path',)).inc('/a"b\\c\nd')
+    assert 'hits_total{path="/a\\"b\\\\c\\nd"} 1.0' in registry.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    histogram = Histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.5, 0.1, 1.0))
+    child = histogram.labels('answer')
+    for value in (0.05, 0.1, 0.3, 0.7, 2.0):
+        child.observe(value)
+    # A value on a bound counts into that bucket (le is "less or equal")
+    assert histogram.samples() == [
+        'latency_seconds_bucket{stage="answer",le="0.1"} 2',
+        'latency_seconds_bucket{stage="answer",le="0.5"} 3',
+        'latency_seconds_bucket{stage="answer",le="1.0"} 4',
+        'latency_seconds_bucket{stage="answer",le="+Inf"} 5',
+        'latency_seconds_sum{stage="answer"} 3.15',
+        'latency_seconds_count{stage="answer"} 5',
+    ]
+    assert histogram.count('answer') == 5 and histogram.count('other') == 0
+    with histogram.time('other'):
+        pass
+    assert histogram.count('other') == 1
+
+
+def test_middleware_times_requests_per_route():
+    def ok(request):
+        return PlainTextResponse("ok")
+
+    def broken(request):
+        raise RuntimeError("boom")
+
+    histogram = Histogram('http_request_duration_seconds', 'Latency', ('handler', 'method', 'status'))
+    app = Starlette(routes=[Route("/items/{item}", ok), Route("/broken", broken)])
+    app.add_middleware(MetricsMiddleware, histogram=histogram)
+    client = TestClient(app, raise_server_exceptions=False)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.post("/items/3")
+    client.get("/missing")
+    assert client.get("/broken").status_code == 500
+
+    # One series per route, not per path, so ids in paths do not blow up the label set
+    assert histogram.count('ok', 'GET', '200') == 2
+    assert histogram.count('ok', 'POST', '405') == 1
+    assert histogram.count('unmatched', 'GET', '404') == 1
+    assert histogram.count('broken', 'GET', '500') == 1
+    assert len(histogram._series) == 4
@@ -0,0 +1,81 @@
+"""
+Tests for question ingestion and compiled snapshots
+"""
+
+import json
+import os
+
+from question_bank import QuestionBank
+from question_ingest import MappedQuestionBank, ingest, iter_records, read_snapshot, snapshot_path, write_snapshot
+
+
+def row(question_id, level=1, **overrides):
+    item = {"id": question_id, "level": level, "question": f"Question {question_id}?",
+            "answer1": "A", "answer2": "B", "answer3": "C", "answer4": "D",
+            "correct": 2, "explanation": "Because."}
+    item.update(overrides)
+    return item
+
+
+def test_bad_rows_are_reported_and_duplicates_replaced(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    lines = [json.dumps(row(1)), json.dumps(row(2, correct=5)), "{not json", json.dumps(row(3, answer4="")),
+             json.dumps(row(1, question="Replaced?")), json.dumps(row(4, level="2"))]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+    questions, report = ingest([str(path)])
+    assert [q.question for q in questions] == ["Replaced?"]
+    assert (report.rows, report.accepted, report.duplicates, report.rejected) == (6, 1, 1, 4)
+    assert [(r, message.split()[0]) for _, r, message in report.errors] == [
+        (2, "correct"), (3, "invalid"), (4, "answer4"), (6, "level")]
+
+
+def test_json_array_is_streamed_in_small_chunks(tmp_path):
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps([row(i, level=i % 8 + 1) for i in range(1, 51)], ensure_ascii=False), encoding="utf-8")
+    records = list(iter_records(str(path), chunk_size=7))
+    assert [r["id"] for _, r in records] == list(range(1, 51))
+
+
+def test_snapshot_round_trip_and_bank_prefers_it(tmp_path):
+    source = tmp_path / "questions.json"
+    questions = [row(i, level=i % 3 + 1, explanation="Giải thích") for i in range(1, 10)]
+    source.write_text(json.dumps(questions), encoding="utf-8")
+    loaded, _ = ingest([str(source)])
+
+    snapshot = snapshot_path(str(source))
+    write_snapshot(loaded, snapshot)
+    assert sorted(read_snapshot(snapshot)) == sorted(loaded)
+
+    # The bank maps the snapshot while it is at least as new as the JSON file
+    os.utime(source, (0, 0))
+    write_snapshot(loaded[:3], snapshot)
+    assert len(QuestionBank(str(source))) == 3
+    os.utime(snapshot, (0, 0))
+    os.utime(source, None)
+    assert len(QuestionBank(str(source))) == 9
+
+
+def test_mapped_bank_matches_the_heap_bank(tmp_path):
+    source = tmp_path / "questions.json"
+    source.write_text(json.dumps([row(i * 7, level=i % 4 + 1, explanation=f"Giải thích {i}") for i in range(1, 40)]),
+                      encoding="utf-8")
+    heap = QuestionBank(str(source))
+    mapped = MappedQuestionBank(str(source), cache_size=8)
+
+    assert os.path.exists(snapshot_path(str(source)))
+    assert len(mapped) == len(heap) and mapped.levels() == heap.levels()
+    for level in heap.levels():
+        assert sorted(mapped.questions_for_level(level)) == sorted(heap.questions_for_level(level))
+        assert mapped.get(mapped.random_question_id(level)).level == level
+    assert mapped.get(7) == heap.get(7)
+    assert mapped.get(8) is None and mapped.get(10 ** 6) is None
+    assert mapped.question_json(14) == heap.question_json(14) and mapped.question_json(8) is None
+    assert mapped.random_question_id(99) == 0 and mapped.random_question(99) is None
+
+    # Reload maps the recompiled file
+    source.write_text(json.dumps([row(1, question="New?")]), encoding="utf-8")
+    os.utime(snapshot_path(str(source)), (0, 0))
+    assert mapped.reload() == 1
+    assert mapped.get(1).question == "New?"
+    assert json.loads(mapped.question_json(1))["question"] == "New?"
@@ -0,0 +1,84 @@
+"""
+Tests for per-session question scheduling
+"""
+
+import struct
+
+from gamelogic import MillionaireGame
+from question_bank import QuestionBank, get_question_bank
+from question_scheduler import QuestionScheduler, permutation
+
+
+class SizedBank(QuestionBank):
+    """Bank stand-in with many questions per level and no file behind it"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def level_size(self, level):
+        return self.size
+
+    def question_id_at(self, level, position):
+        return position + 1
+
+
+def test_permutation_visits_every_question_once():
+    for size in (1, 2, 7, 12, 1000):
+        step, offset = permutation(seed=42, level=3, size=size)
+        assert sorted((step * k + offset) % size for k in range(size)) == list(range(size))
+
+
+def test_draws_do_not_repeat_and_are_reproducible():
+    scheduler = QuestionScheduler(SizedBank(500))
+    draws = [scheduler.draw(7, 1, cursor) for cursor in range(500)]
+    assert len(set(draws)) == 500
+    assert draws == [QuestionScheduler(SizedBank(500)).draw(7, 1, cursor) for cursor in range(500)]
+    assert draws != [scheduler.draw(8, 1, cursor) for cursor in range(500)]
+
+
+def test_change_question_never_returns_the_same_question():
+    for seed in range(50):
+        game = MillionaireGame()
+        game.start_game(seed=seed)
+        first = game.question_id
+        game.use_change_question()
+        assert game.question_id != first
+
+    replay = MillionaireGame()
+    replay.start_game(seed=3)
+    game.start_game(seed=3)
+    assert replay.question_id == game.question_id
+
+
+def test_balanced_draws_skip_the_replaced_question_on_small_levels():
+    # On a 3-question level the second pair of positions wraps onto the first
+    scheduler = QuestionScheduler(SizedBank(3), balance_exposure=True)
+    for seed in range(2000):
+        first = scheduler.draw(seed, 1, 0)
+        assert scheduler.draw(seed, 1, 1, exclude=first) != first
+    plain = QuestionScheduler(SizedBank(1))
+    assert plain.draw(5, 1, 1, exclude=1) == 1
+
+
+def test_balanced_exposure_spreads_questions():
+    plain = QuestionScheduler(SizedBank(20))
+    balanced = QuestionScheduler(SizedBank(20), balance_exposure=True, decay_rounds=1000)
+    counts = {}
+    for seed in range(2000):
+        question_id = balanced.draw(seed, 1, 0)
+        counts[question_id] = counts.get(question_id, 0) + 1
+    plain_counts = {}
+    for seed in range(2000):
+        question_id = plain.draw(seed, 1, 0)
+        plain_counts[question_id] = plain_counts.get(question_id, 0) + 1
+
+    assert sum(balanced.exposure(1)) == 2000
+    assert max(counts.values()) - min(counts.values()) < max(plain_counts.values()) - min(plain_counts.values())
+
+
+def test_state_saved_before_scheduling_still_loads():
+    question = get_question_bank().questions_for_level(2)[0]
+    legacy = struct.pack('<BBBIB', 1, 2, 1, question.id, 0)
+    game = MillionaireGame.from_bytes(legacy)
+    assert game.current_question == question
+    assert game.used_fifty_fifty and game.draws == 1
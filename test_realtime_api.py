@@ -0,0 +1,117 @@
+"""
+Tests for the WebSocket game transport and streamed AI hints
+"""
+
+import json
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import ai_support
+import hint_cache
+import main
+from ai_support import FakeBackend, GeminiAISupport
+from hint_cache import HintCache
+from question_bank import get_question_bank
+
+
+@pytest.fixture
+def fake_ai(monkeypatch):
+    backend = FakeBackend(response="Think about rivers.", latency=0)
+    monkeypatch.setitem(ai_support._shared_supports, os.getenv('GEMINI_API_KEY'), GeminiAISupport(backend=backend))
+    cache = HintCache()
+    monkeypatch.setattr(hint_cache, '_shared_cache', cache)
+    return cache
+
+
+def find_question(text):
+    bank = get_question_bank()
+    return next(q for level in bank.levels() for q in bank.questions_for_level(level) if q.question == text)
+
+
+def test_socket_plays_a_game_and_warms_hints(fake_ai, monkeypatch):
+    monkeypatch.setattr(main, 'WS_WARM_HINTS', True)
+    client = TestClient(main.app)
+    with client.websocket_connect("/ws/game?session_id=socket-a") as socket:
+        socket.send_json({"type": "answer", "answer": 1})
+        assert socket.receive_json()["status"] == "error"
+
+        socket.send_json({"type": "start"})
+        reply = socket.receive_json()
+        assert reply["type"] == "start" and reply["level"] == 1
+        question = find_question(reply["question"]["question"])
+
+        socket.send_json({"type": "answer", "answer": question.correct})
+        reply = socket.receive_json()
+        assert reply["status"] == "correct" and reply["level"] == 2
+        current = find_question(reply["question"]["question"])
+
+        socket.send_text("not json")
+        assert socket.receive_json()["type"] == "error"
+        # Hints are warmed in the background after the reply
+        deadline = time.monotonic() + 2
+        while not fake_ai.variants(current) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert fake_ai.variants(current) == ("Think about rivers.",)
+
+        socket.send_json({"type": "support", "support_type": "ai_support"})
+        reply = socket.receive_json()
+        assert reply["ai_response"].endswith("Think about rivers.")
+
+    # The same game is visible over HTTP
+    session = client.get("/api/session/socket-a").json()
+    assert session == {"level": 2, "supports": {"fifty_fifty": True, "change_question": True, "ai_support": False}}
+
+
+def test_socket_does_not_call_the_ai_ahead_of_time_by_default(fake_ai):
+    assert not main.WS_WARM_HINTS
+    backend = ai_support._shared_supports[os.getenv('GEMINI_API_KEY')].backend
+    client = TestClient(main.app)
+    with client.websocket_connect("/ws/game") as socket:
+        socket.send_json({"type": "start"})
+        question = find_question(socket.receive_json()["question"]["question"])
+        socket.send_json({"type": "answer", "answer": question.correct})
+        assert socket.receive_json()["status"] == "correct"
+        time.sleep(0.05)
+    assert backend.calls == 0
+
+
+def sse_events(body: str):
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        yield event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_ai_hint_streams_over_sse(fake_ai):
+    client = TestClient(main.app)
+    client.post("/api/start", json={"session_id": "stream-a"})
+    response = client.post("/api/support/stream", json={"session_id": "stream-a", "support_type": "ai_support"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = list(sse_events(response.text))
+    chunks = [data for event, data in events if event == "chunk"]
+    assert "".join(chunks) == "🤖 AI Assistant: Think about rivers."
+    assert events[-1] == ("done", {"supports": {"fifty_fifty": True, "change_question": True, "ai_support": False}})
+
+    again = client.post("/api/support/stream", json={"session_id": "stream-a", "support_type": "ai_support"})
+    assert again.status_code == 400
+
+
+def test_socket_saves_each_move_under_the_game_lock_before_replying(fake_ai, monkeypatch):
+    saves = []
+    save_game = main.save_game
+
+    async def recording_save(session_id, game):
+        saves.append(session_id in main.session_guard.locks._locks)
+        await save_game(session_id, game)
+
+    monkeypatch.setattr(main, 'save_game', recording_save)
+    client = TestClient(main.app)
+    with client.websocket_connect("/ws/game?session_id=socket-b") as socket:
+        socket.send_json({"type": "start"})
+        socket.receive_json()
+        socket.send_json({"type": "support", "support_type": "fifty_fifty"})
+        assert socket.receive_json()["status"] == "success"
+        assert saves == [True]
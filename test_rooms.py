@@ -0,0 +1,80 @@
+"""
+Tests for live rooms: shared questions, tallied answers and broadcast updates
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from rooms import FINISHED, REVEALED, Room, RoomError
+
+
+def test_room_tallies_answers_and_keeps_only_correct_players():
+    room = Room("r1", max_players=4, tally_interval=0)
+    right, wrong, silent = room.join("a")[0], room.join("b")[0], room.join()[0]
+    room.host_action('start')
+    late = room.join("late")[0]
+    correct = room.game.current_question.correct
+
+    for bad in (float(correct), str(correct), True):
+        with pytest.raises(RoomError):
+            room.answer(right, bad)
+    room.answer(right, correct)
+    room.answer(wrong, correct % 4 + 1)
+    with pytest.raises(RoomError):
+        room.answer(right, correct)
+    with pytest.raises(RoomError):
+        room.answer(late, correct)
+    with pytest.raises(RoomError):
+        room.join()
+
+    room.host_action('reveal')
+    assert room.state == REVEALED and room.survivors == 1
+    assert room.counts[correct] == 1 and room.answered == 2
+    room.host_action('next')
+    with pytest.raises(RoomError):
+        room.answer(silent, 1)
+
+    updates = asyncio.run(room.updates(0))
+    kinds = [json.loads(text)["type"] for _, text, _ in updates]
+    assert kinds == ["question", "tally", "tally", "reveal", "question"]
+    reveal = json.loads(updates[3][1])
+    assert reveal["correct_answer"] == correct and reveal["survivors"] == 1 and reveal["players"] == 3
+    # The SSE frame carries the same serialized text
+    assert updates[3][2].decode().endswith(f"data: {updates[3][1]}\n\n")
+
+
+def test_room_plays_over_websocket_and_sse():
+    with TestClient(main.app) as client:
+        created = client.post("/api/rooms").json()
+        room_id, host = created["room_id"], created["host_token"]
+        player = client.post(f"/api/rooms/{room_id}/join", json={"name": "Lan"}).json()["player_token"]
+        assert client.post(f"/api/rooms/{room_id}/host", json={"host_token": "nope", "action": "start"}).status_code == 403
+
+        with client.websocket_connect(f"/ws/rooms/{room_id}?player_token={player}") as socket:
+            assert socket.receive_json()["type"] == "snapshot"
+            client.post(f"/api/rooms/{room_id}/host", json={"host_token": host, "action": "start"})
+            question = socket.receive_json()
+            assert question["type"] == "question" and question["players"] == 1
+
+            correct = main.rooms.get(room_id).game.current_question.correct
+            # A malformed answer gets an error frame and leaves the socket open
+            socket.send_json({"type": "answer", "answer": float(correct)})
+            assert socket.receive_json() == {"type": "answer", "status": "error", "message": "answer must be 1-4"}
+            socket.send_json({"type": "answer", "answer": correct})
+            replies = [socket.receive_json(), socket.receive_json()]
+            assert {reply["type"] for reply in replies} == {"answer", "tally"}
+
+            client.post(f"/api/rooms/{room_id}/host", json={"host_token": host, "action": "reveal"})
+            reveal = socket.receive_json()
+            assert reveal["type"] == "reveal" and reveal["survivors"] == 1
+
+        client.post(f"/api/rooms/{room_id}/host", json={"host_token": host, "action": "finish"})
+        assert client.get(f"/api/rooms/{room_id}").json()["state"] == FINISHED
+        with client.stream("GET", f"/api/rooms/{room_id}/events") as response:
+            body = b"".join(response.iter_bytes()).decode()
+        assert body.startswith("id: ") and "event: snapshot" in body
+        assert client.get("/api/rooms/missing").status_code == 404
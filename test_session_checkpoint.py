@@ -0,0 +1,144 @@
+"""
+Tests for checkpointing and restoring in-memory game sessions
+"""
+
+import asyncio
+import os
+
+from gamelogic import MillionaireGame
+from session_checkpoint import SessionCheckpoint, read_checkpoint
+from session_store import InMemorySessionStore
+
+
+def new_checkpoint(path, ttl_seconds=1800.0):
+    store = InMemorySessionStore(ttl_seconds=ttl_seconds)
+    checkpoint = SessionCheckpoint(store, str(path), MillionaireGame.from_bytes, fsync=False)
+    checkpoint.restore()
+    return store, checkpoint
+
+
+def started_game(level=1):
+    game = MillionaireGame()
+    game.start_game()
+    game.level = level
+    return game
+
+
+def test_changes_survive_a_restart(tmp_path):
+    path = tmp_path / "sessions.checkpoint"
+
+    async def first_run():
+        store, checkpoint = new_checkpoint(path)
+        for i in range(5):
+            store.put(f"player-{i}", started_game())
+        assert await checkpoint.checkpoint() == 5
+        # Only what changed since is written next time
+        game = store.get("player-1")
+        game.use_fifty_fifty()
+        game.level = 4
+        store.save("player-1", game)
+        store.delete("player-2")
+        assert await checkpoint.checkpoint() == 2
+        store.put("player-9", started_game(level=6))
+        await checkpoint.close()
+        return {session_id: store.peek(session_id)[0].to_bytes() for session_id in store.session_ids()}
+
+    saved = asyncio.run(first_run())
+    store, checkpoint = new_checkpoint(path)
+    asyncio.run(checkpoint.close())
+    assert checkpoint.restored == len(store) == 5
+    assert {session_id: store.get(session_id).to_bytes() for session_id in store.session_ids()} == saved
+    assert store.get("player-2") is None
+    assert store.get("player-1").used_fifty_fifty and store.get("player-1").level == 4
+
+
+def test_compaction_rewrites_only_live_sessions(tmp_path):
+    path = tmp_path / "sessions.checkpoint"
+
+    async def run():
+        store, checkpoint = new_checkpoint(path)
+        checkpoint._appended = 10_000
+        store.put("kept", started_game())
+        store.put("gone", started_game())
+        store.delete("gone")
+        await checkpoint.checkpoint()
+        return checkpoint
+
+    checkpoint = asyncio.run(run())
+    assert checkpoint.compactions == 1
+    sessions, _ = read_checkpoint(str(path))
+    assert list(sessions) == ["kept"]
+    assert not os.path.exists(str(path) + ".tmp")
+
+
+def test_torn_tail_and_expired_sessions_are_skipped(tmp_path):
+    path = tmp_path / "sessions.checkpoint"
+
+    async def run():
+        store, checkpoint = new_checkpoint(path)
+        store.put("a", started_game())
+        store.put("b", started_game())
+        await checkpoint.close()
+
+    asyncio.run(run())
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x01\x05\x00")  # a record cut short by a crash
+    _, checkpoint = new_checkpoint(path)
+    assert checkpoint.restored == 2
+    assert os.path.getsize(path) == intact
+    asyncio.run(checkpoint.close())
+
+    store, checkpoint = new_checkpoint(path, ttl_seconds=-1)
+    assert checkpoint.enabled
+    assert checkpoint.restored == 0 and len(store) == 0
+    asyncio.run(checkpoint.close())
+
+    bogus = tmp_path / "other"
+    bogus.write_bytes(b"not a checkpoint")
+    _, checkpoint = new_checkpoint(bogus)
+    assert not checkpoint.enabled
+
+
+def test_one_process_per_checkpoint_file(tmp_path):
+    path = tmp_path / "sessions.checkpoint"
+    _, first = new_checkpoint(path)
+    _, second = new_checkpoint(path)
+    assert first.enabled and not second.enabled
+    asyncio.run(first.close())
+
+
+def test_unwritable_sessions_are_skipped_and_failed_writes_retried(tmp_path):
+    path = tmp_path / "sessions.checkpoint"
+
+    async def run():
+        store, checkpoint = new_checkpoint(path)
+        store.put("x" * 70_000, started_game())
+        store.put("\ud800", started_game())
+        store.put("player-1", started_game())
+        assert await checkpoint.checkpoint() == 1 and checkpoint.skipped == 2
+
+        store.put("player-2", started_game())
+        checkpoint._append = lambda records: (_ for _ in ()).throw(OSError("disk full"))
+        task = asyncio.create_task(checkpoint.run())
+        checkpoint.interval = 0
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+        del checkpoint._append
+        assert await checkpoint.checkpoint() == 1
+        await checkpoint.close()
+
+    asyncio.run(run())
+    sessions, _ = read_checkpoint(str(path))
+    assert sorted(sessions) == ["player-1", "player-2"]
+
+
+def test_api_rejects_session_ids_that_cannot_be_stored():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    assert client.post("/api/start", json={"session_id": "x" * 70_000}).status_code == 422
+    assert client.post("/api/start", json={"session_id": "\ud800"}).status_code == 422
+    assert client.post("/api/start", json={"session_id": "player_1.a-b:c@d"}).status_code == 200
@@ -0,0 +1,97 @@
+"""
+Tests for per-game request serialization and idempotent retries
+"""
+
+import asyncio
+import os
+
+import httpx
+from fastapi.testclient import TestClient
+
+import ai_support
+import hint_cache
+import main
+from ai_support import FakeBackend, GeminiAISupport
+from hint_cache import HintCache
+from question_bank import get_question_bank
+from session_locks import SessionLocks
+
+client = TestClient(main.app)
+
+
+def correct_answer(question_text):
+    bank = get_question_bank()
+    return next(q.correct for level in bank.levels() for q in bank.questions_for_level(level)
+                if q.question == question_text)
+
+
+def test_retry_with_the_same_idempotency_key_applies_once():
+    start = client.post("/api/start", json={"session_id": "retry-a"}).json()
+    answer = correct_answer(start["question"]["question"])
+    headers = {"Idempotency-Key": "click-1"}
+
+    first = client.post("/api/answer", json={"session_id": "retry-a", "answer": answer}, headers=headers)
+    retry = client.post("/api/answer", json={"session_id": "retry-a", "answer": answer}, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert client.get("/api/session/retry-a").json()["level"] == 2
+
+
+def test_answer_waits_for_a_lifeline_in_progress(monkeypatch):
+    backend = FakeBackend(response="Think about rivers.", latency=0.2)
+    monkeypatch.setitem(ai_support._shared_supports, os.getenv('GEMINI_API_KEY'), GeminiAISupport(backend=backend))
+    monkeypatch.setattr(hint_cache, '_shared_cache', HintCache())
+    start = client.post("/api/start", json={"session_id": "race-a"}).json()
+    answer = correct_answer(start["question"]["question"])
+    finished = []
+
+    async def race():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as http:
+            async def call(path, payload):
+                response = await http.post(path, json=payload)
+                finished.append(path)
+                return response.json()
+
+            support = asyncio.create_task(call("/api/support", {"session_id": "race-a", "support_type": "ai_support"}))
+            await asyncio.sleep(0.05)
+            return await call("/api/answer", {"session_id": "race-a", "answer": answer}), await support
+
+    answered, supported = asyncio.run(race())
+    # The hint is for the question it was asked on, and the answer applies after it
+    assert finished == ["/api/support", "/api/answer"]
+    assert supported["ai_response"].endswith("Think about rivers.")
+    assert answered["status"] == "correct" and answered["level"] == 2
+
+
+def test_locks_exist_only_while_held():
+    locks = SessionLocks()
+    order = []
+
+    async def hold(tag, delay):
+        async with locks.hold("game"):
+            order.append(tag)
+            await asyncio.sleep(delay)
+
+    async def run():
+        await asyncio.gather(hold("a", 0.02), hold("b", 0))
+
+    asyncio.run(run())
+    assert order == ["a", "b"] and locks.waits == 1
+    assert len(locks) == 0
+
+
+def test_idempotency_keys_are_scoped_to_the_route_and_body():
+    start = client.post("/api/start", json={"session_id": "retry-b"}).json()
+    answer = correct_answer(start["question"]["question"])
+    headers = {"Idempotency-Key": "click-2"}
+
+    support = client.post("/api/support", json={"session_id": "retry-b", "support_type": "fifty_fifty"},
+                          headers=headers)
+    assert support.json()["support_type"] == "fifty_fifty"
+    # The same key on another route is another request, not a replay of the lifeline
+    first = client.post("/api/answer", json={"session_id": "retry-b", "answer": answer}, headers=headers)
+    assert first.json()["status"] == "correct"
+    # Reusing it with a different answer is refused instead of replaying the first one
+    changed = client.post("/api/answer", json={"session_id": "retry-b", "answer": answer % 4 + 1}, headers=headers)
+    assert changed.status_code == 422
+    assert client.get("/api/session/retry-b").json()["level"] == 2
@@ -0,0 +1,120 @@
+"""
+Tests for the bounded in-memory session store
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from gamelogic import MillionaireGame
+from session_store import InMemorySessionStore, SessionConflict, SharedSessionStore, SQLiteKeyValue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_idle_sessions_expire():
+    clock = FakeClock()
+    store = InMemorySessionStore(ttl_seconds=10, max_entries=100, clock=clock)
+    store.put("a", object())
+    store.put("b", object())
+
+    clock.now = 5
+    assert store.get("a") is not None  # refreshes "a"
+
+    clock.now = 12
+    assert store.sweep() == 1
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.stats()["expirations"] == 1
+
+
+def test_lru_eviction_and_byte_accounting():
+    store = InMemorySessionStore(ttl_seconds=60, max_entries=2)
+    store.put("a", object())
+    store.put("b", object())
+    store.get("a")
+    store.put("c", object())
+
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    stats = store.stats()
+    assert stats["live_sessions"] == 2
+    assert stats["evictions"] == 1
+    assert stats["approx_bytes"] > 0
+
+    store.delete("a")
+    store.delete("c")
+    assert store.stats()["approx_bytes"] == 0
+
+
+def test_shared_store_round_trips_compact_state(tmp_path):
+    store = SharedSessionStore(SQLiteKeyValue(str(tmp_path / "sessions.sqlite3")), MillionaireGame.from_bytes)
+    game = MillionaireGame()
+    game.start_game()
+    game.use_fifty_fifty()
+    store.put("a", game)
+
+    loaded = store.get("a")
+    assert loaded.to_bytes() == game.to_bytes()
+    assert loaded.get_current_state() == game.get_current_state()
+    assert store.stats()["live_sessions"] == 1
+
+
+def test_shared_store_rejects_stale_writes(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    worker_a = SharedSessionStore(SQLiteKeyValue(path), MillionaireGame.from_bytes)
+    worker_b = SharedSessionStore(SQLiteKeyValue(path), MillionaireGame.from_bytes)
+    game = MillionaireGame()
+    game.start_game()
+    worker_a.put("a", game)
+
+    first = worker_a.get("a")
+    second = worker_b.get("a")
+    first.check_answer(first.current_question.correct)
+    worker_a.save("a", first)
+
+    second.use_fifty_fifty()
+    with pytest.raises(SessionConflict):
+        worker_b.save("a", second)
+    assert worker_b.get("a").current_level == 2
+
+
+def test_shared_store_runs_backend_calls_off_the_event_loop(tmp_path):
+    clock = FakeClock()
+    backend = SQLiteKeyValue(str(tmp_path / "sessions.sqlite3"))
+    store = SharedSessionStore(backend, MillionaireGame.from_bytes, stats_ttl=5, clock=clock)
+    game = MillionaireGame()
+    game.start_game()
+    loop_thread = threading.get_ident()
+    called_from = []
+    get = backend.get
+
+    def tracking_get(key):
+        called_from.append(threading.get_ident())
+        return get(key)
+
+    backend.get = tracking_get
+
+    async def run():
+        await store.put_async("a", game)
+        loaded = await store.get_async("a")
+        loaded.use_fifty_fifty()
+        await store.save_async("a", loaded)
+        return loaded
+
+    assert asyncio.run(run()).version == 2
+    assert called_from and loop_thread not in called_from
+
+    # One scan of the table per stats_ttl, however many gauges read it
+    assert store.stats()["live_sessions"] == 1
+    store.put("b", game)
+    assert store.stats()["live_sessions"] == 1
+    clock.now = 5
+    assert store.stats()["live_sessions"] == 2
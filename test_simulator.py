@@ -0,0 +1,57 @@
+"""
+Tests for the headless game simulator
+"""
+
+import answer_stats
+import event_log
+import simulator
+from simulator import FIELDS, FiftyFiftyStrategy, RandomStrategy, SkillStrategy, simulate, summarize
+
+
+def test_running_in_process_keeps_the_callers_journal_and_statistics():
+    journal, stats = event_log.get_event_log(), answer_stats.get_answer_stats()
+    simulate(50, SkillStrategy(), seed=3)
+    assert event_log.get_event_log() is journal and answer_stats.get_answer_stats() is stats
+
+
+def test_results_do_not_depend_on_the_number_of_processes():
+    inline = simulate(600, SkillStrategy(), processes=1, seed=7, shard_size=200)
+    pooled = simulate(600, SkillStrategy(), processes=2, seed=7, shard_size=200)
+    for key in ('games', 'wins', 'levels', 'lifelines', 'questions'):
+        assert inline[key] == pooled[key]
+
+
+def test_strategies_use_lifelines_as_scripted():
+    guessing = simulate(2000, RandomStrategy(), seed=1)
+    assert guessing['win_rate'] < 0.01
+    assert all(row['used'] == 0 for row in guessing['lifelines'].values())
+    assert 0.2 < guessing['levels'][1]['pass_rate'] < 0.3
+
+    fifty = simulate(2000, FiftyFiftyStrategy(), seed=1)
+    assert fifty['lifelines']['fifty_fifty']['used'] == 2000
+    assert fifty['lifelines']['fifty_fifty']['mean_level'] == 1.0
+    assert 0.45 < fifty['levels'][1]['pass_rate'] < 0.55
+
+    expert = simulate(2000, SkillStrategy(knowledge=[1.0] * 8), seed=1)
+    assert expert['win_rate'] == 1.0
+    assert all(row['used'] == 0 for row in expert['lifelines'].values())
+
+
+def test_summary_counts_levels_and_lifelines_from_the_records(monkeypatch):
+    rows = [
+        [8, 1, 3, 1, 0, 0, 0, 0],  # won, 50/50 at level 3 answered correctly
+        [2, 0, 2, 0, 0, 0, 0, 0],  # lost at level 2 after 50/50
+        [1, 0, 0, 0, 0, 0, 1, 0],  # lost at level 1 after AI support
+    ]
+    records = bytes(value for row in rows for value in row)
+    assert len(records) == 3 * FIELDS
+    monkeypatch.setattr(simulator, 'numpy', None)
+    summary = summarize(records, {1: 2, 2: 1}, max_level=8)
+    assert summary['win_rate'] == round(1 / 3, 4)
+    assert summary['levels'][1] == {"reached": 3, "passed": 2, "pass_rate": round(2 / 3, 4)}
+    assert summary['levels'][2] == {"reached": 2, "passed": 1, "pass_rate": 0.5}
+    assert summary['levels'][8] == {"reached": 1, "passed": 1, "pass_rate": 1.0}
+    assert summary['lifelines']['fifty_fifty']['used'] == 2
+    assert summary['lifelines']['fifty_fifty']['correct_rate'] == 0.5
+    assert summary['lifelines']['ai_support']['correct_rate'] == 0.0
+    assert summary['questions'] == {"shown": 2, "min": 1, "max": 2}
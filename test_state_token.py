@@ -0,0 +1,88 @@
+"""
+Tests for stateless game state tokens
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gamelogic import MillionaireGame
+from main import app
+from session_store import SQLiteKeyValue
+from state_token import InvalidToken, ReplayGuard, SharedReplayGuard, StateTokenCodec
+
+
+def make_token(codec, counter=0):
+    game = MillionaireGame()
+    game.start_game()
+    return game, codec.encode(game.to_bytes(), codec.new_nonce(), counter)
+
+
+@pytest.mark.parametrize("encrypt", [False, True])
+def test_round_trip(encrypt):
+    codec = StateTokenCodec(b'secret', encrypt=encrypt)
+    game, token = make_token(codec)
+    claims = codec.decode(token)
+    assert claims.counter == 0
+    assert MillionaireGame.from_bytes(claims.state).to_bytes() == game.to_bytes()
+
+
+def test_tampered_and_foreign_tokens_are_rejected():
+    codec = StateTokenCodec(b'secret')
+    _, token = make_token(codec)
+    tampered = token[:10] + ('A' if token[10] != 'A' else 'B') + token[11:]
+    with pytest.raises(InvalidToken):
+        codec.decode(tampered)
+    with pytest.raises(InvalidToken):
+        StateTokenCodec(b'other-secret').decode(token)
+    with pytest.raises(InvalidToken):
+        codec.decode("not a token")
+
+
+def test_tokens_are_single_use():
+    codec = StateTokenCodec(b'secret')
+    _, token = make_token(codec)
+    claims = codec.decode(token)
+    with pytest.raises(InvalidToken):
+        codec.decode(token)
+
+    # The next step of the same game is still accepted
+    codec.decode(codec.encode(claims.state, claims.nonce, claims.counter + 1))
+
+
+def test_expired_tokens_are_rejected():
+    codec = StateTokenCodec(b'secret', ttl_seconds=-1)
+    _, token = make_token(codec)
+    with pytest.raises(InvalidToken):
+        codec.decode(token)
+
+
+def test_replay_guard_forgets_games_once_their_tokens_expire():
+    now = [0.0]
+    guard = ReplayGuard(ttl_seconds=60, max_entries=2, clock=lambda: now[0])
+    assert guard.claim(1, 0) and not guard.claim(1, 0)
+    now[0] = 61
+    assert guard.claim(2, 0) and len(guard) == 1 and guard.evicted_early == 0
+    assert guard.claim(3, 0) and guard.claim(4, 0)
+    assert len(guard) == 2 and guard.evicted_early == 1
+
+
+def test_shared_guard_rejects_replays_from_another_worker(tmp_path):
+    path = str(tmp_path / "tokens.sqlite3")
+    workers = [StateTokenCodec(b'secret', replay_guard=SharedReplayGuard(SQLiteKeyValue(path, table='token_counters')))
+               for _ in range(2)]
+    _, token = make_token(workers[0])
+    claims = workers[0].decode(token)
+    with pytest.raises(InvalidToken):
+        workers[1].decode(token)
+    workers[1].decode(workers[0].encode(claims.state, claims.nonce, claims.counter + 1))
+    with pytest.raises(InvalidToken):
+        workers[0].decode(workers[0].encode(claims.state, claims.nonce, claims.counter + 1))
+
+
+def test_no_token_is_issued_once_the_game_is_over():
+    client = TestClient(app)
+    response = client.post("/api/start", json={"stateless": True}).json()
+    while "state_token" in response:
+        response = client.post("/api/answer", json={"answer": 1, "state_token": response["state_token"]}).json()
+        assert response["status"] in ("correct", "won", "game_over")
+    assert response["status"] in ("won", "game_over") and "correct_answer" in response
@@ -0,0 +1,71 @@
+"""
+Tests for serving pages from memory with compression and ETags
+"""
+
+import gzip
+
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from static_assets import AssetCache, StaticAsset
+
+PAGE = b"<html>" + b"<p>Ai la trieu phu</p>" * 200 + b"</html>"
+
+
+def make_client(tmp_path):
+    (tmp_path / "page.html").write_bytes(PAGE)
+    cache = AssetCache(str(tmp_path))
+    app = Starlette(routes=[Route("/", lambda request: cache.response("page.html", request))])
+    return TestClient(app), cache
+
+
+def test_smallest_accepted_encoding_is_chosen():
+    asset = StaticAsset(PAGE, 0.0, "text/html")
+    asset.br_body = b"brotli"
+    assert asset.select("gzip, deflate, br")[1:] == ("br", f'"{asset.etag}-br"')
+    assert asset.select("gzip")[1] == "gzip"
+    assert gzip.decompress(asset.select("GZIP;q=0.5")[0]) == PAGE
+    assert asset.select("")[:2] == (PAGE, None)
+    assert asset.select("*")[1] == "br"
+
+
+def test_codings_refused_with_q_0_are_not_sent():
+    asset = StaticAsset(PAGE, 0.0, "text/html")
+    asset.br_body = b"brotli"
+    assert asset.select("br;q=0, gzip")[1] == "gzip"
+    assert asset.select("br;q=0, gzip;q=0.0")[1] is None
+    assert asset.select("*, br;q=0")[1] == "gzip"
+    assert asset.select("gzip;q=0, *;q=0")[1] is None
+
+
+def test_responses_vary_on_encoding_and_revalidate_with_etags(tmp_path):
+    client, cache = make_client(tmp_path)
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and response.content == PAGE
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    etag = response.headers["etag"]
+    assert etag.endswith('-gz"')
+
+    identity = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] != etag
+
+    # Any encoding of the same body matches, as do weak and list forms
+    for tag in (etag, identity.headers["etag"], f"W/{etag}", f'"other", {etag}', "*"):
+        cached = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": tag})
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["etag"] == etag and cached.headers["vary"] == "Accept-Encoding"
+    assert client.get("/", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_watched_files_are_reloaded_when_they_change(tmp_path):
+    client, cache = make_client(tmp_path)
+    etag = client.get("/").headers["etag"]
+    (tmp_path / "page.html").write_bytes(b"<html>changed</html>")
+    assert client.get("/").headers["etag"] == etag
+
+    cache.watch = True
+    cache._assets["page.html"].mtime = 0.0
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert response.content == b"<html>changed</html>" and response.headers["etag"] != etag